@@ -1,20 +1,62 @@
 import json
+import os
 import threading
 from datetime import datetime
 from pathlib import Path
 
 from config import RELATORIO_DIR
+from events_sqlite import BaseEventos, condicao_contem, condicoes_periodo
+from events_writer import GravadorEventos
+from jsonl_reverso import linhas_reversas
+from settings_manager import load_settings
 
 
 _LOCK = threading.Lock()
 _AUDIT_FILE = Path(RELATORIO_DIR) / "registro_auditoria.jsonl"
 _SENSITIVE_KEYS = {"password", "senha", "token", "secret", "hash", "salt"}
+_db = None  # BaseEventos quando history_backend == "sqlite"
+_preparado = False
+_gravador = None
 
 
 def _ensure_parent():
     _AUDIT_FILE.parent.mkdir(parents=True, exist_ok=True)
 
 
+def _eventos_arquivo():
+    if not _AUDIT_FILE.exists():
+        return
+    with _AUDIT_FILE.open("rb") as f:
+        for linha in f:
+            try:
+                item = json.loads(linha)
+            except Exception:
+                continue
+            if isinstance(item, dict):
+                yield item
+
+
+def _preparar():
+    """Abre o backend SQLite se configurado, importando o JSONL uma vez (chamar com _LOCK)."""
+    global _db, _preparado
+    if _preparado:
+        return
+    _ensure_parent()
+    if str(load_settings().get("history_backend", "jsonl")) == "sqlite":
+        _db = BaseEventos(
+            _AUDIT_FILE.with_suffix(".sqlite3"),
+            colunas={
+                "actor": lambda item: str(item.get("actor", "") or "").lower(),
+                "action": lambda item: str(item.get("action", "") or "").strip().lower(),
+            },
+            indices=["actor", "action"],
+        )
+        if not _db.migrado():
+            total = _db.migrar(_eventos_arquivo(), _texto_busca, origem=str(_AUDIT_FILE))
+            print(f"[Auditoria] {total} evento(s) importado(s) para o SQLite.")
+    _preparado = True
+
+
 def _now_iso() -> str:
     return datetime.now().isoformat()
 
@@ -52,7 +94,6 @@ def append_audit_event(
     status: str = "ok",
     details: str = "",
 ):
-    _ensure_parent()
     data = {
         "type": "auditoria",
         "at": _now_iso(),
@@ -64,10 +105,37 @@ def append_audit_event(
         "before": _sanitize_value(before if before is not None else {}),
         "after": _sanitize_value(after if after is not None else {}),
     }
-    line = json.dumps(data, ensure_ascii=False)
+    _gravador_eventos().enfileirar([data])
+
+
+def _gravar_lote(eventos: list[dict], fsync: bool):
     with _LOCK:
+        _preparar()
+        if _db is not None:
+            _db.inserir(eventos, _texto_busca)
+            return
         with _AUDIT_FILE.open("a", encoding="utf-8") as f:
-            f.write(line + "\n")
+            f.write("".join(json.dumps(data, ensure_ascii=False) + "\n" for data in eventos))
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+
+
+def _gravador_eventos() -> GravadorEventos:
+    global _gravador
+    if _gravador is None:
+        with _LOCK:
+            if _gravador is None:
+                cfg = load_settings()
+                _gravador = GravadorEventos(
+                    "auditoria",
+                    _gravar_lote,
+                    max_lote=int(cfg.get("event_writer_batch", 256)),
+                    intervalo_ms=int(cfg.get("event_writer_interval_ms", 200)),
+                    fsync=str(cfg.get("event_writer_fsync", "off")),
+                    carimbar=_now_iso,
+                )
+    return _gravador
 
 
 def _date_part(iso_or_date: str) -> str:
@@ -94,10 +162,7 @@ def _match_filter(value: str, filter_value: str) -> bool:
     return filter_value.lower() in (value or "").lower()
 
 
-def _match_search(item: dict, query: str) -> bool:
-    if not query:
-        return True
-    q = query.lower()
+def _texto_busca(item: dict) -> str:
     fields = [
         item.get("actor", ""),
         item.get("action", ""),
@@ -106,8 +171,13 @@ def _match_search(item: dict, query: str) -> bool:
         json.dumps(item.get("before", {}), ensure_ascii=False),
         json.dumps(item.get("after", {}), ensure_ascii=False),
     ]
-    hay = " ".join(str(f) for f in fields).lower()
-    return q in hay
+    return " ".join(str(f) for f in fields)
+
+
+def _match_search(item: dict, query: str) -> bool:
+    if not query:
+        return True
+    return query.lower() in _texto_busca(item).lower()
 
 
 def query_audit_events(
@@ -118,23 +188,46 @@ def query_audit_events(
     query: str = "",
     limit: int = 500,
 ) -> list[dict]:
-    _ensure_parent()
+    if _gravador is not None:
+        _gravador.esvaziar()
+    with _LOCK:
+        _preparar()
+        db = _db
+
+    max_rows = max(1, int(limit or 500))
+    if db is not None:
+        condicoes = condicoes_periodo(dt_from, dt_to)
+        if actor:
+            condicoes.append(condicao_contem("actor", actor))
+        if action:
+            condicoes.append(("action = ?", (action.strip().lower(),)))
+
+        def confirmar(item):
+            return (
+                _in_range(item.get("at", ""), dt_from, dt_to)
+                and _match_filter(str(item.get("actor", "")), actor)
+                and (not action or str(item.get("action", "")).strip().lower() == action.strip().lower())
+                and _match_search(item, query)
+            )
+
+        return db.consultar(condicoes, query.strip(), confirmar, max_rows)
+
     if not _AUDIT_FILE.exists():
         return []
 
     rows: list[dict] = []
     with _LOCK:
-        lines = _AUDIT_FILE.read_text(encoding="utf-8", errors="replace").splitlines()
+        fim = _AUDIT_FILE.stat().st_size
 
-    max_rows = max(1, int(limit or 500))
-    for line in reversed(lines):
-        if not line.strip():
-            continue
+    # Do fim para o comeco, sem carregar o arquivo: para no limite ou ao passar de dt_from
+    for line in linhas_reversas(_AUDIT_FILE, fim):
         try:
             item = json.loads(line)
         except Exception:
             continue
 
+        if dt_from and item.get("at") and _date_part(item["at"]) < dt_from:
+            break  # "at" e carimbado ao entrar na fila: daqui para tras e tudo mais antigo
         if not _in_range(item.get("at", ""), dt_from, dt_to):
             continue
         if not _match_filter(str(item.get("actor", "")), actor):
@@ -131,5 +131,27 @@ def autenticarSheets(cred_file=CRED_FILE_SHEETS, scopes=SCOPES_SHEET):
     return gspread.authorize(creds_sheets)
 
 
-# === Instancia os servicos ===
-sheetsClient = autenticarSheets()
+# === Cliente Sheets sob demanda (substituivel, ex: backend simulado no --dry-run) ===
+_sheets_lock = threading.Lock()
+_sheets_client = None
+
+
+def get_sheets_client():
+    global _sheets_client
+    with _sheets_lock:
+        if _sheets_client is None:
+            _sheets_client = autenticarSheets()
+        return _sheets_client
+
+
+def set_sheets_client(client):
+    global _sheets_client
+    with _sheets_lock:
+        _sheets_client = client
+
+
+def __getattr__(name):
+    # Compatibilidade: `auth.sheetsClient` continua funcionando, agora sob demanda
+    if name == "sheetsClient":
+        return get_sheets_client()
+    raise AttributeError(name)
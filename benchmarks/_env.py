@@ -0,0 +1,77 @@
+"""Isolated runtime environment for benchmarks (temporary APPDATA + dummy secrets)."""
+
+import json
+import os
+import sys
+import tempfile
+from datetime import date
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+BENCH_DIR = Path(__file__).resolve().parent
+
+CNPJ_EH = "11111111000111"
+CNPJ_MVA = "22222222000122"
+
+DUMMY_SECRET_FILES = [
+    "credentials.json",
+    "credentials_gmail.json",
+    "credentials_gmailNFE.json",
+]
+
+
+def preparar(settings: dict | None = None, prefix: str = "financebot-bench-") -> Path:
+    """
+    Points APPDATA at a fresh temporary directory and writes the secrets and
+    settings config.py/settings_manager.py expect. Must run before any repo
+    module is imported. Returns the FinanceBot APPDATA directory.
+    """
+    raiz = Path(tempfile.mkdtemp(prefix=prefix))
+    os.environ["APPDATA"] = str(raiz)
+    appdata = raiz / "FinanceBot"
+    secrets = appdata / "secrets"
+    secrets.mkdir(parents=True, exist_ok=True)
+
+    ano = date.today().year
+    planilhas = {f"{empresa}_{a}": f"bench-{empresa}-{a}" for empresa in ("EH", "MVA") for a in (ano - 1, ano, ano + 1, ano + 2)}
+    config_privado = {"planilhas": planilhas, "cnpjs": {"EH": CNPJ_EH, "MVA": CNPJ_MVA}}
+    (secrets / "config_privado.json").write_text(json.dumps(config_privado, indent=2), encoding="utf-8")
+    for nome in DUMMY_SECRET_FILES:
+        (secrets / nome).write_text("{}", encoding="utf-8")
+
+    if settings:
+        (appdata / "settings.json").write_text(json.dumps(settings, indent=2), encoding="utf-8")
+
+    for caminho in (str(BASE_DIR), str(BENCH_DIR)):
+        if caminho not in sys.path:
+            sys.path.insert(0, caminho)
+    return appdata
+
+
+def pico_rss_mb() -> float | None:
+    """Peak resident set size of this process in MiB (None if unavailable)."""
+    try:
+        import resource
+
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KiB, macOS reports bytes
+        return round(pico / 1024 / (1024 if sys.platform == "darwin" else 1), 1)
+    except Exception:
+        pass
+    try:
+        import psutil
+
+        info = psutil.Process().memory_info()
+        return round(getattr(info, "peak_wset", info.rss) / (1024 * 1024), 1)
+    except Exception:
+        return None
+
+
+def percentil(valores: list[float], p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    k = (len(ordenados) - 1) * p / 100.0
+    i = int(k)
+    j = min(i + 1, len(ordenados) - 1)
+    return ordenados[i] + (ordenados[j] - ordenados[i]) * (k - i)
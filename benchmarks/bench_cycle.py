@@ -0,0 +1,297 @@
+"""
+End-to-end throughput benchmark: full processarEmails cycles against local
+stand-ins for Gmail (fake_gmail), Sheets (fake_sheets) and the Braspress portal.
+
+    python benchmarks/bench_cycle.py                      # 100, 1k and 10k XMLs
+    python benchmarks/bench_cycle.py --sizes 100 1000
+    python benchmarks/bench_cycle.py --save-baseline      # store current numbers
+    python benchmarks/bench_cycle.py --fail-on-regression # exit 1 if slower than (or no) baseline
+
+Each corpus size runs in its own process (fresh APPDATA, ledger and caches),
+so peak RSS is per size. Results are written as JSON to benchmarks/results/.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import _env
+
+RESULTS_DIR = _env.BENCH_DIR / "results"
+DEFAULT_BASELINE = _env.BENCH_DIR / "baseline_cycle.json"
+
+# metric -> True when higher is better
+METRICS = {
+    "msgs_per_s": True,
+    "xml_per_s": True,
+    "sheets_calls_per_doc": False,
+    "gmail_units_per_doc": False,
+    "peak_rss_mb": False,
+    "stage_p95_ms.download": False,
+    "stage_p95_ms.parse_per_xml": False,
+    "stage_p95_ms.route": False,
+    "stage_p95_ms.label": False,
+}
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="FinanceBot end-to-end cycle benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000], help="Corpus sizes (XMLs)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--gmail-latency", type=float, default=0.0, help="Seconds per Gmail call")
+    parser.add_argument("--sheets-latency", type=float, default=0.0, help="Seconds per Sheets call")
+    parser.add_argument("--braspress-latency", type=float, default=0.3, help="Seconds per portal lookup")
+    parser.add_argument("--pacing", action="store_true", help="Keep quota pacing and fake quotas on (slow)")
+    parser.add_argument("--parse-workers", type=int, default=0)
+    parser.add_argument("--route-workers", type=int, default=2)
+    parser.add_argument("--batch-messages", type=int, default=25)
+    parser.add_argument("--braspress-share", type=float, default=0.1)
+    parser.add_argument("--duplicate-rate", type=float, default=0.05)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent")
+    parser.add_argument("--out", type=Path, default=None, help="Results JSON path")
+    parser.add_argument("--verbose", action="store_true", help="Show the bot's own output")
+    parser.add_argument("--run-size", type=int, default=None, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+# === Child process: one corpus size ===
+class _Stages:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tempos = {}
+
+    def add(self, etapa: str, segundos: float):
+        with self.lock:
+            self.tempos.setdefault(etapa, []).append(segundos)
+
+    def wrap(self, modulo, nome: str, etapa: str, por_item=None):
+        original = getattr(modulo, nome)
+
+        def _medido(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                dt = time.perf_counter() - inicio
+                self.add(etapa, dt)
+                if por_item:
+                    n = por_item(*args, **kwargs)
+                    if n:
+                        self.add(f"{etapa}_per_xml", dt / n)
+
+        setattr(modulo, nome, _medido)
+
+
+def _run_size(args) -> dict:
+    settings = {
+        "gmail_max_pages": 20,
+        "gmail_page_size": 500,
+        "gmail_batch_messages": args.batch_messages,
+        "xml_parse_workers": args.parse_workers,
+        "sheets_route_workers": args.route_workers,
+        "sheets_provision_months_ahead": 0,
+        "sheets_read_per_minute": 600,
+        "sheets_write_per_minute": 600,
+    }
+    appdata = _env.preparar(settings)
+
+    import fake_gmail
+    import fake_braspress
+
+    corpus = fake_gmail.gerar_corpus(
+        args.run_size,
+        seed=args.seed,
+        cnpjs_dest=(_env.CNPJ_EH, _env.CNPJ_MVA),
+        fracao_braspress=args.braspress_share,
+        taxa_duplicados=args.duplicate_rate,
+    )
+    portal = fake_braspress.instalar(corpus, latencia=args.braspress_latency)
+
+    import dry_run
+    import quota_pacer
+
+    cota = 60 if args.pacing else 0
+    sheets = dry_run.ativar(
+        appdata / "dry_run",
+        leituras_por_minuto=cota,
+        escritas_por_minuto=cota,
+        latencia=args.sheets_latency,
+        seed=args.seed,
+    )
+    quota_pacer.definir_ativo(args.pacing)
+    # Gmail is simulated too, so let the cycle apply labels and time that stage
+    dry_run.ATIVO = False
+
+    import gmail_fetcher
+    import sheets_writer
+    import xml_pool
+
+    etapas = _Stages()
+    etapas.wrap(gmail_fetcher, "_baixar_mensagem", "download")
+    etapas.wrap(gmail_fetcher, "parse_lote", "parse", por_item=lambda conteudos, *a, **k: len(conteudos))
+    etapas.wrap(gmail_fetcher, "provisionarVencimentos", "provision")
+    etapas.wrap(gmail_fetcher, "processarDocumento", "route")
+
+    gmail = fake_gmail.FakeGmailService(
+        corpus,
+        latencia=args.gmail_latency,
+        unidades_por_segundo=250 if args.pacing else 0,
+        seed=args.seed,
+    )
+    xml_pool.aquecer(args.parse_workers)
+
+    saida = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    inicio = time.perf_counter()
+    with saida:
+        gmail_fetcher.processarEmails(gmail, "Conta Principal")
+    duracao = time.perf_counter() - inicio
+
+    sheets_writer.encerrar()
+    xml_pool.encerrar()
+
+    for item in gmail.registro:
+        if item["op"] == "messages.modify":
+            etapas.add("label", item["duracao"])
+
+    n_msgs = len(corpus)
+    n_xml = sum(len(e["anexos"]) for e in corpus)
+    resumo_sheets = sheets.resumo()
+    resumo_gmail = gmail.resumo()
+    linhas = sum(max(0, aba._ultima_linha() - 1) for planilha in sheets.planilhas() for aba in planilha._abas)
+    return {
+        "size": args.run_size,
+        "messages": n_msgs,
+        "xmls": n_xml,
+        "seconds": round(duracao, 3),
+        "msgs_per_s": round(n_msgs / duracao, 2) if duracao else 0.0,
+        "xml_per_s": round(n_xml / duracao, 2) if duracao else 0.0,
+        "sheets_calls_per_doc": round(resumo_sheets["chamadas"] / max(1, n_xml), 3),
+        "gmail_calls_per_doc": round(resumo_gmail["chamadas"] / max(1, n_xml), 3),
+        "gmail_units_per_doc": round(resumo_gmail["unidades"] / max(1, n_xml), 3),
+        "braspress_lookups": portal.chamadas,
+        "rows_written": linhas,
+        "quota_wait_seconds": quota_pacer.resumo_ciclo()["wait_seconds"],
+        "stage_p50_ms": {k: round(_env.percentil(v, 50) * 1000, 3) for k, v in etapas.tempos.items()},
+        "stage_p95_ms": {k: round(_env.percentil(v, 95) * 1000, 3) for k, v in etapas.tempos.items()},
+        "stage_count": {k: len(v) for k, v in etapas.tempos.items()},
+        "sheets_calls": resumo_sheets["por_op"],
+        "gmail_calls": resumo_gmail["por_op"],
+        "peak_rss_mb": _env.pico_rss_mb(),
+    }
+
+
+# === Parent process ===
+def _metric(run: dict, nome: str):
+    atual = run
+    for parte in nome.split("."):
+        if not isinstance(atual, dict) or parte not in atual:
+            return None
+        atual = atual[parte]
+    return atual
+
+
+def _compare(runs: list[dict], baseline: dict, threshold: float) -> list[str]:
+    regressoes = []
+    base_por_tamanho = {r["size"]: r for r in baseline.get("runs", [])}
+    for run in runs:
+        base = base_por_tamanho.get(run["size"])
+        if not base:
+            continue
+        for nome, maior_melhor in METRICS.items():
+            atual, anterior = _metric(run, nome), _metric(base, nome)
+            if not atual or not anterior:
+                continue
+            delta = (atual - anterior) / anterior * 100.0
+            piorou = delta < -threshold if maior_melhor else delta > threshold
+            marca = "REGRESSION" if piorou else ""
+            print(f"  {run['size']:>6} {nome:<30} {anterior:>12} -> {atual:>12} ({delta:+.1f}%) {marca}")
+            if piorou:
+                regressoes.append(f"{run['size']}:{nome} {delta:+.1f}%")
+    return regressoes
+
+
+def _print_run(run: dict):
+    print(
+        f"[{run['size']:>6} XML] {run['seconds']:.2f}s | {run['msgs_per_s']} msg/s | {run['xml_per_s']} XML/s | "
+        f"sheets {run['sheets_calls_per_doc']} calls/doc | gmail {run['gmail_units_per_doc']} units/doc | "
+        f"rows {run['rows_written']} | braspress {run['braspress_lookups']} | peak RSS {run['peak_rss_mb']} MiB"
+    )
+    for etapa in sorted(run["stage_p50_ms"]):
+        print(
+            f"    {etapa:<16} p50 {run['stage_p50_ms'][etapa]:>9.3f} ms   "
+            f"p95 {run['stage_p95_ms'][etapa]:>9.3f} ms   n={run['stage_count'][etapa]}"
+        )
+
+
+def main(argv=None) -> int:
+    args = _parse_args(argv)
+
+    if args.run_size is not None:
+        resultado = _run_size(args)
+        Path(args.out).write_text(json.dumps(resultado), encoding="utf-8")
+        return 0
+
+    repassar = [a for a in (argv if argv is not None else sys.argv[1:])]
+    for flag in ("--save-baseline", "--fail-on-regression"):
+        while flag in repassar:
+            repassar.remove(flag)
+
+    runs = []
+    for tamanho in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            destino = Path(tmp) / "run.json"
+            cmd = [sys.executable, str(Path(__file__).resolve()), *repassar, "--run-size", str(tamanho), "--out", str(destino)]
+            proc = subprocess.run(cmd, cwd=str(_env.BASE_DIR))
+            if proc.returncode != 0 or not destino.exists():
+                print(f"[Bench] Run with {tamanho} XMLs failed (exit code {proc.returncode}).")
+                return proc.returncode or 1
+            run = json.loads(destino.read_text(encoding="utf-8"))
+        _print_run(run)
+        runs.append(run)
+
+    resultado = {
+        "benchmark": "cycle",
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items() if k not in ("run_size", "out", "baseline", "save_baseline", "fail_on_regression")},
+        "runs": runs,
+    }
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    destino = args.out or RESULTS_DIR / f"cycle-{datetime.now():%Y%m%d-%H%M%S}.json"
+    Path(destino).write_text(json.dumps(resultado, indent=2), encoding="utf-8")
+    print(f"[Bench] Results written to {destino}")
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(resultado, indent=2), encoding="utf-8")
+        print(f"[Bench] Baseline saved to {args.baseline}")
+        return 0
+
+    if args.baseline.exists():
+        print(f"[Bench] Comparing with {args.baseline} (threshold {args.threshold:.0f}%):")
+        regressoes = _compare(runs, json.loads(args.baseline.read_text(encoding="utf-8")), args.threshold)
+        if regressoes:
+            print(f"[Bench] {len(regressoes)} regression(s): {', '.join(regressoes)}")
+            if args.fail_on_regression:
+                return 1
+    else:
+        print(f"[Bench] No baseline at {args.baseline}; run with --save-baseline to create one.")
+        if args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+"""
+Micro-benchmarks for the processor hot path over a fixed synthetic corpus
+(fake_gmail, same seed = same XMLs):
+
+    python benchmarks/bench_micro.py                    # all cases
+    python benchmarks/bench_micro.py --only parse dedup # name prefixes
+    python benchmarks/bench_micro.py --save-baseline    # store current numbers
+
+Each case runs over the whole corpus per repetition, after --warmup untimed
+passes; times are reported per operation (min, median, p95, stdev).
+Nothing touches the network: Sheets writes are replaced by no-ops in the
+dispatch case and the ledger lives in a temporary APPDATA.
+"""
+
+import argparse
+import gc
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from pathlib import Path
+
+import _env
+
+RESULTS_DIR = _env.BENCH_DIR / "results"
+DEFAULT_BASELINE = _env.BENCH_DIR / "baseline_micro.json"
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="FinanceBot processor micro-benchmarks")
+    parser.add_argument("--xmls", type=int, default=500, help="Corpus size (XMLs)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--items", type=int, nargs=2, default=(1, 30), metavar=("MIN", "MAX"), help="Items per NF-e")
+    parser.add_argument("--repeat", type=int, default=15, help="Timed repetitions per case")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed repetitions per case")
+    parser.add_argument("--rows-per-tab", type=int, default=500, help="Existing rows per tab for the dedup cases")
+    parser.add_argument("--only", nargs="+", default=None, help="Run only cases whose name starts with these")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--out", type=Path, default=None, help="Results JSON path")
+    return parser.parse_args(argv)
+
+
+# === Corpus ===
+class _Corpus:
+    def __init__(self, args):
+        import fake_gmail
+        from xml_model import DocumentoNFe, ler_documento
+
+        emails = fake_gmail.gerar_corpus(
+            args.xmls,
+            seed=args.seed,
+            cnpjs_dest=(_env.CNPJ_EH, _env.CNPJ_MVA),
+            itens=tuple(args.items),
+            taxa_duplicados=0.0,
+        )
+        self.conteudos = [fake_gmail.conteudo_anexo(spec) for email in emails for spec in email["anexos"]]
+        self.pasta = Path(tempfile.mkdtemp(prefix="financebot-micro-"))
+        self.caminhos = []
+        for i, conteudo in enumerate(self.conteudos):
+            caminho = self.pasta / f"doc_{i:05d}.xml"
+            caminho.write_bytes(conteudo)
+            self.caminhos.append(str(caminho))
+        self.documentos = [ler_documento(c) for c in self.conteudos]
+        self.nfes = [d for d in self.documentos if isinstance(d, DocumentoNFe)]
+        self.parcelas = [(d, p) for d in self.nfes for p in d.parcelas]
+        self.bytes_total = sum(len(c) for c in self.conteudos)
+
+
+# === Cases ===
+def _casos(corpus: _Corpus, args) -> dict:
+    """name -> (operations per pass, callable running one pass)"""
+    import ledger_store
+    import processor
+    import xml_model
+    from sheets_utils import nome_aba_pt
+    from xml_model import DocumentoNFe, documento_de_root, ler_documento
+
+    casos = {}
+
+    def parse_stream():
+        for conteudo in corpus.conteudos:
+            ler_documento(conteudo)
+
+    def parse_tree():
+        for conteudo in corpus.conteudos:
+            documento_de_root(ET.fromstring(conteudo))
+
+    casos["parse.stream_bytes"] = (len(corpus.conteudos), parse_stream)
+    casos["parse.full_tree"] = (len(corpus.conteudos), parse_tree)
+
+    def fornecedor():
+        for caminho in corpus.caminhos:
+            processor.extrairFornecedor(caminho)
+
+    casos["extract.fornecedor"] = (len(corpus.caminhos), fornecedor)
+
+    # processarXML sem a escrita: leitura + validacao + despacho por tipo
+    def dispatch():
+        originais = processor.processarNFE, processor.processarCTE
+        processor.processarNFE = processor.processarCTE = lambda documento, filePath: True
+        try:
+            for caminho in corpus.caminhos:
+                processor.processarXML(caminho)
+        finally:
+            processor.processarNFE, processor.processarCTE = originais
+
+    casos["dispatch.processarXML"] = (len(corpus.caminhos), dispatch)
+
+    # <cobr> de cada NF-e ja separado: mede so a extracao das duplicatas pelo xml_model
+    cobrancas = []
+    for conteudo in corpus.conteudos:
+        cobr = next(ET.fromstring(conteudo).iter(xml_model._NFE_COBR), None)
+        if cobr is not None:
+            cobrancas.append(cobr)
+
+    def parcelas():
+        for cobr in cobrancas:
+            documento = DocumentoNFe()
+            xml_model._nfe_aplicar(documento, cobr)
+            for p in documento.parcelas:
+                datetime.strptime(p.vencimento, "%Y-%m-%d")
+
+    def vencimentos():
+        for documento in corpus.documentos:
+            processor.vencimentosDocumento(documento)
+
+    casos["extract.parcelas"] = (len(cobrancas), parcelas)
+    casos["extract.vencimentos"] = (len(corpus.documentos), vencimentos)
+
+    datas = [datetime.strptime(p.vencimento, "%Y-%m-%d") for _, p in corpus.parcelas]
+
+    def datas_aba():
+        for _, p in corpus.parcelas:
+            dt = datetime.strptime(p.vencimento, "%Y-%m-%d")
+            nome_aba_pt(dt)
+            dt.strftime("%d/%m/%Y")
+
+    def aba_somente():
+        for dt in datas:
+            nome_aba_pt(dt)
+
+    casos["date.parse_and_tab"] = (len(corpus.parcelas), datas_aba)
+    casos["date.nome_aba_pt"] = (len(datas), aba_somente)
+
+    # Duplicatas: aba com linhas existentes + todas as parcelas do corpus
+    abas = {}
+    for (documento, p), dt in zip(corpus.parcelas, datas):
+        chave = ("EH" if documento.cnpj_dest == _env.CNPJ_EH else "MVA", dt.year, nome_aba_pt(dt))
+        abas.setdefault(chave, [list(processor.CABECALHO_NF)]).append(
+            [dt.strftime("%d/%m/%Y"), documento.fornecedor, documento.numero, "", "", "", "", "", ""]
+        )
+    for (empresa, ano, aba), linhas in abas.items():
+        for n in range(args.rows_per_tab):
+            linhas.append([f"01/01/{ano}", "FORNECEDOR HISTORICO", f"H{n}", "", "", "", "", "", ""])
+        for linha in linhas[1:]:
+            ledger_store.registrar_lancamento(
+                {"empresa": empresa, "ano": ano, "aba": aba, "numero": linha[2], "vencimento": linha[0]}
+            )
+
+    consultas = []
+    for (documento, p), dt in zip(corpus.parcelas, datas):
+        empresa = "EH" if documento.cnpj_dest == _env.CNPJ_EH else "MVA"
+        consultas.append((empresa, dt.year, nome_aba_pt(dt), documento.numero, dt))
+
+    def dedup_scan():
+        for empresa, ano, aba, num, dt in consultas:
+            processor._parcela_na_aba(abas[(empresa, ano, aba)], num, dt.strftime("%d/%m/%Y"))
+
+    def dedup_ledger():
+        for empresa, ano, aba, num, dt in consultas:
+            ledger_store.ja_lancado(empresa, ano, aba, num, dt.strftime("%d/%m/%Y"))
+
+    indice = {chave: {(l[2].strip(), l[0].strip()) for l in linhas[1:]} for chave, linhas in abas.items()}
+
+    def dedup_set():
+        for empresa, ano, aba, num, dt in consultas:
+            (num, dt.strftime("%d/%m/%Y")) in indice[(empresa, ano, aba)]
+
+    casos["dedup.sheet_scan"] = (len(consultas), dedup_scan)
+    casos["dedup.ledger_ja_lancado"] = (len(consultas), dedup_ledger)
+    casos["dedup.set_index"] = (len(consultas), dedup_set)
+
+    def linhas_nf():
+        for (documento, p), dt in zip(corpus.parcelas, datas):
+            processor._linha_parcela(
+                dt.strftime("%d/%m/%Y"),
+                f"{documento.fornecedor} (Bot)",
+                documento.numero,
+                documento.valor_total,
+                len(documento.parcelas),
+                1,
+                p.valor,
+            )
+
+    casos["row.nf_format"] = (len(corpus.parcelas), linhas_nf)
+    return casos
+
+
+def _medir(n_ops: int, fn, repeat: int, warmup: int) -> dict:
+    for _ in range(warmup):
+        fn()
+    amostras = []
+    gc_ativo = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            inicio = time.perf_counter_ns()
+            fn()
+            amostras.append((time.perf_counter_ns() - inicio) / 1000.0 / max(1, n_ops))
+    finally:
+        if gc_ativo:
+            gc.enable()
+    return {
+        "ops": n_ops,
+        "min_us": round(min(amostras), 3),
+        "median_us": round(statistics.median(amostras), 3),
+        "p95_us": round(_env.percentil(amostras, 95), 3),
+        "stdev_us": round(statistics.stdev(amostras), 3) if len(amostras) > 1 else 0.0,
+    }
+
+
+def main(argv=None) -> int:
+    args = _parse_args(argv)
+    _env.preparar({}, prefix="financebot-micro-")
+
+    corpus = _Corpus(args)
+    print(
+        f"[Bench] Corpus: {len(corpus.conteudos)} XMLs ({len(corpus.nfes)} NF-e, "
+        f"{len(corpus.parcelas)} parcelas, {corpus.bytes_total / 1024:.0f} KiB), seed {args.seed}"
+    )
+    casos = _casos(corpus, args)
+    if args.only:
+        casos = {k: v for k, v in casos.items() if any(k.startswith(prefixo) for prefixo in args.only)}
+
+    resultados = {}
+    for nome, (n_ops, fn) in casos.items():
+        r = _medir(n_ops, fn, args.repeat, args.warmup)
+        resultados[nome] = r
+        print(
+            f"  {nome:<26} min {r['min_us']:>10.3f} us   median {r['median_us']:>10.3f} us   "
+            f"p95 {r['p95_us']:>10.3f} us   stdev {r['stdev_us']:>8.3f}   n={n_ops}"
+        )
+
+    resultado = {
+        "benchmark": "micro",
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items() if k not in ("out", "baseline", "save_baseline")},
+        "cases": resultados,
+    }
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    destino = args.out or RESULTS_DIR / f"micro-{datetime.now():%Y%m%d-%H%M%S}.json"
+    Path(destino).write_text(json.dumps(resultado, indent=2), encoding="utf-8")
+    print(f"[Bench] Results written to {destino}")
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(resultado, indent=2), encoding="utf-8")
+        print(f"[Bench] Baseline saved to {args.baseline}")
+    elif args.baseline.exists():
+        base = json.loads(args.baseline.read_text(encoding="utf-8")).get("cases", {})
+        print(f"[Bench] Median vs {args.baseline}:")
+        for nome, r in resultados.items():
+            anterior = base.get(nome, {}).get("median_us")
+            if anterior:
+                delta = (r["median_us"] - anterior) / anterior * 100.0
+                print(f"  {nome:<26} {anterior:>10.3f} -> {r['median_us']:>10.3f} us ({delta:+.1f}%)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+Checks extrair_tabela_rapida against the BeautifulSoup reference (extrair_tabela)
+on saved portal pages, and times both.
+
+    python benchmarks/check_braspress_extract.py                  # APPDATA/FinanceBot/braspress_archives (+ debug/*.html.gz)
+    python benchmarks/check_braspress_extract.py pages/ x.html    # files or directories
+    python benchmarks/check_braspress_extract.py --synthetic 200  # add generated pages
+
+Exits with 1 if any page gives a different result.
+"""
+
+import argparse
+import gzip
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+import _env
+
+sys.path.insert(0, str(_env.BASE_DIR))
+
+from braspress_html import extrair_tabela, extrair_tabela_rapida  # noqa: E402
+
+DEFAULT_DIR = Path(os.getenv("APPDATA", Path.home() / "AppData" / "Roaming")) / "FinanceBot" / "braspress_archives"
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Braspress invoice table extractor check")
+    parser.add_argument("paths", nargs="*", type=Path, help="HTML files or directories (default: archive dir)")
+    parser.add_argument("--synthetic", type=int, default=0, help="Also check N generated pages")
+    parser.add_argument("--rows", type=int, default=40, help="Max invoice rows per generated page")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5, help="Timed repetitions per page")
+    return parser.parse_args(argv)
+
+
+def _pagina_sintetica(rng: random.Random, linhas: int) -> str:
+    """Page shaped like the portal list: layout table, header row, invoice rows with markup noise."""
+    corpo = []
+    for _ in range(rng.randint(0, linhas)):
+        fatura = f"{rng.randint(1, 99999999):08d}"
+        venc = f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(2024, 2027)}"
+        valor = f"R$&nbsp;{rng.randint(10, 99999):,}.{rng.randint(0, 99):02d}".replace(",", "X").replace(".", ",").replace("X", ".")
+        fatura_html = rng.choice([fatura, f"<a href='/fat?id={fatura}' title=\"abrir > fatura\">{fatura}</a>", f" <b>{fatura}</b> "])
+        corpo.append(
+            f"<tr class='linha'>\n  <td>{fatura_html}</td><td align=\"center\">{venc}</td>"
+            f"<td> {valor} </td><td><input type='checkbox' value='{fatura}'></td>\n</tr>"
+        )
+    vazia = "" if corpo else "<tr><td colspan='4'>Nenhum t&iacute;tulo em aberto</td></tr>"
+    return (
+        "<html><head><title>Faturas</title></head><body>"
+        "<table class='menu'><tr><td>Menu</td><td>Minhas Faturas</td></tr></table>"
+        "<!-- <table><tr><td>1</td><td>x</td><td>y</td></tr></table> -->"
+        "<table id='faturas'><thead><tr><th>Fatura</th><th>Vencimento</th><th>Valor</th></tr></thead><tbody>"
+        + "".join(corpo)
+        + vazia
+        + "</tbody></table></body></html>"
+    )
+
+
+def _paginas(args):
+    caminhos = args.paths or ([DEFAULT_DIR] if DEFAULT_DIR.exists() else [])
+    for caminho in caminhos:
+        # Legacy debug_faturas_*.html and the gzip ring archive (debug/*.html.gz)
+        arquivos = sorted(caminho.glob("*.html")) + sorted(caminho.glob("debug/*.html.gz")) if caminho.is_dir() else [caminho]
+        for arquivo in arquivos:
+            if arquivo.suffix == ".gz":
+                with gzip.open(arquivo, "rb") as f:
+                    yield arquivo.name, f.read().decode("utf-8", errors="replace")
+            else:
+                yield arquivo.name, arquivo.read_text(encoding="utf-8", errors="replace")
+    rng = random.Random(args.seed)
+    for i in range(args.synthetic):
+        yield f"synthetic-{i:04d}", _pagina_sintetica(rng, args.rows)
+
+
+def _tempo(fn, html: str, repeat: int) -> float:
+    melhor = float("inf")
+    for _ in range(max(1, repeat)):
+        inicio = time.perf_counter()
+        fn(html)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+def main(argv=None) -> int:
+    args = _parse_args(argv)
+    total = divergentes = linhas = 0
+    t_ref = t_rapida = 0.0
+    for nome, html in _paginas(args):
+        total += 1
+        esperado, obtido = extrair_tabela(html), extrair_tabela_rapida(html)
+        linhas += len(esperado)
+        if esperado != obtido:
+            divergentes += 1
+            print(f"[Bench] MISMATCH {nome}: reference {len(esperado)} row(s), fast {len(obtido)} row(s)")
+            for a, b in zip(esperado, obtido):
+                if a != b:
+                    print(f"    reference {a!r}\n    fast      {b!r}")
+                    break
+            continue
+        t_ref += _tempo(extrair_tabela, html, args.repeat)
+        t_rapida += _tempo(extrair_tabela_rapida, html, args.repeat)
+
+    if not total:
+        print(f"[Bench] No pages found (looked in {DEFAULT_DIR}); pass paths or --synthetic N.")
+        return 0
+    print(f"[Bench] {total} page(s), {linhas} invoice row(s), {divergentes} mismatch(es)")
+    if t_rapida:
+        print(
+            f"[Bench] extrair_tabela {t_ref * 1000:.2f} ms | extrair_tabela_rapida {t_rapida * 1000:.2f} ms "
+            f"| {t_ref / t_rapida:.1f}x (best of {args.repeat}, matching pages)"
+        )
+    return 1 if divergentes else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""
+Checks the persistent-browser login flow (braspress_browser._login) against a
+scripted stand-in for the portal page, without Playwright or network:
+
+    python benchmarks/check_braspress_login.py
+
+Cases: first login, warm context reused, and a forced login while the warm
+context is still logged in (what renovar_sessao does before cookies expire).
+Exits with 1 if any case fails.
+"""
+
+import sys
+
+import _env
+
+sys.path.insert(0, str(_env.BASE_DIR))
+
+import braspress_browser  # noqa: E402
+
+
+class _Frame:
+    def __init__(self, contexto):
+        self.url = braspress_browser.FRAME_ORIGIN + "/site/login"
+        self.contexto = contexto
+        self.campos = {}
+
+    def content(self):
+        if self.contexto.logado:
+            return "<h1>Minhas Faturas</h1>"
+        return "<form><input name='login'><input name='pass'><input type='submit'></form>"
+
+    def fill(self, seletor, valor):
+        if self.contexto.logado:
+            raise TimeoutError(f"fill {seletor}: formulario de login ausente")
+        self.campos[seletor] = valor
+
+    def click(self, seletor):
+        if self.campos.get("input[name='pass']") == self.contexto.navegador.senha:
+            self.contexto.logado = True
+            self.contexto.navegador.logins += 1
+
+    def wait_for_load_state(self, *args, **kwargs):
+        pass
+
+
+class _Pagina:
+    def __init__(self, contexto):
+        self.frames = [_Frame(contexto)]
+
+    def goto(self, url, timeout=None):
+        pass
+
+    def wait_for_selector(self, seletor, timeout=None):
+        pass
+
+
+class _Contexto:
+    def __init__(self, navegador):
+        self.navegador = navegador
+        self.logado = False
+        self.fechado = False
+        self.pages = []
+
+    def new_page(self):
+        pagina = _Pagina(self)
+        self.pages.append(pagina)
+        return pagina
+
+    def cookies(self):
+        return [{"name": "sessao", "value": str(self.navegador.logins), "domain": "blue.braspress.com"}]
+
+    def close(self):
+        self.fechado = True
+
+
+class _Navegador:
+    def __init__(self, senha):
+        self.senha = senha
+        self.logins = 0
+
+    def new_context(self):
+        return _Contexto(self)
+
+
+def _casos():
+    navegador = _Navegador("segredo")
+    contextos = {}
+    cnpj = _env.CNPJ_EH
+
+    cookies, relogou = braspress_browser._login(navegador, contextos, cnpj, "segredo", False)
+    yield "first login fills the form", relogou and navegador.logins == 1
+
+    cookies, relogou = braspress_browser._login(navegador, contextos, cnpj, "segredo", False)
+    yield "warm context is reused", not relogou and navegador.logins == 1
+
+    anterior = contextos[cnpj]
+    cookies, relogou = braspress_browser._login(navegador, contextos, cnpj, "segredo", True)
+    yield (
+        "forced login while still logged in",
+        relogou and navegador.logins == 2 and anterior.fechado and contextos[cnpj] is not anterior,
+    )
+    yield "forced login returns the new session", cookies[0]["value"] == "2"
+
+
+def main() -> int:
+    falhas = 0
+    try:
+        for nome, ok in _casos():
+            print(f"  {'ok  ' if ok else 'FAIL'} {nome}")
+            falhas += not ok
+    except Exception as e:
+        print(f"  FAIL {e.__class__.__name__}: {e}")
+        falhas += 1
+    print(f"[Check] {falhas} failure(s).")
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
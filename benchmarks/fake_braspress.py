@@ -0,0 +1,61 @@
+"""Stand-in for the Braspress portal (replaces login_braspress_frame in benchmarks)."""
+
+import sys
+import tempfile
+import threading
+import time
+import types
+from datetime import timedelta
+from pathlib import Path
+
+from fake_gmail import conteudo_anexo
+from xml_model import ler_documento
+
+
+def _valor_br(valor: float) -> str:
+    return "R$ " + f"{valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def faturas_do_corpus(corpus: list[dict]) -> dict[str, list[tuple[str, str, str]]]:
+    """One open invoice per Braspress CT-e in the corpus, keyed by destination CNPJ."""
+    por_cnpj = {}
+    vistos = set()
+    for email in corpus:
+        for spec in email["anexos"]:
+            if spec["tipo"] != "cte" or not spec.get("braspress") or spec["numero"] in vistos:
+                continue
+            vistos.add(spec["numero"])
+            doc = ler_documento(conteudo_anexo(spec))
+            venc = spec["data_base"] + timedelta(days=20)
+            por_cnpj.setdefault(spec["cnpj_dest"], []).append(
+                (f"{spec['numero']:08d}", venc.strftime("%d/%m/%Y"), _valor_br(doc.valor_total))
+            )
+    return por_cnpj
+
+
+def instalar(corpus: list[dict], latencia: float = 0.3) -> types.ModuleType:
+    """
+    Registers a fake `login_braspress_frame` module in sys.modules, so
+    braspress_utils imports it instead of the Playwright/requests client.
+    Must run before braspress_utils is imported.
+    """
+    faturas = faturas_do_corpus(corpus)
+    lock = threading.Lock()
+    modulo = types.ModuleType("login_braspress_frame")
+    modulo.chamadas = 0
+    modulo.faturas = faturas
+
+    def obter_faturas(cnpj):
+        if latencia:
+            time.sleep(latencia)
+        with lock:
+            modulo.chamadas += 1
+        return list(faturas.get(str(cnpj), []))
+
+    modulo.obter_faturas = obter_faturas
+    modulo.inicializar = lambda: None
+    modulo.ARCHIVE_DIR = Path(tempfile.mkdtemp(prefix="fake-braspress-"))
+    modulo.renovar_sessao = lambda cnpj, margem=0: False
+    modulo.COOKIES_FILES = {cnpj: None for cnpj in faturas}
+    sys.modules["login_braspress_frame"] = modulo
+    return modulo
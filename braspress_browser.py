@@ -0,0 +1,273 @@
+"""
+Navegador persistente para o login no portal Braspress.
+
+O Chromium (Playwright) roda em um processo dedicado, aberto na primeira
+necessidade e mantido vivo entre ciclos, com um contexto por CNPJ. Pedidos de
+login chegam por um Pipe local; se o contexto ainda estiver autenticado os
+cookies sao devolvidos sem refazer o login.
+
+Processo separado porque a API sync do Playwright (greenlet) nao pode ser
+usada a partir das threads do bot. Este modulo nao importa config: e o que o
+worker carrega no spawn.
+"""
+
+import multiprocessing
+import sys
+import threading
+import time
+from pathlib import Path
+
+
+MAIN_URL = "https://www.braspress.com/area-do-cliente/minha-conta/"
+FRAME_ORIGIN = "https://blue.braspress.com"
+
+TIMEOUT_LOGIN = 180
+TIMEOUT_ENCERRAR = 10
+
+_LOCK = threading.Lock()  # um pedido por vez no Pipe
+_CONTROLE = threading.Lock()  # inicio/parada do processo; nao espera o pedido em curso
+_encerrado = threading.Event()
+_processo = None
+_conexao = None
+
+
+def _get_sync_playwright():
+    try:
+        from playwright.sync_api import sync_playwright as _sync_playwright
+        return _sync_playwright
+    except Exception as e:
+        raise RuntimeError(
+            "Playwright/greenlet indisponivel no servidor. "
+            "Reinstale dependencias com: "
+            "pip install --upgrade pip setuptools wheel ; "
+            "pip install --force-reinstall --no-cache-dir playwright greenlet ; "
+            "python -m playwright install chromium"
+        ) from e
+
+
+def localizar_chromium() -> str | None:
+    """Chromium empacotado junto ao executavel (PyInstaller), se houver."""
+    if getattr(sys, "frozen", False):
+        base_path = Path(sys._MEIPASS) if hasattr(sys, "_MEIPASS") else Path(sys.executable).parent
+    else:
+        base_path = Path(__file__).resolve().parent
+
+    local_browser_path = base_path / "playwright" / ".local-browsers"
+    chrome_exec = next(local_browser_path.rglob("headless_shell.exe"), None) if local_browser_path.exists() else None
+    return str(chrome_exec) if chrome_exec and chrome_exec.exists() else None
+
+
+# === Lado do worker (processo dedicado) ===
+def _lancar(p, chrome_exec):
+    if chrome_exec:
+        print(f"[Braspress] Usando Chromium empacotado: {chrome_exec}")
+        return p.chromium.launch(headless=True, executable_path=chrome_exec)
+    try:
+        return p.chromium.launch(channel="chromium", headless=True)
+    except Exception:
+        return p.chromium.launch(headless=True)
+
+
+def _frame_login(page):
+    for f in page.frames:
+        if FRAME_ORIGIN in (f.url or ""):
+            return f
+    return None
+
+
+def _logado(frame) -> bool:
+    try:
+        return "minhas faturas" in frame.content().lower()
+    except Exception:
+        return False
+
+
+def _login(browser, contextos: dict, cnpj: str, senha: str, forcar: bool):
+    """Retorna (cookies, relogou). Reaproveita o contexto do CNPJ se ainda autenticado."""
+    if forcar:
+        # Contexto ainda logado abre no painel, sem formulario: o login forcado
+        # (renovacao antes de expirar, cookies recusados) comeca de um contexto novo
+        _fechar_contexto(contextos, cnpj)
+    contexto = contextos.get(cnpj)
+    if contexto is None:
+        contexto = contextos[cnpj] = browser.new_context()
+    page = contexto.pages[0] if contexto.pages else contexto.new_page()
+
+    page.goto(MAIN_URL, timeout=60000)
+    page.wait_for_selector("iframe", timeout=15000)
+    frame = _frame_login(page)
+    if not frame:
+        raise RuntimeError("Frame de login da Braspress nao encontrado.")
+
+    if not forcar and _logado(frame):
+        return contexto.cookies(), False
+
+    print(f"[*] Preenchendo login da Braspress para {cnpj}...")
+    frame.fill("input[name='login']", cnpj)
+    frame.fill("input[name='pass']", senha)
+    frame.click("input[type='submit']")
+    time.sleep(5)
+
+    try:
+        frame.wait_for_load_state("networkidle", timeout=15000)
+    except Exception:
+        pass
+
+    if not _logado(frame):
+        raise RuntimeError(f"Login falhou para CNPJ {cnpj}.")
+    return contexto.cookies(), True
+
+
+def _fechar_contexto(contextos: dict, cnpj):
+    contexto = contextos.pop(cnpj, None)
+    if contexto is not None:
+        try:
+            contexto.close()
+        except Exception:
+            pass
+
+
+def _servir(conexao, chrome_exec):
+    """Loop do processo dedicado: um navegador, um contexto por CNPJ, pedidos pelo Pipe."""
+    contextos = {}
+    browser = None
+    with _get_sync_playwright()() as p:
+        while True:
+            try:
+                pedido = conexao.recv()
+            except (EOFError, OSError):
+                break
+
+            op = pedido.get("op")
+            if op == "encerrar":
+                conexao.send({"ok": True})
+                break
+
+            try:
+                if browser is None or not browser.is_connected():
+                    contextos.clear()
+                    browser = _lancar(p, chrome_exec)
+                if op == "aquecer":
+                    conexao.send({"ok": True, "contextos": len(contextos)})
+                elif op == "login":
+                    cookies, relogou = _login(browser, contextos, pedido["cnpj"], pedido["senha"], pedido.get("forcar", False))
+                    conexao.send({"ok": True, "cookies": cookies, "relogou": relogou})
+                else:
+                    conexao.send({"ok": False, "erro": f"Operacao desconhecida: {op}"})
+            except Exception as e:
+                # Contexto pode ter ficado em estado incerto: o proximo pedido comeca do zero
+                _fechar_contexto(contextos, pedido.get("cnpj"))
+                conexao.send({"ok": False, "erro": str(e) or e.__class__.__name__})
+
+        for cnpj in list(contextos):
+            _fechar_contexto(contextos, cnpj)
+        if browser is not None:
+            try:
+                browser.close()
+            except Exception:
+                pass
+
+
+# === Lado do bot ===
+def _iniciar():
+    global _processo, _conexao
+    ctx = multiprocessing.get_context("spawn")
+    pai, filho = ctx.Pipe()
+    _processo = ctx.Process(target=_servir, args=(filho, localizar_chromium()), name="braspress-browser", daemon=True)
+    _processo.start()
+    filho.close()
+    _conexao = pai
+    print(f"[Braspress] Navegador persistente iniciado (pid {_processo.pid}).")
+
+
+def _parar():
+    """Chamar com _CONTROLE. Processo antes da conexao: quem espera no poll recebe EOF."""
+    global _processo, _conexao
+    if _processo is not None and _processo.is_alive():
+        _processo.terminate()
+        _processo.join(TIMEOUT_ENCERRAR)
+    if _conexao is not None:
+        try:
+            _conexao.close()
+        except Exception:
+            pass
+    _processo = None
+    _conexao = None
+
+
+def _pedir(pedido: dict, timeout: float) -> dict:
+    """Envia um pedido ao worker (um por vez), reiniciando-o uma vez se o processo caiu."""
+    with _LOCK:
+        for tentativa in range(2):
+            with _CONTROLE:
+                if _encerrado.is_set():
+                    raise RuntimeError("Navegador Braspress encerrado.")
+                if _processo is None or not _processo.is_alive():
+                    _parar()
+                    _iniciar()
+                conexao = _conexao
+            try:
+                conexao.send(pedido)
+                if not conexao.poll(timeout):
+                    with _CONTROLE:
+                        _parar()
+                    raise RuntimeError(f"Navegador Braspress nao respondeu em {timeout:.0f}s.")
+                return conexao.recv()
+            except (EOFError, OSError) as e:
+                with _CONTROLE:
+                    _parar()
+                if tentativa or _encerrado.is_set():
+                    raise RuntimeError(f"Navegador Braspress indisponivel: {e}") from e
+    return {"ok": False, "erro": "Navegador Braspress indisponivel."}
+
+
+def login(cnpj: str, senha: str, forcar: bool = False, timeout: float = TIMEOUT_LOGIN) -> list[dict]:
+    """
+    Cookies autenticados do portal para o CNPJ. So preenche o formulario se o
+    contexto persistente nao estiver mais logado (ou se forcar=True).
+    """
+    resposta = _pedir({"op": "login", "cnpj": str(cnpj), "senha": senha, "forcar": bool(forcar)}, timeout)
+    if not resposta.get("ok"):
+        raise RuntimeError(resposta.get("erro") or f"Login falhou para CNPJ {cnpj}.")
+    if resposta.get("relogou"):
+        print(f"[Braspress] Login concluido para CNPJ {cnpj}.")
+    else:
+        print(f"[Braspress] Sessao do navegador ainda valida para CNPJ {cnpj}.")
+    return resposta["cookies"]
+
+
+def aquecer(timeout: float = TIMEOUT_LOGIN) -> bool:
+    """Sobe o processo e o Chromium antecipadamente (fora do caminho do ciclo)."""
+    try:
+        resposta = _pedir({"op": "aquecer"}, timeout)
+    except Exception as e:
+        print(f"[Braspress] Falha ao iniciar navegador persistente: {e}")
+        return False
+    if not resposta.get("ok"):
+        print(f"[Braspress] Falha ao iniciar navegador persistente: {resposta.get('erro')}")
+    return bool(resposta.get("ok"))
+
+
+def encerrar():
+    """
+    Fecha o navegador; pedidos seguintes falham. Com um pedido em andamento (um
+    login pode levar minutos) o processo e terminado e o pedido falha na hora.
+    """
+    _encerrado.set()
+    if not _LOCK.acquire(blocking=False):
+        with _CONTROLE:
+            _parar()
+        return
+    try:
+        with _CONTROLE:
+            if _processo is not None and _processo.is_alive() and _conexao is not None:
+                try:
+                    _conexao.send({"op": "encerrar"})
+                    if _conexao.poll(TIMEOUT_ENCERRAR):
+                        _conexao.recv()
+                    _processo.join(TIMEOUT_ENCERRAR)
+                except Exception:
+                    pass
+            _parar()
+    finally:
+        _LOCK.release()
@@ -0,0 +1,178 @@
+"""
+Arquivo circular das paginas de faturas do portal Braspress (depuracao).
+
+obter_faturas entrega o HTML para capturar(), que so enfileira: uma thread
+grava cada pagina comprimida (gzip) em <ARCHIVE_DIR>/debug e apaga as mais
+antigas quando passa do limite de arquivos ou de bytes. Fila cheia descarta a
+captura em vez de segurar a consulta. O painel le as ultimas N com ultimas().
+"""
+
+import gzip
+import queue
+import re
+import threading
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+
+
+_RE_NOME = re.compile(r"^(\d{8})-(\w+)-(\d{14})\.html\.gz$")
+_FILA_MAX = 32
+
+_lock = threading.Lock()
+_fila = queue.Queue(maxsize=_FILA_MAX)
+_thread = None
+_pasta = None
+_ativo = False
+_max_bytes = 20 * 1024 * 1024
+_max_arquivos = 200
+_arquivos = deque()  # (nome, tamanho), do mais antigo para o mais novo
+_total_bytes = 0
+_seq = 0
+_descartadas = 0
+
+
+def configurar(pasta, ativo: bool = True, max_mb: int = 20, max_arquivos: int = 200):
+    """Chamado na inicializacao do servico Braspress (le a pasta existente uma vez)."""
+    global _pasta, _ativo, _max_bytes, _max_arquivos, _total_bytes, _seq
+    with _lock:
+        _pasta = Path(pasta) / "debug"
+        _ativo = bool(ativo)
+        _max_bytes = max(1, int(max_mb)) * 1024 * 1024
+        _max_arquivos = max(1, int(max_arquivos))
+        _arquivos.clear()
+        _total_bytes = 0
+        if _pasta.is_dir():
+            for arquivo in sorted(_pasta.glob("*.html.gz")):
+                m = _RE_NOME.match(arquivo.name)
+                if not m:
+                    continue
+                tamanho = arquivo.stat().st_size
+                _arquivos.append((arquivo.name, tamanho))
+                _total_bytes += tamanho
+                _seq = max(_seq, int(m.group(1)))
+
+
+def capturar(cnpj: str, html: str) -> str | None:
+    """Enfileira a pagina; retorna o nome que ela tera no arquivo (None se desativado/descartada)."""
+    global _seq, _descartadas
+    if not _ativo or _pasta is None:
+        return None
+    with _lock:
+        _seq += 1
+        cnpj_limpo = re.sub(r"\W", "", str(cnpj)) or "x"
+        nome = f"{_seq:08d}-{cnpj_limpo}-{datetime.now().strftime('%Y%m%d%H%M%S')}.html.gz"
+    if not _submeter((nome, html)):
+        with _lock:
+            _descartadas += 1
+        return None
+    return nome
+
+
+def _submeter(item) -> bool:
+    global _thread
+    with _lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_loop, name="braspress-debug", daemon=True)
+            _thread.start()
+    try:
+        _fila.put_nowait(item)
+        return True
+    except queue.Full:
+        return False
+
+
+def _gravar(nome: str, html: str):
+    global _total_bytes
+    _pasta.mkdir(parents=True, exist_ok=True)
+    destino = _pasta / nome
+    temporario = destino.with_suffix(".tmp")
+    with gzip.open(temporario, "wb", compresslevel=6) as f:
+        f.write(html.encode("utf-8"))
+    temporario.replace(destino)
+    tamanho = destino.stat().st_size
+
+    with _lock:
+        _arquivos.append((nome, tamanho))
+        _total_bytes += tamanho
+        remover = []
+        while len(_arquivos) > 1 and (len(_arquivos) > _max_arquivos or _total_bytes > _max_bytes):
+            antigo, tam_antigo = _arquivos.popleft()
+            _total_bytes -= tam_antigo
+            remover.append(antigo)
+    for antigo in remover:
+        try:
+            (_pasta / antigo).unlink()
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"[Braspress] Falha ao remover captura {antigo}: {e}")
+
+
+def _loop():
+    while True:
+        item = _fila.get()
+        try:
+            if item is None:
+                return
+            _gravar(*item)
+        except Exception as e:
+            print(f"[Braspress] Falha ao gravar captura de debug: {e}")
+        finally:
+            _fila.task_done()
+
+
+def encerrar(timeout: float = 5.0):
+    """Grava o que estiver na fila (ate timeout) e para a thread."""
+    global _thread
+    with _lock:
+        thread = _thread
+        _thread = None
+    if thread is None or not thread.is_alive():
+        return
+    try:
+        _fila.put(None, timeout=timeout)
+    except queue.Full:
+        return
+    thread.join(timeout)
+
+
+def ultimas(n: int = 10, cnpj: str = "", conteudo: bool = True) -> list[dict]:
+    """Ultimas N capturas (mais nova primeiro), opcionalmente de um CNPJ."""
+    with _lock:
+        candidatos = list(_arquivos)
+        pasta = _pasta
+    saida = []
+    for nome, tamanho in reversed(candidatos):
+        if len(saida) >= max(0, int(n)):
+            break
+        m = _RE_NOME.match(nome)
+        if not m or (cnpj and m.group(2) != cnpj):
+            continue
+        item = {
+            "name": nome,
+            "cnpj": m.group(2),
+            "at": datetime.strptime(m.group(3), "%Y%m%d%H%M%S").isoformat(),
+            "compressed_bytes": tamanho,
+        }
+        if conteudo:
+            try:
+                with gzip.open(pasta / nome, "rb") as f:
+                    item["html"] = f.read().decode("utf-8", errors="replace")
+            except FileNotFoundError:
+                continue
+        saida.append(item)
+    return saida
+
+
+def estatisticas() -> dict:
+    with _lock:
+        return {
+            "enabled": _ativo,
+            "files": len(_arquivos),
+            "bytes": _total_bytes,
+            "max_files": _max_arquivos,
+            "max_bytes": _max_bytes,
+            "pending": _fila.qsize(),
+            "dropped": _descartadas,
+        }
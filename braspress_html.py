@@ -0,0 +1,74 @@
+"""
+Extracao das faturas (fatura, vencimento, valor) do HTML do portal Braspress.
+
+extrair_tabela_rapida percorre so os blocos <table> com expressoes regulares,
+sem montar a arvore do documento. Se a marcacao de uma tabela fugir do
+formato simples (tabela aninhada, tags sem fechamento, script), cai para
+extrair_tabela (BeautifulSoup), que continua sendo a referencia.
+"""
+
+import html as html_lib
+import re
+
+
+_RE_COMENTARIO = re.compile(r"<!--.*?-->", re.S)
+# Atributos entre aspas podem conter ">" (title="a > b"): as tags sao casadas como em _RE_TAG
+_ATRIBUTOS = r"""(?:"[^"]*"|'[^']*'|[^'">])*"""
+_RE_TABELA = re.compile(rf"<table\b{_ATRIBUTOS}>(.*?)</table\s*>", re.S | re.I)
+_RE_LINHA = re.compile(rf"<tr\b{_ATRIBUTOS}>(.*?)</tr\s*>", re.S | re.I)
+_RE_CELULA = re.compile(rf"<td\b{_ATRIBUTOS}>(.*?)</td\s*>", re.S | re.I)
+_RE_TAG = re.compile(rf"<{_ATRIBUTOS}>")
+_RE_ABRE_TR = re.compile(r"<tr\b", re.I)
+_RE_FECHA_TR = re.compile(r"</tr\s*>", re.I)
+_RE_ABRE_TD = re.compile(r"<td\b", re.I)
+_RE_FECHA_TD = re.compile(r"</td\s*>", re.I)
+_RE_IRREGULAR = re.compile(r"<(?:table|script|style|textarea)\b", re.I)
+_RE_ABRE_TABELA = re.compile(r"<table\b", re.I)
+_RE_DIGITO = re.compile(r"\d")
+
+
+def extrair_tabela(html: str):
+    """Extrai dados de Fatura, Vencimento e Valor do HTML retornado."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    dados = []
+    for linha in soup.select("table tr"):
+        cols = [c.get_text(strip=True) for c in linha.find_all("td")]
+        if len(cols) >= 3 and re.search(r"\d", cols[0]):
+            dados.append((cols[0], cols[1], cols[2]))
+    return dados
+
+
+def _texto_celula(trecho: str) -> str:
+    # Mesmo resultado de get_text(strip=True): cada texto entre tags aparado e concatenado
+    partes = (html_lib.unescape(t).strip() for t in _RE_TAG.split(trecho))
+    return "".join(p for p in partes if p)
+
+
+def _tabela_simples(corpo: str) -> bool:
+    return (
+        not _RE_IRREGULAR.search(corpo)
+        and len(_RE_ABRE_TR.findall(corpo)) == len(_RE_FECHA_TR.findall(corpo))
+        and len(_RE_ABRE_TD.findall(corpo)) == len(_RE_FECHA_TD.findall(corpo))
+    )
+
+
+def extrair_tabela_rapida(html: str):
+    """Mesmo resultado de extrair_tabela, lendo apenas as linhas das tabelas."""
+    if "<!--" in html:
+        html = _RE_COMENTARIO.sub("", html)
+
+    tabelas = _RE_TABELA.findall(html)
+    if len(tabelas) != len(_RE_ABRE_TABELA.findall(html)):
+        return extrair_tabela(html)
+
+    dados = []
+    for corpo in tabelas:
+        if not _tabela_simples(corpo):
+            return extrair_tabela(html)
+        for linha in _RE_LINHA.finditer(corpo):
+            cols = [_texto_celula(c.group(1)) for c in _RE_CELULA.finditer(linha.group(1))]
+            if len(cols) >= 3 and _RE_DIGITO.search(cols[0]):
+                dados.append((cols[0], cols[1], cols[2]))
+    return dados
@@ -0,0 +1,176 @@
+"""
+Casamento de CT-e Braspress com as faturas em aberto do portal.
+
+As faturas de cada CNPJ ficam indexadas por valor em centavos; um CT-e olha
+so as faixas dentro da tolerancia. Em lote, todos os pares (CT-e, fatura)
+possiveis sao ordenados (menor diferenca, vencimento mais antigo, numero da
+fatura, id_cte) e atribuidos nessa ordem, cada fatura a um unico CT-e,
+o que torna o resultado deterministico. Faturas consumidas ficam marcadas
+enquanto continuarem em aberto no portal.
+
+Nao depende de Playwright/requests: pode ser importado em qualquer ambiente.
+"""
+
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+
+# Diferenca aceita entre o valor do CT-e e o da fatura (< R$ 0,05)
+TOLERANCIA_CENTAVOS = 4
+
+
+@dataclass(slots=True)
+class Casamento:
+    fatura: dict | None
+    candidatas: int = 0
+    diferenca_centavos: int | None = None
+
+    @property
+    def ambiguo(self) -> bool:
+        return self.candidatas > 1
+
+
+def centavos(valor) -> int | None:
+    try:
+        dec = valor if isinstance(valor, Decimal) else Decimal(str(valor))
+        return int((dec * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+    except (InvalidOperation, ValueError, TypeError):
+        return None
+
+
+def id_cte(chave: str, numero: str, cnpj_emit: str) -> str:
+    """Identificador do CT-e no casamento: a chave de acesso ou, sem ela, emitente + numero."""
+    chave = str(chave or "").strip()
+    if chave:
+        return chave
+    numero = str(numero or "").strip()
+    if not numero or numero == "-":
+        return ""
+    return f"{str(cnpj_emit or '').strip()}/{numero}"
+
+
+def _id_fatura(fatura: dict) -> tuple[str, str]:
+    return str(fatura.get("fatura", "")).strip(), str(fatura.get("vencimento", "")).strip()
+
+
+def _ordem_fatura(fatura: dict) -> tuple:
+    numero, venc = _id_fatura(fatura)
+    partes = venc.split("/")
+    if len(partes) == 3 and all(p.isdigit() for p in partes):
+        data = (int(partes[2]), int(partes[1]), int(partes[0]))
+    else:
+        data = (9999, 99, 99)
+    return data, numero
+
+
+class CasadorFaturas:
+    """Indice das faturas em aberto de um CNPJ por valor em centavos."""
+
+    def __init__(self, faturas: list[dict], tolerancia: int = TOLERANCIA_CENTAVOS, consumidas=None):
+        self.tolerancia = max(0, int(tolerancia))
+        self.assinatura = frozenset(_id_fatura(f) for f in faturas)
+        self.consumidas = set(consumidas or ()) & self.assinatura
+        self._faixas = defaultdict(list)
+        for fatura in faturas:
+            valor = centavos(fatura.get("valor"))
+            if valor is not None:
+                self._faixas[valor].append(fatura)
+        for lista in self._faixas.values():
+            lista.sort(key=_ordem_fatura)
+
+    def candidatas(self, valor_centavos: int) -> list[tuple[int, dict]]:
+        """[(diferenca, fatura)] livres dentro da tolerancia, na ordem de preferencia."""
+        saida = []
+        for delta in range(-self.tolerancia, self.tolerancia + 1):
+            for fatura in self._faixas.get(valor_centavos + delta, ()):
+                if _id_fatura(fatura) not in self.consumidas:
+                    saida.append((abs(delta), fatura))
+        saida.sort(key=lambda par: (par[0], _ordem_fatura(par[1])))
+        return saida
+
+    def casar(self, valor) -> Casamento:
+        valor_centavos = centavos(valor)
+        opcoes = self.candidatas(valor_centavos) if valor_centavos is not None else []
+        if not opcoes:
+            return Casamento(None)
+        diferenca, fatura = opcoes[0]
+        self.consumidas.add(_id_fatura(fatura))
+        return Casamento(fatura, len(opcoes), diferenca)
+
+    def casar_lote(self, ctes: list[tuple[str, object]]) -> dict[str, Casamento]:
+        """ctes: [(chave do CT-e, valor)]. Cada fatura vai para no maximo um CT-e."""
+        pares = []
+        contagem = {}
+        for chave, valor in ctes:
+            chave = str(chave)
+            if chave in contagem:
+                continue
+            valor_centavos = centavos(valor)
+            opcoes = self.candidatas(valor_centavos) if valor_centavos is not None else []
+            contagem[chave] = len(opcoes)
+            pares.extend((diferenca, _ordem_fatura(fatura), chave, fatura) for diferenca, fatura in opcoes)
+        pares.sort(key=lambda par: par[:3])
+
+        resultado = {}
+        for diferenca, _, chave, fatura in pares:
+            if chave in resultado or _id_fatura(fatura) in self.consumidas:
+                continue
+            self.consumidas.add(_id_fatura(fatura))
+            resultado[chave] = Casamento(fatura, contagem[chave], diferenca)
+        for chave, total in contagem.items():
+            resultado.setdefault(chave, Casamento(None, total))
+        return resultado
+
+
+# === Estado compartilhado entre documentos e ciclos ===
+_lock = threading.Lock()
+_casadores = {}  # cnpj -> CasadorFaturas
+_atribuidos = {}  # id_cte -> (cnpj, Casamento)
+
+
+def _casador(cnpj: str, faturas: list[dict]) -> CasadorFaturas:
+    """Reaproveita o indice se a lista nao mudou; senao reconstroi mantendo as consumidas."""
+    atual = _casadores.get(cnpj)
+    if atual is not None and atual.assinatura == frozenset(_id_fatura(f) for f in faturas):
+        return atual
+    novo = CasadorFaturas(faturas, consumidas=atual.consumidas if atual else None)
+    _casadores[cnpj] = novo
+    # Faturas que sairam da lista (pagas) liberam os CT-e que apontavam para elas
+    for chave, (dono, casamento) in list(_atribuidos.items()):
+        if dono == cnpj and _id_fatura(casamento.fatura) not in novo.assinatura:
+            del _atribuidos[chave]
+    return novo
+
+
+def casar_lote(cnpj: str, ctes: list[tuple[str, object]], faturas: list[dict]) -> dict[str, Casamento]:
+    """Casa de uma vez os CT-e [(id_cte, valor)] de um lote; os ja atribuidos mantem a fatura anterior."""
+    cnpj = str(cnpj).strip()
+    with _lock:
+        casador = _casador(cnpj, faturas)
+        pendentes = [(chave, valor) for chave, valor in ctes if chave and chave not in _atribuidos]
+        resultado = casador.casar_lote(pendentes)
+        for chave, casamento in resultado.items():
+            if casamento.fatura is not None:
+                _atribuidos[chave] = (cnpj, casamento)
+        for chave, _ in ctes:
+            if chave in _atribuidos:
+                resultado[chave] = _atribuidos[chave][1]
+        return resultado
+
+
+def casar(cnpj: str, chave: str, valor, faturas: list[dict]) -> Casamento:
+    """
+    Fatura do CT-e (chave: id_cte): a atribuida antes, se houver, ou a melhor
+    livre agora. Com id vazio a atribuicao nao e lembrada.
+    """
+    cnpj = str(cnpj).strip()
+    with _lock:
+        casador = _casador(cnpj, faturas)
+        if chave and chave in _atribuidos:
+            return _atribuidos[chave][1]
+        casamento = casador.casar(valor)
+        if chave and casamento.fatura is not None:
+            _atribuidos[chave] = (cnpj, casamento)
+        return casamento
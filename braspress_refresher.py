@@ -0,0 +1,56 @@
+import threading
+
+
+class BraspressSessionRefresher:
+    """
+    Mantem as sessoes do portal Braspress validas fora da thread de processamento.
+    - Sonda os cookies salvos de cada CNPJ periodicamente.
+    - Refaz o login (navegador persistente) antes da expiracao ou se o portal recusar.
+    """
+
+    def __init__(self, interval_minutes: int = 20):
+        self.interval_minutes = max(5, int(interval_minutes))
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh_once(self) -> dict:
+        from braspress_service import servico
+
+        if not servico.disponivel():
+            print(f"[Braspress] Renovacao de sessao indisponivel ({servico.status}): {servico.detail}")
+            self._stop.set()
+            return {}
+
+        resultado = {}
+        for cnpj in servico.cnpjs():
+            if self._stop.is_set():
+                break
+            try:
+                renovou = servico.renovar_sessao(cnpj)
+                resultado[cnpj] = "renovada" if renovou else "valida"
+                if renovou:
+                    print(f"[Braspress] Sessao renovada para {cnpj}.")
+            except Exception as e:
+                resultado[cnpj] = "erro"
+                print(f"[Braspress] Falha ao renovar sessao de {cnpj}: {e}")
+        return resultado
+
+    def _loop(self):
+        print(f"[Braspress] Renovacao de sessao ativa: intervalo={self.interval_minutes}min")
+        while not self._stop.is_set():
+            try:
+                self.refresh_once()
+            except Exception as e:
+                print(f"[Braspress] Falha na renovacao de sessao: {e}")
+            if self._stop.wait(self.interval_minutes * 60):
+                return
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,110 @@
+"""
+Servico Braspress inicializado sob demanda.
+
+Importar este modulo nao carrega requests/gspread/Playwright nem toca no
+disco. A inicializacao (secrets, pasta de arquivos, import de braspress_utils)
+acontece uma unica vez: em segundo plano na partida do bot ou, se um CT-e
+Braspress chegar antes, no primeiro uso. Com "braspress_enabled" desligado
+nada e carregado. O estado aparece em runtime_status ("braspress").
+"""
+
+import threading
+
+import braspress_debug
+import runtime_status
+from settings_manager import load_settings
+
+
+class BraspressService:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pronto = threading.Event()
+        self._utils = None
+        self._frame = None
+        self.status = "pending"
+        self.detail = ""
+
+    def _definir(self, status: str, detail: str = ""):
+        self.status = status
+        self.detail = detail
+        runtime_status.set_braspress_status(status, detail)
+
+    def _inicializar(self):
+        cfg = load_settings()
+        if not bool(cfg.get("braspress_enabled", True)):
+            self._definir("disabled", "Braspress desativado nas configuracoes.")
+            return
+
+        self._definir("starting", "Carregando modulo Braspress...")
+        try:
+            import login_braspress_frame
+
+            login_braspress_frame.inicializar()
+            braspress_debug.configurar(
+                login_braspress_frame.ARCHIVE_DIR,
+                ativo=bool(cfg.get("braspress_debug_capture", True)),
+                max_mb=int(cfg.get("braspress_debug_max_mb", 20)),
+                max_arquivos=int(cfg.get("braspress_debug_max_files", 200)),
+            )
+            import braspress_utils
+        except FileNotFoundError as e:
+            self._definir("disabled", str(e).splitlines()[0])
+            print(f"[Braspress] Desativado: {e}")
+            return
+        except Exception as e:
+            self._definir("error", f"Dependencias indisponiveis: {e}")
+            print(f"[Braspress] Falha ao inicializar: {e}")
+            return
+
+        self._frame = login_braspress_frame
+        self._utils = braspress_utils
+        self._definir("ready", f"{len(login_braspress_frame.COOKIES_FILES)} CNPJ(s) configurado(s).")
+        print("[Braspress] Servico pronto.")
+
+    def iniciar(self) -> bool:
+        """Inicializa uma unica vez (chamadas concorrentes esperam a primeira)."""
+        if self._pronto.is_set():
+            return self._utils is not None
+        with self._lock:
+            if not self._pronto.is_set():
+                try:
+                    self._inicializar()
+                finally:
+                    self._pronto.set()
+        return self._utils is not None
+
+    def iniciar_em_segundo_plano(self):
+        threading.Thread(target=self.iniciar, name="braspress-init", daemon=True).start()
+
+    def disponivel(self) -> bool:
+        return self.iniciar()
+
+    # === Operacoes (chamar apenas com disponivel() == True) ===
+    def buscar_faturas(self, cnpj: str):
+        return self._utils.buscarBraspressFaturas(cnpj)
+
+    def prefetch(self, cnpjs, workers: int = 2) -> dict:
+        return self._utils.prefetchFaturas(cnpjs, workers)
+
+    def fim_lote(self):
+        # Sem servico carregado nao houve prefetch
+        if self._utils is not None:
+            self._utils.limparLoteFaturas()
+
+    def inserir_faturas(self, cnpj_dest: str, faturas) -> int:
+        return self._utils.inserir_faturas_braspress(cnpj_dest, faturas)
+
+    def invalidar_cache(self, cnpj: str | None = None) -> int:
+        # Sem servico carregado nao ha cache para limpar (e nao vale carregar so para isso)
+        if self._utils is None:
+            return 0
+        return self._utils.invalidarCacheFaturas(cnpj)
+
+    def cnpjs(self) -> list[str]:
+        return list(self._frame.COOKIES_FILES) if self._frame is not None else []
+
+    def renovar_sessao(self, cnpj: str) -> bool:
+        return self._frame.renovar_sessao(cnpj)
+
+
+servico = BraspressService()
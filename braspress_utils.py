@@ -1,10 +1,17 @@
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
 from login_braspress_frame import obter_faturas
 from datetime import datetime
-from sheets_utils import escolherPlanilha
+from sheets_utils import CABECALHO_CTE, escolherPlanilha, nome_aba_pt, obterAba
 import gspread
-from history_store import log_boleto_lancado
+from history_store import log_boletos_lancados
+import quota_pacer
+import sheets_writer
+from ledger_store import ja_lancado, registrar_lancamentos
+from settings_manager import load_settings
 
 # UtilitÃ¡rio para normalizar valor (ex: "R$ 1.234,56" -> Decimal("1234.56"))
 def normalizarValor(valor_str):
@@ -16,11 +23,18 @@ def normalizarValor(valor_str):
     except Exception:
         return Decimal("0")
 
-def buscarBraspressFaturas(cnpj):
-    """
-    Faz login (ou usa cookies salvos) via login_braspress_frame.py
-    e retorna lista de faturas com vencimento e valor.
-    """
+# Cache das faturas por CNPJ: cnpj -> (expira_em, faturas)
+_cacheFaturas = {}
+# Busca em andamento por CNPJ (chamadas concorrentes esperam a mesma consulta)
+_buscasAndamento = {}
+# Listas pre-carregadas para o lote de e-mails em andamento (independe do TTL):
+# valem do prefetchFaturas ate limparLoteFaturas()
+_loteFaturas = {}
+_lockCache = threading.Lock()
+
+
+def _consultarPortal(cnpj):
+    """Consulta o portal; None em caso de erro (nao vai para o cache)."""
     print(f"[Braspress] Efetuando busca de faturas para CNPJ {cnpj} ...")
 
     # Usa a funÃ§Ã£o obter_faturas do login_braspress_frame.py
@@ -28,7 +42,7 @@ def buscarBraspressFaturas(cnpj):
         listaBruta = obter_faturas(cnpj)
     except Exception as e:
         print(f"[Braspress] Erro ao obter faturas: {e}")
-        return []
+        return None
 
     faturas = []
     for fat, venc, val in listaBruta:
@@ -45,11 +59,86 @@ def buscarBraspressFaturas(cnpj):
 
     return faturas
 
-# mapeamento de meses em PT (abreviaÃ§Ã£o usada no seu histÃ³rico: "Nov/2025")
-MES_ABREV_PT = ["Jan","Fev","Mar","Abr","Mai","Jun","Jul","Ago","Set","Out","Nov","Dez"]
 
-def _mes_aba_pt(dt: datetime) -> str:
-    return f"{MES_ABREV_PT[dt.month-1]}/{dt.year}"
+def buscarBraspressFaturas(cnpj):
+    """
+    Faz login (ou usa cookies salvos) via login_braspress_frame.py
+    e retorna lista de faturas com vencimento e valor.
+    A lista fica em cache por CNPJ (braspress_cache_ttl_seconds) e chamadas
+    simultaneas para o mesmo CNPJ compartilham uma unica consulta ao portal.
+    Retorna None se o portal nao pode ser consultado (sessao expirada, erro de
+    rede); lista vazia significa que o CNPJ nao tem faturas em aberto.
+    """
+    cnpj = str(cnpj).strip()
+    with _lockCache:
+        if cnpj in _loteFaturas:
+            return [dict(f) for f in _loteFaturas[cnpj]]
+        item = _cacheFaturas.get(cnpj)
+        if item and item[0] > time.monotonic():
+            return [dict(f) for f in item[1]]
+        busca = _buscasAndamento.get(cnpj)
+        dono = busca is None
+        if dono:
+            busca = _buscasAndamento[cnpj] = {"pronto": threading.Event(), "faturas": None}
+
+    if not dono:
+        # Outra thread ja esta consultando este CNPJ: usa o mesmo resultado
+        busca["pronto"].wait()
+        return None if busca["faturas"] is None else [dict(f) for f in busca["faturas"]]
+
+    try:
+        faturas = _consultarPortal(cnpj)
+        busca["faturas"] = faturas
+        ttl = load_settings().get("braspress_cache_ttl_seconds", 0)
+        if faturas is not None and ttl > 0:
+            with _lockCache:
+                _cacheFaturas[cnpj] = (time.monotonic() + ttl, faturas)
+    finally:
+        with _lockCache:
+            _buscasAndamento.pop(cnpj, None)
+        busca["pronto"].set()
+    return None if faturas is None else [dict(f) for f in faturas]
+
+
+def prefetchFaturas(cnpjs, workers: int = 2) -> dict:
+    """
+    Busca as faturas de varios CNPJs em paralelo (pool pequeno) e as guarda para
+    o lote (mesmo com braspress_cache_ttl_seconds = 0); o processamento de cada
+    CT-e depois le da memoria ate limparLoteFaturas(). Retorna {cnpj: faturas | None}.
+    """
+    cnpjs = list(dict.fromkeys(str(c).strip() for c in cnpjs if c))
+    limparLoteFaturas()
+    if not cnpjs:
+        return {}
+    workers = max(1, min(int(workers or 1), len(cnpjs)))
+    inicio = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="braspress") as pool:
+        resultado = dict(zip(cnpjs, pool.map(buscarBraspressFaturas, cnpjs)))
+    with _lockCache:
+        _loteFaturas.update((cnpj, faturas) for cnpj, faturas in resultado.items() if faturas is not None)
+    print(
+        f"[Braspress] Faturas pre-carregadas para {len(cnpjs)} CNPJ(s) "
+        f"em {time.monotonic() - inicio:.1f}s ({workers} em paralelo)."
+    )
+    return resultado
+
+
+def limparLoteFaturas():
+    """Fim do lote: as proximas consultas voltam a seguir o cache com TTL."""
+    with _lockCache:
+        _loteFaturas.clear()
+
+
+def invalidarCacheFaturas(cnpj=None) -> int:
+    """Descarta as faturas em cache de um CNPJ (ou de todos). Retorna quantos CNPJs sairam."""
+    with _lockCache:
+        if cnpj is None:
+            total = len(_cacheFaturas)
+            _cacheFaturas.clear()
+            _loteFaturas.clear()
+            return total
+        _loteFaturas.pop(str(cnpj).strip(), None)
+        return 1 if _cacheFaturas.pop(str(cnpj).strip(), None) is not None else 0
 
 def _texto_parcela(indice: int) -> str:
     return f"{indice}\u00aa Parcela"
@@ -81,108 +170,158 @@ def inserir_fatura_braspress(cnpj_dest: str, fatura: str, vencimento: str, valor
     """
     Insere faturas da BRASPRESS no mesmo formato das notas processadas no processor.py.
     """
-    from reporter import registrarEvento
-    from auth import apiCooldown
+    item = {"fatura": fatura, "vencimento": vencimento, "valor": valor}
+    return inserir_faturas_braspress(cnpj_dest, [item]) > 0
 
-    # Determinar ano e planilha
-    data_venc = _parse_vencimento(vencimento)
-    ano = data_venc.year
-    planilha, empresa = escolherPlanilha(cnpj_dest, ano)
-    if not planilha:
-        print(f"[Braspress] NÃ£o foi possÃ­vel escolher planilha para {cnpj_dest} ({ano}).")
-        return False
 
-    nome_aba = _mes_aba_pt(data_venc)
+def inserir_faturas_braspress(cnpj_dest: str, faturas: list[dict]) -> int:
+    """
+    Insere em lote as faturas da BRASPRESS: agrupa por aba (empresa, ano, mes),
+    faz uma leitura e uma escrita por aba. Retorna quantas linhas foram inseridas.
+    """
+    grupos = {}
+    ja_no_ledger = 0
+    for item in faturas:
+        # Determinar ano e planilha
+        data_venc = _parse_vencimento(item["vencimento"])
+        ano = data_venc.year
+        planilha, empresa = escolherPlanilha(cnpj_dest, ano)
+        if not planilha:
+            print(f"[Braspress] NÃ£o foi possÃ­vel escolher planilha para {cnpj_dest} ({ano}).")
+            continue
 
-    # Tenta obter ou criar a aba
-    try:
-        aba = planilha.worksheet(nome_aba)
-    except gspread.exceptions.WorksheetNotFound:
-        try:
-            aba = planilha.add_worksheet(title=nome_aba, rows="100", cols="9")
-            aba.append_row(["Vencimento", "DescriÃ§Ã£o", "CT-e", "Valor Total", "Qtd Parcelas", "Parcela", "Valor Parcela", "Valor Pago", "Status"])
-        except gspread.exceptions.APIError as e:
-            if "already exists" in str(e).lower():
-                aba = planilha.worksheet(nome_aba)
-            else:
-                raise e
+        nome_aba = nome_aba_pt(data_venc)
+        venc_fmt = data_venc.strftime("%d/%m/%Y")
+        fatura = str(item["fatura"]).strip()
+
+        # Ledger local primeiro: evita leitura da aba quando a fatura ja foi lancada
+        if ja_lancado(empresa, ano, nome_aba, fatura, venc_fmt):
+            ja_no_ledger += 1
+            continue
+
+        grupo = grupos.setdefault((empresa, ano, nome_aba), {"planilha": planilha, "itens": []})
+        grupo["itens"].append((data_venc, fatura, item["valor"]))
+
+    if ja_no_ledger:
+        print(f"[Braspress] {ja_no_ledger} fatura(s) de {cnpj_dest} ja lancada(s) (ledger)")
+
+    # Leitura/escrita de cada aba na faixa da sua planilha (backoff independente por planilha)
+    futuros = [
+        sheets_writer.executar(
+            grupo["planilha"], _gravar_faturas, grupo["planilha"], empresa, ano, nome_aba, cnpj_dest, grupo["itens"]
+        )
+        for (empresa, ano, nome_aba), grupo in grupos.items()
+    ]
+    return sum(futuro.result() for futuro in futuros)
+
+
+def _lancamento_fatura(empresa, ano, nome_aba, cnpj_dest, fatura, venc_fmt, valor, fornecedor):
+    return {
+        "conta": "Conta NFe",
+        "doc_tipo": "CT-e Braspress",
+        "numero": str(fatura),
+        "fornecedor": fornecedor,
+        "cnpj_emit": "",
+        "cnpj_dest": cnpj_dest,
+        "vencimento": venc_fmt,
+        "valor_total": f"{float(valor):.2f}",
+        "valor_parcela": f"{float(valor):.2f}",
+        "parcela": _texto_parcela(1),
+        "qtd_parcelas": 1,
+        "empresa": empresa,
+        "ano": int(ano),
+        "aba": nome_aba,
+        "arquivo_xml": "",
+        "local_lancamento": f"{empresa} {ano}/{nome_aba}",
+    }
+
+
+def _gravar_faturas(planilha, empresa, ano, nome_aba, cnpj_dest, itens) -> int:
+    from reporter import registrarEvento
+
+    # Obtem a aba do cache de metadados ou cria (aba + cabecalho em um batch_update)
+    aba = obterAba(planilha, nome_aba, CABECALHO_CTE)
 
-    # Ler dados existentes
+    # Ler dados existentes (uma vez para todas as faturas da aba)
     for _ in range(3):
         try:
+            quota_pacer.consumir("sheets_read")
             dados = aba.get_all_values()
             break
         except gspread.exceptions.APIError as e:
             if "429" in str(e):
-                apiCooldown()
+                sheets_writer.backoff("sheets_read")
                 continue
             else:
                 raise e
     else:
         print(f"[Braspress] Falha ao obter dados da aba {nome_aba}")
-        return False
-
-    # Evita duplicatas (mesma fatura + vencimento)
-    duplicado = any(
-        fatura.strip() == linha[2].strip() and data_venc.strftime("%d/%m/%Y") == linha[0].strip()
-        for linha in dados if len(linha) >= 3
-    )
-    if duplicado:
-        print(f"[Braspress] Fatura {fatura} ({data_venc.strftime('%d/%m/%Y')}) jÃ¡ existe em {empresa} {ano} / {nome_aba}")
-        return False
+        return 0
 
-    # Monta a nova linha no padrÃ£o do processor.py
-    valor_fmt = f"R$ {float(valor):,.2f}"
+    # Evita duplicatas (mesma fatura + vencimento), inclusive dentro do proprio lote
+    existentes = {(linha[2].strip(), linha[0].strip()) for linha in dados if len(linha) >= 3}
     fornecedor = "BRASPRESS TRANSPORTES URGENTES LTDA (Bot)"
-    nova_linha = [
-        data_venc.strftime("%d/%m/%Y"),  # Vencimento
-        fornecedor,                      # DescriÃ§Ã£o / Fornecedor
-        fatura,                          # CT-e (ou nÂº fatura)
-        valor_fmt,                       # Valor Total
-        1,                               # Qtd Parcelas
-        _texto_parcela(1),               # Parcela
-        valor_fmt,                       # Valor Parcela
-        "",                              # Valor Pago
-        ""                               # Status
-    ]
+    novas_linhas = []
+    lancamentos = []
+    na_planilha = []
+    for data_venc, fatura, valor in itens:
+        venc_fmt = data_venc.strftime("%d/%m/%Y")
+        if (fatura, venc_fmt) in existentes:
+            print(f"[Braspress] Fatura {fatura} ({venc_fmt}) jÃ¡ existe em {empresa} {ano} / {nome_aba}")
+            na_planilha.append({"empresa": empresa, "ano": ano, "aba": nome_aba, "numero": fatura, "vencimento": venc_fmt})
+            continue
+        existentes.add((fatura, venc_fmt))
+
+        # Monta a nova linha no padrÃ£o do processor.py
+        valor_fmt = f"R$ {float(valor):,.2f}"
+        novas_linhas.append([
+            venc_fmt,                        # Vencimento
+            fornecedor,                      # DescriÃ§Ã£o / Fornecedor
+            fatura,                          # CT-e (ou nÂº fatura)
+            valor_fmt,                       # Valor Total
+            1,                               # Qtd Parcelas
+            _texto_parcela(1),               # Parcela
+            valor_fmt,                       # Valor Parcela
+            "",                              # Valor Pago
+            ""                               # Status
+        ])
+        lancamentos.append(_lancamento_fatura(empresa, ano, nome_aba, cnpj_dest, fatura, venc_fmt, valor, fornecedor))
+
+    if na_planilha:
+        try:
+            registrar_lancamentos(na_planilha, origem="planilha")
+        except Exception:
+            pass
+    if not novas_linhas:
+        return 0
 
-    # Inserir linha no final (respeitando USER_ENTERED)
+    # Todas as linhas novas no final da aba em uma unica escrita (respeitando USER_ENTERED)
     for _ in range(3):
         try:
-            linha_vazia = len(dados) + 1
-            cell_range = f"A{linha_vazia}:I{linha_vazia}"
-            aba.update(cell_range, [nova_linha], value_input_option="USER_ENTERED")
+            primeira = len(dados) + 1
+            cell_range = f"A{primeira}:I{primeira + len(novas_linhas) - 1}"
+            quota_pacer.consumir("sheets_write")
+            aba.update(cell_range, novas_linhas, value_input_option="USER_ENTERED")
             break
         except gspread.exceptions.APIError as e:
             if "429" in str(e):
-                apiCooldown()
+                sheets_writer.backoff("sheets_write")
                 continue
             else:
                 raise e
+    else:
+        print(f"[Braspress] Falha ao gravar {len(novas_linhas)} fatura(s) na aba {nome_aba}")
+        return 0
 
-    print(f"Inserido: {empresa} {ano} | {nome_aba} | Parcela 1/1 - {fornecedor} - {fatura}")
-    registrarEvento("processado", fornecedor, "Conta NFe")
+    for lancamento in lancamentos:
+        print(f"Inserido: {empresa} {ano} | {nome_aba} | Parcela 1/1 - {fornecedor} - {lancamento['numero']}")
+        registrarEvento("processado", fornecedor, "Conta NFe")
     try:
-        log_boleto_lancado(
-            {
-                "conta": "Conta NFe",
-                "doc_tipo": "CT-e Braspress",
-                "numero": str(fatura),
-                "fornecedor": fornecedor,
-                "cnpj_emit": "",
-                "cnpj_dest": cnpj_dest,
-                "vencimento": data_venc.strftime("%d/%m/%Y"),
-                "valor_total": f"{float(valor):.2f}",
-                "valor_parcela": f"{float(valor):.2f}",
-                "parcela": _texto_parcela(1),
-                "qtd_parcelas": 1,
-                "empresa": empresa,
-                "ano": int(ano),
-                "aba": nome_aba,
-                "arquivo_xml": "",
-                "local_lancamento": f"{empresa} {ano}/{nome_aba}",
-            }
-        )
+        registrar_lancamentos(lancamentos)
+    except Exception as e:
+        print(f"[Ledger] Falha ao registrar {len(lancamentos)} fatura(s): {e}")
+    try:
+        log_boletos_lancados(lancamentos)
     except Exception:
         pass
-    return True
+    return len(lancamentos)
@@ -97,14 +97,15 @@ SCOPES_SHEET = [
 ]
 
 # === IDs das planilhas ===
-SHEET_EH_2025 = CONFIG_PRIV["planilhas"]["EH_2025"]
-SHEET_EH_2026 = CONFIG_PRIV["planilhas"]["EH_2026"]
-SHEET_MVA_2025 = CONFIG_PRIV["planilhas"]["MVA_2025"]
-SHEET_MVA_2026 = CONFIG_PRIV["planilhas"]["MVA_2026"]
+# Chaves no formato "<EMPRESA>_<ANO>" (ex: "EH_2026"); novos anos/empresas entram apenas no JSON.
+PLANILHAS = dict(CONFIG_PRIV.get("planilhas", {}))
+# Titulo usado para localizar no Drive planilhas de anos ainda nao configurados
+PLANILHAS_PADRAO_NOME = str(CONFIG_PRIV.get("planilhas_padrao_nome", "{empresa} {ano}"))
 
 # === CNPJs ===
-CNPJ_EH = CONFIG_PRIV["cnpjs"]["EH"]
-CNPJ_MVA = CONFIG_PRIV["cnpjs"]["MVA"]
+EMPRESAS_CNPJ = dict(CONFIG_PRIV["cnpjs"])
+CNPJ_EH = EMPRESAS_CNPJ["EH"]
+CNPJ_MVA = EMPRESAS_CNPJ["MVA"]
 
 # Arquivos de credenciais
 CRED_FILE_SHEETS = str(_resolver_secret("credentials.json"))
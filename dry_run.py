@@ -0,0 +1,39 @@
+"""
+Modo --dry-run: executa um ciclo real (Gmail -> parse -> roteamento) contra o
+backend simulado de planilhas (fake_sheets), sem alterar nada em producao.
+- Escritas nas planilhas vao para o FakeClient em memoria.
+- Ledger e historico sao gravados em APPDATA/dry_run.
+- E-mails nao recebem rotulos nem sao marcados como lidos.
+"""
+
+from pathlib import Path
+
+from config import APPDATA_BASE
+
+
+ATIVO = False
+cliente = None
+
+
+def ativar(base_dir=None, **opcoes_fake):
+    """Troca o cliente Sheets pelo simulado e redireciona ledger/historico."""
+    global ATIVO, cliente
+    import auth
+    import history_store
+    import ledger_store
+    from fake_sheets import FakeClient
+
+    base = Path(base_dir) if base_dir else Path(APPDATA_BASE) / "dry_run"
+    base.mkdir(parents=True, exist_ok=True)
+
+    cliente = FakeClient(**opcoes_fake)
+    auth.set_sheets_client(cliente)
+    ledger_store.definir_arquivo(base / "ledger_lancamentos.sqlite3")
+    history_store.definir_arquivo(base / "historico_eventos.jsonl")
+    ATIVO = True
+    print(f"[DryRun] Planilhas simuladas; ledger/historico em {base}; e-mails nao serao rotulados.")
+    return cliente
+
+
+def resumo() -> dict:
+    return cliente.resumo() if cliente is not None else {}
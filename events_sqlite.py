@@ -0,0 +1,160 @@
+"""
+Backend SQLite opcional para o historico e o registro de auditoria.
+
+Cada base guarda o evento completo (JSON) e colunas tipadas com indice para
+os filtros do painel; a busca livre usa uma tabela FTS5 (tokenizador trigram,
+que casa substrings como a busca antiga) sobre o mesmo texto que o
+_match_search monta, calculado uma vez na gravacao. O resultado do FTS e so
+uma pre-selecao: o filtro original ainda confirma cada linha devolvida. Sem
+FTS5/trigram no sqlite3 local, ou com busca de menos de 3 caracteres, a busca
+livre volta a ser feita linha a linha (do mais novo para o mais antigo).
+"""
+
+import json
+import sqlite3
+import threading
+from pathlib import Path
+
+
+_LOTE_MIGRACAO = 5000
+
+
+class BaseEventos:
+    def __init__(self, caminho, colunas: dict, indices: list[str]):
+        """colunas: nome -> funcao(item) com o valor da coluna; indices: colunas indexadas."""
+        self.caminho = Path(caminho)
+        self.colunas = colunas
+        self.indices = indices
+        self.fts = False
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self) -> sqlite3.Connection:
+        """Conexao unica (protegida por self._lock), criada sob demanda."""
+        if self._conn is None:
+            self.caminho.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.caminho), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            colunas = "".join(f", {nome} TEXT NOT NULL DEFAULT ''" for nome in self.colunas)
+            conn.executescript(
+                f"""
+                CREATE TABLE IF NOT EXISTS eventos (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    at TEXT NOT NULL DEFAULT ''{colunas},
+                    dados TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS ix_eventos_at ON eventos(at);
+                CREATE TABLE IF NOT EXISTS meta (chave TEXT PRIMARY KEY, valor TEXT NOT NULL);
+                """
+            )
+            for nome in self.indices:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS ix_eventos_{nome} ON eventos({nome}, at)")
+            try:
+                conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS eventos_fts USING fts5(texto, content='', tokenize='trigram')")
+                self.fts = True
+            except sqlite3.OperationalError as e:
+                print(f"[Historico] FTS5/trigram indisponivel em {self.caminho.name} ({e}); busca livre linha a linha.")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def fechar(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # === Migracao ===
+    def migrado(self) -> bool:
+        with self._lock:
+            row = self._connection().execute("SELECT 1 FROM meta WHERE chave = 'migrado'").fetchone()
+        return row is not None
+
+    def migrar(self, itens, texto, origem: str) -> int:
+        """Importa eventos (iteravel de dicts, do mais antigo ao mais novo) uma unica vez."""
+        if self.migrado():
+            return 0
+        total = 0
+        lote = []
+        for item in itens:
+            lote.append(item)
+            if len(lote) >= _LOTE_MIGRACAO:
+                total += self.inserir(lote, texto, commit=False)
+                lote = []
+        total += self.inserir(lote, texto, commit=False)
+        with self._lock:
+            conn = self._connection()
+            conn.execute("INSERT OR REPLACE INTO meta (chave, valor) VALUES ('migrado', ?)", (origem,))
+            conn.commit()
+        return total
+
+    # === Escrita ===
+    def inserir(self, itens: list[dict], texto, commit: bool = True) -> int:
+        """Grava os eventos em uma transacao. texto: funcao(item) com o texto da busca livre."""
+        if not itens:
+            return 0
+        nomes = ", ".join(["at", *self.colunas, "dados"])
+        marcas = ", ".join("?" * (len(self.colunas) + 2))
+        with self._lock:
+            conn = self._connection()
+            for item in itens:
+                valores = [str(item.get("at", "") or "")]
+                valores.extend(str(fn(item) or "") for fn in self.colunas.values())
+                valores.append(json.dumps(item, ensure_ascii=False))
+                rowid = conn.execute(f"INSERT INTO eventos ({nomes}) VALUES ({marcas})", valores).lastrowid
+                if self.fts:
+                    conn.execute("INSERT INTO eventos_fts (rowid, texto) VALUES (?, ?)", (rowid, texto(item)))
+            if commit:
+                conn.commit()
+        return len(itens)
+
+    # === Consulta ===
+    def consultar(self, condicoes: list[tuple[str, tuple]], busca: str, confirmar, limit: int) -> list[dict]:
+        """
+        condicoes: [(sql, parametros)] combinadas com AND. busca: texto livre.
+        confirmar(item) aplica o filtro original em cada linha devolvida.
+        """
+        onde = [sql for sql, _ in condicoes]
+        params = [p for _, ps in condicoes for p in ps]
+        usa_fts = self.fts and len(busca) >= 3
+        if usa_fts:
+            onde.append("id IN (SELECT rowid FROM eventos_fts WHERE eventos_fts MATCH ?)")
+            params.append('"' + busca.replace('"', '""') + '"')
+        sql = "SELECT dados FROM eventos" + (" WHERE " + " AND ".join(onde) if onde else "") + " ORDER BY id DESC"
+
+        rows = []
+        with self._lock:
+            cursor = self._connection().execute(sql, params)
+            while len(rows) < limit:
+                bloco = cursor.fetchmany(max(50, limit))
+                if not bloco:
+                    break
+                for (dados,) in bloco:
+                    try:
+                        item = json.loads(dados)
+                    except Exception:
+                        continue
+                    if confirmar(item):
+                        rows.append(item)
+                        if len(rows) >= limit:
+                            break
+        return rows
+
+
+def condicoes_periodo(dt_from: str, dt_to: str) -> list[tuple[str, tuple]]:
+    """Mesmo recorte de _in_range (por dia, sem evento sem data) usando o indice de at."""
+    condicoes = [("at != ''", ())]
+    if dt_from:
+        condicoes.append(("at >= ?", (dt_from,)))
+    if dt_to:
+        condicoes.append(("at < ?", (dt_to + "\uffff",)))
+    return condicoes
+
+
+def condicao_contem(coluna: str, filtro: str) -> tuple[str, tuple]:
+    """Filtro por substring (como _match_filter); CNPJ completo usa o indice por igualdade."""
+    valor = filtro.strip().lower()
+    if valor.isdigit() and len(valor) == 14:
+        return f"{coluna} = ?", (valor,)
+    return f"instr({coluna}, ?) > 0", (valor,)
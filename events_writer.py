@@ -0,0 +1,193 @@
+"""
+Gravacao em lote (group commit) do historico e da auditoria.
+
+append_event/append_audit_event so enfileiram; uma thread por arquivo junta os
+eventos e grava varios de uma vez quando o lote enche, quando passa o
+intervalo ou quando alguem pede esvaziar() (consultas fazem isso antes de ler,
+para enxergar o que acabou de ser registrado). encerrar() grava o que estiver
+na fila antes de sair; tambem roda no atexit. Com fsync "batch" cada lote e
+sincronizado com o disco antes de ser dado como gravado.
+
+Fila, lotes e tempos aparecem em runtime_status ("event_writers").
+"""
+
+import atexit
+import queue
+import threading
+import time
+
+import runtime_status
+
+
+_FILA_MAX = 10000
+_TENTATIVAS = 3
+
+_LOCK = threading.Lock()
+_gravadores = []
+
+
+class _Marca:
+    """Item de controle na fila: esvaziar (evento setado apos gravar) ou parar."""
+
+    def __init__(self, parar: bool = False):
+        self.parar = parar
+        self.feito = threading.Event()
+
+
+class GravadorEventos:
+    def __init__(self, nome: str, gravar, max_lote: int = 256, intervalo_ms: int = 200, fsync: str = "off", carimbar=None):
+        """
+        gravar(eventos, fsync) persiste a lista na ordem; precisa aceitar chamadas de qualquer thread.
+        carimbar(): se informado, "at" de cada evento e definido ao enfileirar, sob o lock,
+        de modo que a ordem de gravacao e a dos horarios coincidem.
+        """
+        self.nome = nome
+        self._gravar = gravar
+        self._carimbar = carimbar
+        self.max_lote = max(1, int(max_lote))
+        self.intervalo = max(0, int(intervalo_ms)) / 1000.0
+        self.fsync = fsync == "batch"
+        self._fila = queue.Queue(maxsize=_FILA_MAX)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._encerrado = False
+        self.lotes = 0
+        self.eventos = 0
+        self.ultimo_lote = 0
+        self.pico_fila = 0
+        self.falhas = 0
+        self.descartados = 0
+        self.ultimo_ms = 0.0
+        with _LOCK:
+            _gravadores.append(self)
+
+    def _status(self):
+        try:
+            runtime_status.set_event_writer(
+                self.nome,
+                pending=self._fila.qsize(),
+                peak=self.pico_fila,
+                batches=self.lotes,
+                events=self.eventos,
+                last_batch=self.ultimo_lote,
+                last_write_ms=self.ultimo_ms,
+                failures=self.falhas,
+                dropped=self.descartados,
+            )
+        except Exception:
+            pass
+
+    def enfileirar(self, eventos: list[dict]):
+        if not eventos:
+            return
+        # Checagem e enfileiramento sob o mesmo lock: um evento nao entra na
+        # fila depois que encerrar() ja mandou parar (ficaria sem ser gravado)
+        with self._lock:
+            if self._carimbar is not None:
+                agora = self._carimbar()
+                for evento in eventos:
+                    evento["at"] = agora
+            if self._encerrado:
+                # Depois do encerramento: grava direto, apos o que ainda estava na
+                # fila e ainda sob o lock, mantendo a ordem (a thread nao usa este lock)
+                if self._thread is not None and self._thread.is_alive():
+                    self._thread.join(10.0)
+                self._gravar(list(eventos), self.fsync)
+                return
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name=f"eventos-{self.nome}", daemon=True)
+                self._thread.start()
+            for evento in eventos:
+                self._fila.put(evento)
+            self.pico_fila = max(self.pico_fila, self._fila.qsize())
+
+    def esvaziar(self, timeout: float = 10.0) -> bool:
+        """Espera tudo o que ja foi enfileirado estar gravado."""
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        marca = _Marca()
+        self._fila.put(marca)
+        return marca.feito.wait(timeout)
+
+    def _gravar_lote(self, lote: list[dict]):
+        for tentativa in range(1, _TENTATIVAS + 1):
+            inicio = time.perf_counter()
+            try:
+                self._gravar(lote, self.fsync)
+            except Exception as e:
+                self.falhas += 1
+                print(f"[Eventos] {self.nome}: falha ao gravar lote de {len(lote)} (tentativa {tentativa}): {e}")
+                if tentativa < _TENTATIVAS:
+                    time.sleep(tentativa)
+                continue
+            self.lotes += 1
+            self.eventos += len(lote)
+            self.ultimo_lote = len(lote)
+            self.ultimo_ms = round((time.perf_counter() - inicio) * 1000, 2)
+            return
+        self.descartados += len(lote)
+        print(f"[Eventos] {self.nome}: {len(lote)} evento(s) descartado(s) apos {_TENTATIVAS} tentativas.")
+
+    def _loop(self):
+        parar = False
+        while not parar:
+            item = self._fila.get()
+            lote, marcas = [], []
+            prazo = time.monotonic() + self.intervalo
+            while True:
+                if isinstance(item, _Marca):
+                    marcas.append(item)
+                    parar = parar or item.parar
+                    break  # quem pediu esvaziar/parar nao espera o intervalo
+                lote.append(item)
+                if len(lote) >= self.max_lote:
+                    break
+                restante = prazo - time.monotonic()
+                try:
+                    item = self._fila.get(timeout=restante) if restante > 0 else self._fila.get_nowait()
+                except queue.Empty:
+                    break
+            if lote:
+                self._gravar_lote(lote)
+            for marca in marcas:
+                marca.feito.set()
+            self._status()
+
+        # Eventos que entraram junto com o pedido de parada
+        restantes = []
+        while True:
+            try:
+                item = self._fila.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, _Marca):
+                item.feito.set()
+            else:
+                restantes.append(item)
+        if restantes:
+            self._gravar_lote(restantes)
+            self._status()
+
+    def encerrar(self, timeout: float = 10.0):
+        """Grava o que estiver na fila e para a thread; novos eventos passam a ser gravados direto."""
+        with self._lock:
+            self._encerrado = True
+            thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        marca = _Marca(parar=True)
+        self._fila.put(marca)
+        if not marca.feito.wait(timeout):
+            print(f"[Eventos] {self.nome}: fila nao esvaziou em {timeout:.0f}s ({self._fila.qsize()} pendente(s)).")
+        thread.join(timeout)
+
+
+def encerrar(timeout: float = 10.0):
+    """Esvazia e para todos os gravadores (saida do bot)."""
+    with _LOCK:
+        gravadores = list(_gravadores)
+    for gravador in gravadores:
+        gravador.encerrar(timeout)
+
+
+atexit.register(encerrar)
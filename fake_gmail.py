@@ -0,0 +1,469 @@
+"""
+Servico Gmail simulado + gerador de corpus sintetico de NF-e/CT-e.
+
+Implementa as cadeias usadas por gmail_fetcher.py e panel_web.py:
+users().messages().list/get/modify, users().messages().attachments().get,
+users().labels().list/create e users().getProfile. Os XMLs sao gerados sob
+demanda (deterministicos por seed) para que corpora grandes nao ocupem memoria.
+"""
+
+import base64
+import random
+import re
+import threading
+import time
+from datetime import date, timedelta
+
+from quota_pacer import GMAIL_CUSTOS
+
+try:
+    from googleapiclient.errors import HttpError
+except Exception:  # googleapiclient ausente: erro equivalente com o mesmo texto
+    HttpError = None
+
+
+CNPJ_BRASPRESS = "48740351000165"
+NOME_BRASPRESS = "BRASPRESS TRANSPORTES URGENTES LTDA"
+
+_RE_LABEL_EXCLUIDO = re.compile(r'-label:"([^"]+)"')
+_RE_GRUPO_LABELS = re.compile(r"\{([^}]*)\}")
+_RE_LABEL = re.compile(r'(?<![-\w])label:"([^"]+)"')
+
+_FORNECEDORES = [
+    "DISTRIBUIDORA ALFA COMPONENTES LTDA",
+    "ELETRO BETA INDUSTRIA E COMERCIO LTDA",
+    "GAMA SEMICONDUTORES DO BRASIL S.A.",
+    "DELTA CABOS E CONECTORES EIRELI",
+    "OMEGA EMBALAGENS LTDA",
+    "SIGMA TECNOLOGIA INDUSTRIAL LTDA",
+]
+_TRANSPORTADORAS = [
+    "TRANSPORTES RAPIDO SUL LTDA",
+    "EXPRESSO NORDESTE CARGAS LTDA",
+    "JAMEF TRANSPORTES LTDA",
+]
+
+
+class ErroQuotaGmail(Exception):
+    """Usado quando googleapiclient nao esta instalado; mesmo texto do HttpError 429."""
+
+    def __init__(self, uri: str):
+        self.status_code = 429
+        super().__init__(f'<HttpError 429 when requesting {uri} returned "User-rate limit exceeded". Details: "rateLimitExceeded">')
+
+
+class _RespostaHttp(dict):
+    def __init__(self, status: int, reason: str):
+        super().__init__(status=str(status))
+        self.status = status
+        self.reason = reason
+
+
+def _erro_quota(uri: str):
+    if HttpError is not None:
+        conteudo = b'{"error": {"code": 429, "message": "User-rate limit exceeded", "errors": [{"reason": "rateLimitExceeded"}]}}'
+        return HttpError(_RespostaHttp(429, "Too Many Requests"), conteudo, uri=uri)
+    return ErroQuotaGmail(uri)
+
+
+# === Geracao de documentos ===
+def _cnpj(rng: random.Random) -> str:
+    return "".join(str(rng.randint(0, 9)) for _ in range(8)) + "0001" + f"{rng.randint(0, 99):02d}"
+
+
+def _chave(rng: random.Random, modelo: str, cnpj: str, numero: int) -> str:
+    base = f"35{date.today():%y%m}{cnpj}{modelo}001{numero:09d}1{rng.randint(0, 99999999):08d}"
+    return (base + "0" * 44)[:44]
+
+
+def _item_nfe(rng: random.Random, n: int) -> tuple[str, float]:
+    qtd = rng.randint(1, 20)
+    unit = round(rng.uniform(0.5, 200.0), 2)
+    total = round(qtd * unit, 2)
+    xml = (
+        f'<det nItem="{n}"><prod><cProd>{rng.randint(10000, 99999)}</cProd><cEAN>SEM GTIN</cEAN>'
+        f"<xProd>COMPONENTE ELETRONICO MODELO {rng.randint(100, 999)}-{n}</xProd><NCM>85423190</NCM>"
+        f"<CFOP>6102</CFOP><uCom>UN</uCom><qCom>{qtd}.0000</qCom><vUnCom>{unit:.10f}</vUnCom>"
+        f"<vProd>{total:.2f}</vProd><cEANTrib>SEM GTIN</cEANTrib><uTrib>UN</uTrib><qTrib>{qtd}.0000</qTrib>"
+        f"<vUnTrib>{unit:.10f}</vUnTrib><indTot>1</indTot></prod>"
+        f"<imposto><ICMS><ICMS00><orig>0</orig><CST>00</CST><modBC>3</modBC><vBC>{total:.2f}</vBC>"
+        f"<pICMS>12.00</pICMS><vICMS>{total * 0.12:.2f}</vICMS></ICMS00></ICMS>"
+        f"<PIS><PISAliq><CST>01</CST><vBC>{total:.2f}</vBC><pPIS>1.65</pPIS><vPIS>{total * 0.0165:.2f}</vPIS></PISAliq></PIS>"
+        f"<COFINS><COFINSAliq><CST>01</CST><vBC>{total:.2f}</vBC><pCOFINS>7.60</pCOFINS>"
+        f"<vCOFINS>{total * 0.076:.2f}</vCOFINS></COFINSAliq></COFINS></imposto></det>"
+    )
+    return xml, total
+
+
+def gerar_nfe(seed: int, numero: int, cnpj_dest: str, parcelas: int, itens: int, data_base: date | None = None) -> bytes:
+    """NF-e autorizada (nfeProc) com `itens` det e `parcelas` duplicatas."""
+    rng = random.Random(seed)
+    data_base = data_base or date.today()
+    cnpj_emit = _cnpj(rng)
+    chave = _chave(rng, "55", cnpj_emit, numero)
+    dets = []
+    total = 0.0
+    for n in range(1, itens + 1):
+        xml, valor = _item_nfe(rng, n)
+        dets.append(xml)
+        total += valor
+    total = round(total, 2)
+
+    dups = []
+    restante = total
+    for p in range(1, parcelas + 1):
+        valor = round(total / parcelas, 2) if p < parcelas else round(restante, 2)
+        restante -= valor
+        venc = data_base + timedelta(days=30 * p)
+        dups.append(f"<dup><nDup>{p:03d}</nDup><dVenc>{venc.isoformat()}</dVenc><vDup>{valor:.2f}</vDup></dup>")
+
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<nfeProc xmlns="http://www.portalfiscal.inf.br/nfe" versao="4.00"><NFe>'
+        f'<infNFe Id="NFe{chave}" versao="4.00">'
+        f"<ide><cUF>35</cUF><natOp>VENDA DE MERCADORIA</natOp><mod>55</mod><serie>1</serie><nNF>{numero}</nNF>"
+        f"<dhEmi>{data_base.isoformat()}T10:00:00-03:00</dhEmi><tpNF>1</tpNF></ide>"
+        f"<emit><CNPJ>{cnpj_emit}</CNPJ><xNome>{rng.choice(_FORNECEDORES)}</xNome>"
+        "<enderEmit><xLgr>RUA DAS INDUSTRIAS</xLgr><nro>100</nro><xMun>SAO PAULO</xMun><UF>SP</UF></enderEmit>"
+        "<IE>123456789000</IE><CRT>3</CRT></emit>"
+        f"<dest><CNPJ>{cnpj_dest}</CNPJ><xNome>DESTINATARIO</xNome><indIEDest>1</indIEDest></dest>"
+        + "".join(dets)
+        + f"<total><ICMSTot><vBC>{total:.2f}</vBC><vICMS>{total * 0.12:.2f}</vICMS><vProd>{total:.2f}</vProd>"
+        f"<vNF>{total:.2f}</vNF></ICMSTot></total>"
+        "<transp><modFrete>0</modFrete></transp>"
+        f"<cobr><fat><nFat>{numero}</nFat><vOrig>{total:.2f}</vOrig><vLiq>{total:.2f}</vLiq></fat>{''.join(dups)}</cobr>"
+        f"<pag><detPag><tPag>15</tPag><vPag>{total:.2f}</vPag></detPag></pag>"
+        "<infAdic><infCpl>DOCUMENTO GERADO PARA TESTE</infCpl></infAdic>"
+        "</infNFe></NFe>"
+        f'<protNFe versao="4.00"><infProt><tpAmb>1</tpAmb><chNFe>{chave}</chNFe>'
+        f"<dhRecbto>{data_base.isoformat()}T10:01:00-03:00</dhRecbto><nProt>135{numero:012d}</nProt>"
+        "<cStat>100</cStat><xMotivo>Autorizado o uso da NF-e</xMotivo></infProt></protNFe></nfeProc>"
+    ).encode("utf-8")
+
+
+def gerar_cte(seed: int, numero: int, cnpj_dest: str, braspress: bool = False, data_base: date | None = None) -> bytes:
+    """CT-e autorizado (cteProc); Braspress sem data programada (vencimento vem do portal)."""
+    rng = random.Random(seed)
+    data_base = data_base or date.today()
+    if braspress:
+        cnpj_emit, nome = CNPJ_BRASPRESS, NOME_BRASPRESS
+        compl = "<compl><xObs>FATURA EMITIDA NO PORTAL</xObs></compl>"
+    else:
+        cnpj_emit, nome = _cnpj(rng), rng.choice(_TRANSPORTADORAS)
+        venc = data_base + timedelta(days=rng.choice([15, 20, 28, 30]))
+        compl = f"<compl><Entrega><comData><tpPer>2</tpPer><dProg>{venc.isoformat()}</dProg></comData></Entrega></compl>"
+    chave = _chave(rng, "57", cnpj_emit, numero)
+    valor = round(rng.uniform(40.0, 900.0), 2)
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<cteProc xmlns="http://www.portalfiscal.inf.br/cte" versao="4.00"><CTe>'
+        f'<infCte Id="CTe{chave}" versao="4.00">'
+        f"<ide><cUF>35</cUF><CFOP>6353</CFOP><mod>57</mod><serie>1</serie><nCT>{numero}</nCT>"
+        f"<dhEmi>{data_base.isoformat()}T09:00:00-03:00</dhEmi></ide>"
+        f"{compl}"
+        f"<emit><CNPJ>{cnpj_emit}</CNPJ><IE>111111111111</IE><xNome>{nome}</xNome></emit>"
+        f"<rem><CNPJ>{_cnpj(rng)}</CNPJ><xNome>REMETENTE</xNome></rem>"
+        f"<dest><CNPJ>{cnpj_dest}</CNPJ><xNome>DESTINATARIO</xNome></dest>"
+        f"<vPrest><vTPrest>{valor:.2f}</vTPrest><vRec>{valor:.2f}</vRec>"
+        f"<Comp><xNome>FRETE PESO</xNome><vComp>{valor:.2f}</vComp></Comp></vPrest>"
+        "<imp><ICMS><ICMS00><CST>00</CST><vBC>0.00</vBC><pICMS>0.00</pICMS><vICMS>0.00</vICMS></ICMS00></ICMS></imp>"
+        "</infCte></CTe>"
+        f'<protCTe versao="4.00"><infProt><chCTe>{chave}</chCTe><cStat>100</cStat></infProt></protCTe></cteProc>'
+    ).encode("utf-8")
+
+
+def gerar_corpus(
+    total_xml: int,
+    seed: int = 1,
+    cnpjs_dest=("11111111000111", "22222222000122"),
+    parcelas=(1, 3),
+    itens=(1, 30),
+    fracao_cte: float = 0.2,
+    fracao_braspress: float = 0.1,
+    taxa_duplicados: float = 0.05,
+    xml_por_email=(1, 2),
+    data_base: date | None = None,
+) -> list[dict]:
+    """
+    Gera a descricao dos e-mails (sem os bytes dos XMLs, gerados sob demanda).
+    - fracao_braspress e relativa aos CT-e.
+    - taxa_duplicados: fracao de anexos que repetem um XML ja enviado em outro e-mail.
+    """
+    rng = random.Random(seed)
+    data_base = data_base or date.today()
+    anexos = []
+    numero = 1000
+    for i in range(int(total_xml)):
+        if anexos and rng.random() < taxa_duplicados:
+            anexos.append(dict(rng.choice(anexos)))
+            continue
+        numero += 1
+        if rng.random() < fracao_cte:
+            spec = {
+                "tipo": "cte",
+                "braspress": rng.random() < fracao_braspress,
+                "filename": f"CTe_{numero}.xml",
+            }
+        else:
+            spec = {
+                "tipo": "nfe",
+                "parcelas": rng.randint(*parcelas),
+                "itens": rng.randint(*itens),
+                "filename": f"NFe_{numero}.xml",
+            }
+        spec.update({"seed": seed * 1_000_003 + i, "numero": numero, "cnpj_dest": rng.choice(list(cnpjs_dest)), "data_base": data_base})
+        anexos.append(spec)
+
+    emails = []
+    pos = 0
+    base_ms = int(time.mktime(data_base.timetuple()) * 1000)
+    while pos < len(anexos):
+        qtd = rng.randint(*xml_por_email)
+        grupo = anexos[pos:pos + qtd]
+        pos += qtd
+        n = len(emails) + 1
+        emails.append(
+            {
+                "id": f"msg{n:07d}",
+                "subject": f"Envio de documentos fiscais {n}",
+                "internalDate": str(base_ms + n * 1000),
+                "anexos": grupo,
+                "labelIds": ["INBOX", "UNREAD"],
+            }
+        )
+    return emails
+
+
+def conteudo_anexo(spec: dict) -> bytes:
+    if spec["tipo"] == "cte":
+        return gerar_cte(spec["seed"], spec["numero"], spec["cnpj_dest"], spec["braspress"], spec["data_base"])
+    return gerar_nfe(spec["seed"], spec["numero"], spec["cnpj_dest"], spec["parcelas"], spec["itens"], spec["data_base"])
+
+
+# === Servico ===
+class _Req:
+    def __init__(self, servico, op: str, fn):
+        self._servico = servico
+        self._op = op
+        self._fn = fn
+
+    def execute(self):
+        return self._servico._chamar(self._op, self._fn)
+
+
+class _Attachments:
+    def __init__(self, servico):
+        self._s = servico
+
+    def get(self, userId="me", messageId=None, id=None):
+        return _Req(self._s, "attachments.get", lambda: self._s._anexo(messageId, id))
+
+
+class _Messages:
+    def __init__(self, servico):
+        self._s = servico
+
+    def list(self, userId="me", q="", maxResults=100, pageToken=None, **kwargs):
+        return _Req(self._s, "messages.list", lambda: self._s._listar(q, maxResults, pageToken))
+
+    def get(self, userId="me", id=None, format="full", **kwargs):
+        return _Req(self._s, "messages.get", lambda: self._s._mensagem(id))
+
+    def modify(self, userId="me", id=None, body=None):
+        return _Req(self._s, "messages.modify", lambda: self._s._modificar(id, body or {}))
+
+    def attachments(self):
+        return _Attachments(self._s)
+
+
+class _Labels:
+    def __init__(self, servico):
+        self._s = servico
+
+    def list(self, userId="me"):
+        return _Req(self._s, "labels.list", lambda: {"labels": [dict(v) for v in self._s._labels.values()]})
+
+    def create(self, userId="me", body=None):
+        return _Req(self._s, "labels.create", lambda: self._s._criar_label((body or {}).get("name", "")))
+
+
+class _Users:
+    def __init__(self, servico):
+        self._s = servico
+
+    def messages(self):
+        return _Messages(self._s)
+
+    def labels(self):
+        return _Labels(self._s)
+
+    def getProfile(self, userId="me"):
+        return _Req(
+            self._s,
+            "getProfile",
+            lambda: {"emailAddress": self._s.email, "messagesTotal": len(self._s._emails), "historyId": "1"},
+        )
+
+
+class FakeGmailService:
+    """
+    Substituto do servico retornado por googleapiclient.discovery.build("gmail", "v1").
+    - latencia/jitter: segundos por chamada.
+    - unidades_por_segundo: cota por usuario (media movel, balde com reposicao continua); excedeu, 429.
+    - taxa_erro_quota: probabilidade de 429 injetado em qualquer chamada.
+    """
+
+    def __init__(
+        self,
+        emails: list[dict],
+        email: str = "financeiro@example.com",
+        latencia: float = 0.0,
+        jitter: float = 0.0,
+        unidades_por_segundo: int = 250,
+        taxa_erro_quota: float = 0.0,
+        seed: int | None = None,
+    ):
+        self.email = email
+        self.latencia = max(0.0, float(latencia))
+        self.jitter = max(0.0, float(jitter))
+        self.unidades_por_segundo = int(unidades_por_segundo)
+        self.taxa_erro_quota = max(0.0, float(taxa_erro_quota))
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._emails = {e["id"]: e for e in emails}
+        self._ordem = [e["id"] for e in emails]
+        self._labels = {
+            "INBOX": {"id": "INBOX", "name": "INBOX", "type": "system"},
+            "UNREAD": {"id": "UNREAD", "name": "UNREAD", "type": "system"},
+        }
+        self._saldo = float(self.unidades_por_segundo)
+        self._saldo_em = time.monotonic()
+        self.registro: list[dict] = []
+
+    def users(self):
+        return _Users(self)
+
+    # --- metricas ---
+    def zerar_registro(self):
+        with self._lock:
+            self.registro = []
+
+    def resumo(self) -> dict:
+        with self._lock:
+            registro = list(self.registro)
+        por_op = {}
+        for item in registro:
+            por_op[item["op"]] = por_op.get(item["op"], 0) + 1
+        return {
+            "chamadas": len(registro),
+            "unidades": sum(i["custo"] for i in registro),
+            "erros_429": sum(1 for i in registro if i["erro"] == 429),
+            "segundos": round(sum(i["duracao"] for i in registro), 3),
+            "por_op": por_op,
+        }
+
+    # --- nucleo ---
+    def _chamar(self, op: str, fn):
+        inicio = time.monotonic()
+        espera = self.latencia
+        if self.jitter:
+            espera = max(0.0, espera + self._random.uniform(-self.jitter, self.jitter))
+        if espera:
+            time.sleep(espera)
+
+        custo = GMAIL_CUSTOS.get(op, 5)
+        with self._lock:
+            # Cota por usuario como media movel: balde de unidades_por_segundo, reposto continuamente
+            agora = time.monotonic()
+            limite = float(self.unidades_por_segundo)
+            self._saldo = min(limite, self._saldo + (agora - self._saldo_em) * limite)
+            self._saldo_em = agora
+            excedeu = limite > 0 and self._saldo < custo
+            if limite > 0 and not excedeu:
+                self._saldo -= custo
+            injetado = self.taxa_erro_quota and self._random.random() < self.taxa_erro_quota
+            item = {"op": op, "custo": custo, "erro": None, "duracao": 0.0}
+            try:
+                if excedeu or injetado:
+                    item["erro"] = 429
+                    raise _erro_quota(f"https://gmail.googleapis.com/gmail/v1/users/me/{op}")
+                return fn()
+            finally:
+                item["duracao"] = time.monotonic() - inicio
+                self.registro.append(item)
+
+    def _label_id(self, nome: str):
+        for label in self._labels.values():
+            if label["name"].lower() == nome.lower():
+                return label["id"]
+        return None
+
+    def _criar_label(self, nome: str) -> dict:
+        existente = self._label_id(nome)
+        if existente:
+            return dict(self._labels[existente])
+        label = {"id": f"Label_{len(self._labels) + 1}", "name": nome, "type": "user"}
+        self._labels[label["id"]] = label
+        return dict(label)
+
+    def _casa_query(self, email: dict, q: str) -> bool:
+        labels = set(email["labelIds"])
+        for nome in _RE_LABEL_EXCLUIDO.findall(q or ""):
+            if self._label_id(nome) in labels:
+                return False
+        resto = _RE_LABEL_EXCLUIDO.sub("", q or "")
+        for grupo in _RE_GRUPO_LABELS.findall(resto):
+            if not any(self._label_id(nome) in labels for nome in _RE_LABEL.findall(grupo)):
+                return False
+        for nome in _RE_LABEL.findall(_RE_GRUPO_LABELS.sub("", resto)):
+            if self._label_id(nome) not in labels:
+                return False
+        if "in:inbox" in (q or "") and "INBOX" not in labels:
+            return False
+        return True
+
+    def _listar(self, q: str, max_results: int, page_token):
+        ids = [mid for mid in self._ordem if self._casa_query(self._emails[mid], q)]
+        inicio = int(page_token or 0)
+        fim = inicio + max(1, int(max_results or 100))
+        resp = {"messages": [{"id": mid, "threadId": mid} for mid in ids[inicio:fim]], "resultSizeEstimate": len(ids)}
+        if fim < len(ids):
+            resp["nextPageToken"] = str(fim)
+        return resp
+
+    def _mensagem(self, msg_id: str) -> dict:
+        email = self._emails[msg_id]
+        partes = [
+            {
+                "partId": f"{n + 1}",
+                "mimeType": "application/xml",
+                "filename": spec["filename"],
+                "body": {"attachmentId": f"{msg_id}-{n}", "size": 0},
+            }
+            for n, spec in enumerate(email["anexos"])
+        ]
+        return {
+            "id": msg_id,
+            "threadId": msg_id,
+            "labelIds": list(email["labelIds"]),
+            "internalDate": email["internalDate"],
+            "payload": {
+                "mimeType": "multipart/mixed",
+                "headers": [{"name": "Subject", "value": email["subject"]}, {"name": "From", "value": "nfe@fornecedor.com.br"}],
+                "parts": [{"partId": "0", "mimeType": "text/plain", "filename": "", "body": {"size": 10}}] + partes,
+            },
+        }
+
+    def _anexo(self, msg_id: str, attach_id: str) -> dict:
+        indice = int(str(attach_id).rsplit("-", 1)[-1])
+        dados = conteudo_anexo(self._emails[msg_id]["anexos"][indice])
+        return {"size": len(dados), "data": base64.urlsafe_b64encode(dados).decode("ascii")}
+
+    def _modificar(self, msg_id: str, body: dict) -> dict:
+        email = self._emails[msg_id]
+        labels = [l for l in email["labelIds"] if l not in set(body.get("removeLabelIds", []))]
+        for label in body.get("addLabelIds", []):
+            if label and label not in labels:
+                labels.append(label)
+        email["labelIds"] = labels
+        return {"id": msg_id, "labelIds": list(labels)}
@@ -0,0 +1,338 @@
+"""
+Backend simulado do Google Sheets (mesma interface usada do gspread).
+
+Modela planilhas, abas e linhas em memoria, cota por minuto de leitura/escrita,
+latencia por chamada e 429 injetados. Toda chamada fica registrada com seu
+custo, para benchmarks e para o modo --dry-run (ver dry_run.py).
+"""
+
+import random
+import re
+import threading
+import time
+from collections import deque
+
+import gspread
+
+
+_RE_CELULA = re.compile(r"^([A-Za-z]+)(\d+)$")
+
+
+class _RespostaFalsa:
+    """Resposta HTTP minima aceita pelo construtor de gspread.exceptions.APIError."""
+
+    def __init__(self, code: int, message: str, status: str):
+        self.status_code = code
+        self._corpo = {"error": {"code": code, "message": message, "status": status}}
+        self.text = str(self._corpo)
+
+    def json(self):
+        return self._corpo
+
+
+def _erro_api(code: int, message: str, status: str):
+    return gspread.exceptions.APIError(_RespostaFalsa(code, message, status))
+
+
+def _erro_aba_existente(titulo: str):
+    return _erro_api(
+        400,
+        f'Invalid requests[0].addSheet: A sheet with the name "{titulo}" already exists. Please enter another name.',
+        "INVALID_ARGUMENT",
+    )
+
+
+def _celula(a1: str) -> tuple[int, int]:
+    """'C7' -> (7, 3). Aceita 'Aba!C7' e o inicio de intervalos ('A5:I5')."""
+    ref = str(a1).split("!")[-1].split(":")[0].replace("$", "")
+    m = _RE_CELULA.match(ref)
+    if not m:
+        raise _erro_api(400, f"Unable to parse range: {a1}", "INVALID_ARGUMENT")
+    coluna = 0
+    for ch in m.group(1).upper():
+        coluna = coluna * 26 + (ord(ch) - 64)
+    return int(m.group(2)), coluna
+
+
+class FakeWorksheet:
+    def __init__(self, planilha, title: str, sheet_id: int, rows: int = 1000, cols: int = 26):
+        self.spreadsheet = planilha
+        self.title = title
+        self.id = sheet_id
+        self.row_count = int(rows)
+        self.col_count = int(cols)
+        self.frozen_row_count = 0
+        self._linhas: list[list[str]] = []
+
+    def _ultima_linha(self) -> int:
+        for i in range(len(self._linhas), 0, -1):
+            if any(str(v) != "" for v in self._linhas[i - 1]):
+                return i
+        return 0
+
+    def _gravar(self, linha: int, coluna: int, valores):
+        for i, valores_linha in enumerate(valores):
+            idx = linha - 1 + i
+            while len(self._linhas) <= idx:
+                self._linhas.append([])
+            atual = self._linhas[idx]
+            fim = coluna - 1 + len(valores_linha)
+            if len(atual) < fim:
+                atual.extend([""] * (fim - len(atual)))
+            for j, valor in enumerate(valores_linha):
+                atual[coluna - 1 + j] = "" if valor is None else str(valor)
+        self.row_count = max(self.row_count, len(self._linhas))
+
+    def get_all_values(self, *args, **kwargs):
+        def _op():
+            ultima = self._ultima_linha()
+            largura = max((len(l) for l in self._linhas[:ultima]), default=0)
+            return [list(l) + [""] * (largura - len(l)) for l in self._linhas[:ultima]]
+
+        return self.spreadsheet.client._chamar("values.get", "read", self.spreadsheet, self.title, _op)
+
+    def update(self, range_name, values=None, **kwargs):
+        # Aceita as duas ordens de argumentos do gspread (5.x: range, values / 6.x: values, range)
+        if not isinstance(range_name, str):
+            range_name, values = values, range_name
+
+        def _op():
+            linha, coluna = _celula(range_name)
+            self._gravar(linha, coluna, values or [])
+            return {"updatedRange": f"{self.title}!{range_name}", "updatedRows": len(values or [])}
+
+        return self.spreadsheet.client._chamar("values.update", "write", self.spreadsheet, self.title, _op)
+
+    def batch_update(self, data, **kwargs):
+        def _op():
+            for item in data:
+                linha, coluna = _celula(item["range"])
+                self._gravar(linha, coluna, item.get("values") or [])
+            return {"totalUpdatedRows": sum(len(item.get("values") or []) for item in data)}
+
+        return self.spreadsheet.client._chamar("values.batchUpdate", "write", self.spreadsheet, self.title, _op)
+
+    def append_rows(self, values, **kwargs):
+        def _op():
+            self._gravar(self._ultima_linha() + 1, 1, values)
+            return {"updates": {"updatedRows": len(values)}}
+
+        return self.spreadsheet.client._chamar("values.append", "write", self.spreadsheet, self.title, _op)
+
+    def append_row(self, values, **kwargs):
+        return self.append_rows([values], **kwargs)
+
+
+class FakeSpreadsheet:
+    def __init__(self, client, sheet_id: str, title: str):
+        self.client = client
+        self.id = sheet_id
+        self.title = title
+        self._abas: list[FakeWorksheet] = []
+        self._proximo_id = 1
+
+    def _nova_aba(self, title: str, sheet_id=None, rows: int = 1000, cols: int = 26) -> FakeWorksheet:
+        if any(a.title == title for a in self._abas):
+            raise _erro_aba_existente(title)
+        if sheet_id is None:
+            sheet_id = self._proximo_id
+        self._proximo_id = max(self._proximo_id, int(sheet_id)) + 1
+        aba = FakeWorksheet(self, title, int(sheet_id), rows, cols)
+        self._abas.append(aba)
+        return aba
+
+    def _aba_por_id(self, sheet_id) -> FakeWorksheet:
+        for aba in self._abas:
+            if aba.id == sheet_id:
+                return aba
+        raise _erro_api(400, f"No grid with id: {sheet_id}", "INVALID_ARGUMENT")
+
+    def worksheets(self, *args, **kwargs):
+        return self.client._chamar("spreadsheets.get", "read", self, "", lambda: list(self._abas))
+
+    def worksheet(self, title: str):
+        def _op():
+            for aba in self._abas:
+                if aba.title == title:
+                    return aba
+            raise gspread.exceptions.WorksheetNotFound(title)
+
+        return self.client._chamar("spreadsheets.get", "read", self, title, _op)
+
+    def add_worksheet(self, title: str, rows=1000, cols=26, index=None):
+        return self.client._chamar(
+            "spreadsheets.batchUpdate", "write", self, title, lambda: self._nova_aba(title, rows=int(rows), cols=int(cols))
+        )
+
+    def batch_update(self, body: dict):
+        def _op():
+            # Valida tudo antes de aplicar: um pedido invalido rejeita o lote inteiro, como na API
+            titulos = {a.title for a in self._abas}
+            for req in body.get("requests", []):
+                if "addSheet" in req:
+                    titulo = req["addSheet"].get("properties", {}).get("title")
+                    if titulo in titulos:
+                        raise _erro_aba_existente(titulo)
+                    titulos.add(titulo)
+
+            respostas = []
+            for req in body.get("requests", []):
+                if "addSheet" in req:
+                    props = req["addSheet"].get("properties", {})
+                    grade = props.get("gridProperties", {})
+                    aba = self._nova_aba(
+                        props.get("title") or f"Sheet{self._proximo_id}",
+                        props.get("sheetId"),
+                        grade.get("rowCount", 1000),
+                        grade.get("columnCount", 26),
+                    )
+                    aba.frozen_row_count = int(grade.get("frozenRowCount", 0))
+                    respostas.append({"addSheet": {"properties": {"sheetId": aba.id, "title": aba.title}}})
+                elif "updateCells" in req:
+                    upd = req["updateCells"]
+                    inicio = upd.get("start", {})
+                    aba = self._aba_por_id(inicio.get("sheetId"))
+                    valores = []
+                    for row in upd.get("rows", []):
+                        linha = []
+                        for cel in row.get("values", []):
+                            v = cel.get("userEnteredValue", {})
+                            linha.append(next(iter(v.values()), "") if v else "")
+                        valores.append(linha)
+                    aba._gravar(int(inicio.get("rowIndex", 0)) + 1, int(inicio.get("columnIndex", 0)) + 1, valores)
+                    respostas.append({})
+                else:
+                    respostas.append({})
+            return {"spreadsheetId": self.id, "replies": respostas}
+
+        return self.client._chamar("spreadsheets.batchUpdate", "write", self, "", _op)
+
+
+class FakeClient:
+    """
+    Substituto de gspread.Client.
+    - leituras_por_minuto / escritas_por_minuto: cota (janela deslizante); excedeu, 429.
+    - latencia: segundos por chamada (com variacao de +-jitter).
+    - taxa_429: probabilidade de um 429 injetado em qualquer chamada.
+    """
+
+    def __init__(
+        self,
+        leituras_por_minuto: int = 60,
+        escritas_por_minuto: int = 60,
+        latencia: float = 0.0,
+        jitter: float = 0.0,
+        taxa_429: float = 0.0,
+        seed: int | None = None,
+    ):
+        self.leituras_por_minuto = int(leituras_por_minuto)
+        self.escritas_por_minuto = int(escritas_por_minuto)
+        self.latencia = max(0.0, float(latencia))
+        self.jitter = max(0.0, float(jitter))
+        self.taxa_429 = max(0.0, float(taxa_429))
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self._planilhas: dict[str, FakeSpreadsheet] = {}
+        self._janela = {"read": deque(), "write": deque()}
+        self.registro: list[dict] = []
+
+    # --- gerenciamento ---
+    def criar_planilha(self, title: str, sheet_id: str | None = None) -> FakeSpreadsheet:
+        with self._lock:
+            sheet_id = sheet_id or f"fake-{len(self._planilhas) + 1:04d}"
+            planilha = self._planilhas.get(sheet_id)
+            if planilha is None:
+                planilha = FakeSpreadsheet(self, sheet_id, title)
+                self._planilhas[sheet_id] = planilha
+            return planilha
+
+    def planilhas(self) -> list[FakeSpreadsheet]:
+        with self._lock:
+            return list(self._planilhas.values())
+
+    def zerar_registro(self):
+        with self._lock:
+            self.registro = []
+
+    def resumo(self) -> dict:
+        with self._lock:
+            registro = list(self.registro)
+        por_op = {}
+        for item in registro:
+            por_op[item["op"]] = por_op.get(item["op"], 0) + 1
+        return {
+            "chamadas": len(registro),
+            "leituras": sum(1 for i in registro if i["tipo"] == "read"),
+            "escritas": sum(1 for i in registro if i["tipo"] == "write"),
+            "erros_429": sum(1 for i in registro if i["erro"] == 429),
+            "segundos": round(sum(i["duracao"] for i in registro), 3),
+            "por_op": por_op,
+        }
+
+    # --- nucleo ---
+    def _cota_excedida(self, tipo: str, agora: float) -> bool:
+        limite = self.leituras_por_minuto if tipo == "read" else self.escritas_por_minuto
+        janela = self._janela[tipo]
+        while janela and agora - janela[0] >= 60.0:
+            janela.popleft()
+        if limite > 0 and len(janela) >= limite:
+            return True
+        janela.append(agora)
+        return False
+
+    def _chamar(self, op: str, tipo: str, planilha, aba: str, fn):
+        inicio = time.monotonic()
+        espera = self.latencia
+        if self.jitter:
+            espera = max(0.0, espera + self._random.uniform(-self.jitter, self.jitter))
+        if espera:
+            time.sleep(espera)
+
+        with self._lock:
+            erro = None
+            if self._cota_excedida(tipo, time.monotonic()):
+                erro = _erro_api(429, "Quota exceeded for quota metric 'Read/Write requests' per minute.", "RESOURCE_EXHAUSTED")
+            elif self.taxa_429 and self._random.random() < self.taxa_429:
+                erro = _erro_api(429, "Quota exceeded (injected).", "RESOURCE_EXHAUSTED")
+
+            item = {
+                "op": op,
+                "tipo": tipo,
+                "planilha": getattr(planilha, "id", ""),
+                "aba": aba,
+                "custo": 1,
+                "erro": 429 if erro is not None else None,
+                "duracao": 0.0,
+            }
+            try:
+                if erro is not None:
+                    raise erro
+                return fn()
+            except gspread.exceptions.APIError as e:
+                if item["erro"] is None:
+                    item["erro"] = getattr(e, "code", None) or 400
+                raise
+            finally:
+                item["duracao"] = time.monotonic() - inicio
+                self.registro.append(item)
+
+    # --- interface gspread.Client ---
+    def open_by_key(self, key: str) -> FakeSpreadsheet:
+        def _op():
+            planilha = self._planilhas.get(key)
+            if planilha is None:
+                # Planilhas do registro real sao criadas vazias sob demanda
+                planilha = self.criar_planilha(key, key)
+            return planilha
+
+        return self._chamar("spreadsheets.get", "read", None, "", _op)
+
+    def list_spreadsheet_files(self, title: str | None = None, folder_id: str | None = None):
+        def _op():
+            return [
+                {"id": p.id, "name": p.title}
+                for p in self._planilhas.values()
+                if title is None or p.title == title
+            ]
+
+        return self._chamar("drive.files.list", "read", None, "", _op)
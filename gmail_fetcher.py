@@ -1,13 +1,17 @@
 import os
 import base64
-import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 from config import DOWNLOAD_DIR
-from processor import processarXML, extrairFornecedor
+from processor import casarBraspressLote, liberarBraspressLote, processarDocumento, validarDocumento, vencimentosDocumento
 from reporter import limparRelatoriosAntigos
 from settings_manager import load_settings
 from history_store import log_email_processado
+from xml_pool import parse_lote
+from sheets_utils import provisionarVencimentos
+import dry_run
+import quota_pacer
 
 def _query_periodo(filtro_periodo_emails):
     base = (
@@ -49,11 +53,16 @@ def _query_periodo(filtro_periodo_emails):
 
 
 def getLabelID(gmail_service, label_name):
+    quota_pacer.consumir_gmail("labels.list")
     labels = gmail_service.users().labels().list(userId="me").execute().get("labels", [])
     for label in labels:
         if label["name"].lower() == label_name.lower():
             return label["id"]
 
+    if dry_run.ATIVO:
+        return None
+
+    quota_pacer.consumir_gmail("labels.create")
     novoLabel = gmail_service.users().labels().create(
         userId="me",
         body={"name": label_name, "labelListVisibility": "labelShow", "messageListVisibility": "show"}
@@ -62,12 +71,145 @@ def getLabelID(gmail_service, label_name):
     return novoLabel["id"]
 
 
+def _buscar_partes(partes):
+    encontrados = []
+    for p in partes:
+        if p.get("parts"):
+            encontrados.extend(_buscar_partes(p["parts"]))
+        elif p.get("filename", "").lower().endswith(".xml") and "attachmentId" in p.get("body", {}):
+            encontrados.append(p)
+    return encontrados
+
+
+def _baixar_mensagem(gmail_service, msgID, origemNome, stop_event=None):
+    """Baixa metadados e anexos XML de um e-mail, sem processar (None se falhar)."""
+    try:
+        quota_pacer.consumir_gmail("messages.get")
+        message = gmail_service.users().messages().get(
+            userId="me",
+            id=msgID,
+            format="full",
+        ).execute()
+    except Exception as e:
+        if "429" in str(e):
+            quota_pacer.esgotar("gmail")
+        if "[WinError 2]" not in str(e):
+            print(f"({origemNome}) Erro ao acessar e-mail: {e}")
+        return None
+
+    payload = message.get("payload", {})
+    headers = payload.get("headers", []) if isinstance(payload, dict) else []
+    subject = ""
+    for h in headers:
+        if str(h.get("name", "")).lower() == "subject":
+            subject = str(h.get("value", ""))
+            break
+    data_email = ""
+    try:
+        internal_ms = int(message.get("internalDate", "0"))
+        if internal_ms > 0:
+            data_email = datetime.fromtimestamp(internal_ms / 1000).isoformat()
+    except Exception:
+        data_email = ""
+
+    parts = message.get("payload", {}).get("parts", [])
+    anexosXML = _buscar_partes(parts)
+    item = {
+        "id": msgID,
+        "subject": subject,
+        "data_email": data_email,
+        "xml_total": len(anexosXML),
+        "xml_names": [p.get("filename", "") for p in anexosXML if p.get("filename")],
+        "anexos": [],
+        "tentou_analisar": False,
+        "interrompido": False,
+    }
+
+    for part in anexosXML:
+        if stop_event and stop_event.is_set():
+            item["interrompido"] = True
+            break
+        filename = part.get("filename")
+        attachID = part["body"].get("attachmentId")
+
+        if not filename or not attachID:
+            continue
+
+        if any(x in filename.upper() for x in ["DOMINIO"]):
+            item["tentou_analisar"] = True
+            continue
+
+        try:
+            quota_pacer.consumir_gmail("attachments.get")
+            attachment = gmail_service.users().messages().attachments().get(
+                userId="me", messageId=msgID, id=attachID
+            ).execute()
+            data = attachment.get("data")
+            fileData = base64.urlsafe_b64decode(data.encode("UTF-8"))
+        except Exception as e:
+            if "429" in str(e):
+                quota_pacer.esgotar("gmail")
+            if "[WinError 2]" not in str(e):
+                print(f"({origemNome}) Erro ao processar anexo: {e}")
+            continue
+
+        item["anexos"].append(
+            {
+                "filename": filename,
+                "filePath": os.path.join(DOWNLOAD_DIR, filename),
+                "data": fileData,
+            }
+        )
+
+    return item
+
+
+def _processar_anexos(item, origemNome, stop_event=None) -> int:
+    """Roteia os documentos ja extraidos de um e-mail; retorna quantos XMLs foram lancados."""
+    xmlsInseridos = 0
+    for anexo in item["anexos"]:
+        if stop_event and stop_event.is_set():
+            item["interrompido"] = True
+            break
+        filePath = anexo["filePath"]
+
+        try:
+            documento = validarDocumento(anexo["documento"], anexo["erro"], filePath)
+            if documento is None:
+                item["tentou_analisar"] = True
+                continue
+
+            fornecedor_xml = documento.fornecedor_upper
+            if fornecedor_xml in [
+                "ELETRONICA HORIZONTE COMERCIO DE PRODUTOS ELETRONICOS LTDA",
+                "MVA COMERCIO DE PRODUTOS ELETRONICOS LTDA EPP",
+            ]:
+                item["tentou_analisar"] = True
+                continue
+
+            print(f"XML lido: {anexo['filename']}")
+            inseriu = processarDocumento(documento, filePath)
+            item["tentou_analisar"] = True
+            if inseriu:
+                xmlsInseridos += 1
+
+        except Exception as e:
+            if "[WinError 2]" in str(e):
+                continue
+            print(f"({origemNome}) Erro ao processar anexo: {e}")
+            continue
+
+    return xmlsInseridos
+
+
 def processarEmails(gmail_service, origemNome, stop_event=None):
     """Busca e baixa XMLs de uma conta Gmail e os processa."""
     label_processado = getLabelID(gmail_service, "XML Processado")
     label_analisado = getLabelID(gmail_service, "XML Analisado")
 
     cfg = load_settings()
+    quota_pacer.configurar(cfg)
+    espera_inicial = quota_pacer.espera_total()
     query = _query_periodo(cfg.get("gmail_filter_mode", "last_30_days"))
     max_paginas = int(cfg.get("gmail_max_pages", 3))
     page_size = int(cfg.get("gmail_page_size", 50))
@@ -84,6 +226,7 @@ def processarEmails(gmail_service, origemNome, stop_event=None):
             maxResults=page_size,
             pageToken=next_page_token,
         )
+        quota_pacer.consumir_gmail("messages.list")
         results = req.execute()
         mensagens_brutas.extend(results.get("messages", []))
         next_page_token = results.get("nextPageToken")
@@ -102,150 +245,98 @@ def processarEmails(gmail_service, origemNome, stop_event=None):
 
     emailsSemXML = 0
     xmlsProcessadosTOTAL = 0
+    parse_workers = int(cfg.get("xml_parse_workers", 0))
+    parse_lote_minimo = int(cfg.get("xml_parse_min_batch", 16))
+    tamanho_lote = int(cfg.get("gmail_batch_messages", 25))
+    rota_workers = int(cfg.get("sheets_route_workers", 2))
+    braspress_workers = int(cfg.get("braspress_prefetch_workers", 2))
 
     interrompido = False
-    for msg in messages:
-        if stop_event and stop_event.is_set():
-            interrompido = True
-            break
-        msgID = msg["id"]
-
-        try:
-            message = gmail_service.users().messages().get(
-                userId="me",
-                id=msgID,
-                format="full",
-            ).execute()
-        except Exception as e:
-            if "[WinError 2]" in str(e):
+    for inicio in range(0, len(messages), tamanho_lote):
+        # Etapa 1: baixa e-mails e anexos do lote
+        lote = []
+        for msg in messages[inicio:inicio + tamanho_lote]:
+            if stop_event and stop_event.is_set():
+                interrompido = True
+                break
+            item = _baixar_mensagem(gmail_service, msg["id"], origemNome, stop_event)
+            if item is None:
                 continue
-            print(f"({origemNome}) Erro ao acessar e-mail: {e}")
-            continue
-
-        payload = message.get("payload", {})
-        headers = payload.get("headers", []) if isinstance(payload, dict) else []
-        subject = ""
-        for h in headers:
-            if str(h.get("name", "")).lower() == "subject":
-                subject = str(h.get("value", ""))
+            if item["interrompido"]:
+                interrompido = True
                 break
-        data_email = ""
-        try:
-            internal_ms = int(message.get("internalDate", "0"))
-            if internal_ms > 0:
-                data_email = datetime.fromtimestamp(internal_ms / 1000).isoformat()
-        except Exception:
-            data_email = ""
-
-        def buscarPartes(partes):
-            encontrados = []
-            for p in partes:
-                if p.get("parts"):
-                    encontrados.extend(buscarPartes(p["parts"]))
-                elif p.get("filename", "").lower().endswith(".xml") and "attachmentId" in p.get("body", {}):
-                    encontrados.append(p)
-            return encontrados
-
-        parts = message.get("payload", {}).get("parts", [])
-        anexosXML = buscarPartes(parts)
-        xml_names = [p.get("filename", "") for p in anexosXML if p.get("filename")]
-
-        if not anexosXML:
-            emailsSemXML += 1
-            continue
+            if not item["xml_total"]:
+                emailsSemXML += 1
+                continue
+            lote.append(item)
 
-        xmlsInseridos = 0
-        tentou_analisar = False
+        if interrompido:
+            break
 
-        for part in anexosXML:
-            if stop_event and stop_event.is_set():
-                interrompido = True
-                break
-            filename = part.get("filename")
-            attachID = part["body"].get("attachmentId")
+        # Etapa 2: parse de todos os anexos do lote (pool de processos ou local)
+        anexos = [anexo for item in lote for anexo in item["anexos"]]
+        resultados = parse_lote([a["data"] for a in anexos], parse_workers, parse_lote_minimo)
+        for anexo, (documento, erro) in zip(anexos, resultados):
+            anexo["data"] = None
+            anexo["documento"] = documento
+            anexo["erro"] = erro
 
-            if not filename or not attachID:
-                continue
+        # Abas mensais que faltam sao criadas antes da escrita, um batch_update por planilha
+        pares = [par for a in anexos if not a["erro"] for par in vencimentosDocumento(a["documento"])]
+        if pares:
+            provisionarVencimentos(pares)
+
+        # CT-e Braspress do lote disputam as mesmas faturas: casamento feito de uma vez
+        casarBraspressLote([a["documento"] for a in anexos if not a["erro"]], braspress_workers)
 
-            filePath = os.path.join(DOWNLOAD_DIR, filename)
-
-            try:
-                attachment = gmail_service.users().messages().attachments().get(
-                    userId="me", messageId=msgID, id=attachID
-                ).execute()
-
-                data = attachment.get("data")
-                fileData = base64.urlsafe_b64decode(data.encode("UTF-8"))
-                with open(filePath, "wb") as f:
-                    f.write(fileData)
-
-                if any(x in filename.upper() for x in ["DOMINIO"]):
-                    try:
-                        os.remove(filePath)
-                    except Exception:
-                        pass
-                    tentou_analisar = True
-                    continue
-
-                fornecedor_xml = extrairFornecedor(filePath)
-                if fornecedor_xml in [
-                    "ELETRONICA HORIZONTE COMERCIO DE PRODUTOS ELETRONICOS LTDA",
-                    "MVA COMERCIO DE PRODUTOS ELETRONICOS LTDA EPP",
-                ]:
-                    try:
-                        os.remove(filePath)
-                    except Exception:
-                        pass
-                    tentou_analisar = True
-                    continue
-
-                print(f"XML salvo: {filePath}")
-                inseriu = processarXML(filePath)
-                tentou_analisar = True
-                if inseriu:
-                    xmlsInseridos += 1
-                    xmlsProcessadosTOTAL += 1
+        # Etapa 3: roteamento dos e-mails em paralelo (a escrita de cada planilha
+        # e serializada na sua faixa do sheets_writer), depois rotulos em ordem
+        try:
+            if rota_workers > 1 and len(lote) > 1:
+                with ThreadPoolExecutor(max_workers=rota_workers) as pool:
+                    inseridos = list(pool.map(lambda it: _processar_anexos(it, origemNome, stop_event), lote))
+            else:
+                inseridos = [_processar_anexos(item, origemNome, stop_event) for item in lote]
+        finally:
+            liberarBraspressLote()
+
+        for item, xmlsInseridos in zip(lote, inseridos):
+            xmlsProcessadosTOTAL += xmlsInseridos
+            if item["interrompido"]:
+                interrompido = True
 
+            if item["tentou_analisar"]:
+                add_labels = [label_analisado]
+                if xmlsInseridos > 0:
+                    add_labels.append(label_processado)
+
+                if not dry_run.ATIVO:
+                    quota_pacer.consumir_gmail("messages.modify")
+                    gmail_service.users().messages().modify(
+                        userId="me",
+                        id=item["id"],
+                        body={
+                            "removeLabelIds": ["UNREAD"],
+                            "addLabelIds": add_labels,
+                        },
+                    ).execute()
                 try:
-                    os.remove(filePath)
-                except FileNotFoundError:
+                    log_email_processado(
+                        conta=origemNome,
+                        msg_id=item["id"],
+                        subject=item["subject"],
+                        data_email=item["data_email"],
+                        xml_total=item["xml_total"],
+                        xml_lancados=xmlsInseridos,
+                        xml_arquivos=item["xml_names"],
+                    )
+                except Exception:
                     pass
+            else:
+                emailsSemXML += 1
 
-                time.sleep(1)
-
-            except Exception as e:
-                if "[WinError 2]" in str(e):
-                    continue
-                print(f"({origemNome}) Erro ao processar anexo: {e}")
-                continue
-
-        if tentou_analisar:
-            add_labels = [label_analisado]
-            if xmlsInseridos > 0:
-                add_labels.append(label_processado)
-
-            gmail_service.users().messages().modify(
-                userId="me",
-                id=msgID,
-                body={
-                    "removeLabelIds": ["UNREAD"],
-                    "addLabelIds": add_labels,
-                },
-            ).execute()
-            try:
-                log_email_processado(
-                    conta=origemNome,
-                    msg_id=msgID,
-                    subject=subject,
-                    data_email=data_email,
-                    xml_total=len(anexosXML),
-                    xml_lancados=xmlsInseridos,
-                    xml_arquivos=xml_names,
-                )
-            except Exception:
-                pass
-        else:
-            emailsSemXML += 1
+            if interrompido:
+                break
 
         if interrompido:
             break
@@ -255,6 +346,10 @@ def processarEmails(gmail_service, origemNome, stop_event=None):
     elif emailsSemXML < len(messages):
         print(f"({origemNome}) Nenhum XML valido processado.")
 
+    espera = quota_pacer.espera_total() - espera_inicial
+    if espera > 0:
+        print(f"({origemNome}) Tempo aguardando cota de API: {espera:.1f}s")
+
     if interrompido:
         print(f"({origemNome}) Verificacao interrompida manualmente.\n")
     else:
@@ -1,13 +1,64 @@
+"""
+Historico de eventos em segmentos mensais.
+
+Os eventos ficam em <historico_eventos>/AAAA-MM.jsonl, um por linha. Cada
+segmento tem um indice ao lado (AAAA-MM.idx, uma entrada JSON por evento:
+offset, fim, dia, tipo, cnpj_emit, cnpj_dest). Em memoria o indice vira listas
+de posicoes por dia, tipo e CNPJ; uma consulta abre so os segmentos do periodo,
+escolhe a menor lista de candidatos e decodifica apenas as linhas que passam
+nos filtros, do fim para o comeco, ate o limite.
+
+O indice e reconstruido a partir do segmento se faltar ou estiver atrasado
+(linhas gravadas por fora sao indexadas na proxima consulta). O arquivo antigo
+historico_eventos.jsonl e migrado uma vez e renomeado para .migrado.
+
+Com "history_backend": "sqlite" os eventos vao para historico_eventos.sqlite3
+(events_sqlite), importando os segmentos uma vez; a partir dai os segmentos
+deixam de receber eventos.
+
+As gravacoes passam pelo gravador em lote (events_writer); consultas esperam
+a fila esvaziar antes de ler.
+"""
+
 import json
+import os
+import shutil
 import threading
 from datetime import datetime
 from pathlib import Path
 
 from config import RELATORIO_DIR
+from events_sqlite import BaseEventos, condicao_contem, condicoes_periodo
+from events_writer import GravadorEventos
+from settings_manager import load_settings
 
 
 _LOCK = threading.Lock()
 _HISTORY_FILE = Path(RELATORIO_DIR) / "historico_eventos.jsonl"
+_MARCA_MIGRACAO = ".migrado"
+
+_indices = {}  # caminho do segmento -> _IndiceSegmento
+_preparado = False
+_db = None  # BaseEventos quando history_backend == "sqlite"
+_gravador = None
+
+
+def definir_arquivo(caminho):
+    """Aponta o historico para outro arquivo (ex: --dry-run, benchmarks)."""
+    global _HISTORY_FILE, _preparado, _db
+    if _gravador is not None:
+        _gravador.esvaziar()  # o que ja foi registrado vai para o arquivo anterior
+    with _LOCK:
+        _HISTORY_FILE = Path(caminho)
+        _indices.clear()
+        _preparado = False
+        if _db is not None:
+            _db.fechar()
+            _db = None
+
+
+def _pasta_segmentos() -> Path:
+    return _HISTORY_FILE.with_suffix("")
 
 
 def _ensure_parent():
@@ -18,14 +69,285 @@ def _now_iso() -> str:
     return datetime.now().isoformat()
 
 
-def append_event(event_type: str, payload: dict):
+# === Indice por segmento ===
+class _IndiceSegmento:
+    """Entradas (offset, fim, dia, tipo, emit, dest) na ordem do arquivo e listas de posicoes."""
+
+    def __init__(self, segmento: Path):
+        self.segmento = segmento
+        self.arquivo = segmento.with_suffix(".idx")
+        self.tamanho = 0
+        self.entradas = []
+        self.dias = {}
+        self.tipos = {}
+        self.emit = {}
+        self.dest = {}
+
+    def _adicionar(self, entrada):
+        pos = len(self.entradas)
+        self.entradas.append(entrada)
+        _, fim, dia, tipo, emit, dest = entrada
+        self.dias.setdefault(dia, []).append(pos)
+        self.tipos.setdefault(tipo, []).append(pos)
+        if emit:
+            self.emit.setdefault(emit, []).append(pos)
+        if dest:
+            self.dest.setdefault(dest, []).append(pos)
+        self.tamanho = fim
+
+    def carregar(self):
+        """Le o .idx; se nao bater com o segmento, reindexa a partir do ultimo ponto confiavel."""
+        tamanho_real = self.segmento.stat().st_size if self.segmento.exists() else 0
+        integro = self.arquivo.exists()
+        if integro:
+            with self.arquivo.open("r", encoding="utf-8") as f:
+                for linha in f:
+                    try:
+                        entrada = tuple(json.loads(linha))
+                    except Exception:
+                        integro = False
+                        break
+                    if len(entrada) != 6 or entrada[0] != self.tamanho or entrada[1] > tamanho_real:
+                        integro = False
+                        break
+                    self._adicionar(entrada)
+        if not integro:
+            self._regravar()
+        self.atualizar()
+
+    def _regravar(self):
+        tmp = self.arquivo.with_suffix(".idx.tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            for entrada in self.entradas:
+                f.write(json.dumps(entrada, ensure_ascii=False) + "\n")
+        os.replace(tmp, self.arquivo)
+
+    def atualizar(self):
+        """Indexa linhas do segmento alem de self.tamanho (gravadas por fora do indice)."""
+        tamanho_real = self.segmento.stat().st_size if self.segmento.exists() else 0
+        if tamanho_real < self.tamanho:
+            # Segmento truncado ou substituido por fora: indice refeito do zero
+            self.__init__(self.segmento)
+            self._regravar()
+        if tamanho_real <= self.tamanho:
+            return
+        novas = []
+        with self.segmento.open("rb") as f:
+            f.seek(self.tamanho)
+            offset = self.tamanho
+            for linha in f:
+                if not linha.endswith(b"\n"):
+                    break  # linha ainda sendo escrita
+                fim = offset + len(linha)
+                entrada = _entrada(offset, fim, linha)
+                if entrada is not None:
+                    novas.append(entrada)
+                else:
+                    # Linha invalida: entra no indice so para manter a continuidade dos offsets
+                    novas.append((offset, fim, "", "", "", ""))
+                offset = fim
+        self.registrar(novas)
+
+    def registrar(self, novas):
+        if not novas:
+            return
+        for entrada in novas:
+            self._adicionar(entrada)
+        with self.arquivo.open("a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in novas))
+
+
+def _campos(item: dict):
+    return (
+        _date_part(item.get("at", "")),
+        str(item.get("type", "")),
+        str(item.get("cnpj_emit", "") or "").strip().lower(),
+        str(item.get("cnpj_dest", "") or "").strip().lower(),
+    )
+
+
+def _entrada(offset: int, fim: int, linha: bytes):
+    try:
+        item = json.loads(linha)
+    except Exception:
+        return None
+    if not isinstance(item, dict):
+        return None
+    return (offset, fim) + _campos(item)
+
+
+def _indice(segmento: Path) -> _IndiceSegmento:
+    """Indice em cache (chamar com _LOCK); alcanca linhas novas do segmento."""
+    indice = _indices.get(segmento)
+    if indice is None:
+        indice = _IndiceSegmento(segmento)
+        indice.carregar()
+        _indices[segmento] = indice
+    else:
+        indice.atualizar()
+    return indice
+
+
+# === Migracao do arquivo unico ===
+def _migrar_legado():
+    pasta = _pasta_segmentos()
+    legado = _HISTORY_FILE
+    if not legado.exists():
+        return
+    if (pasta / _MARCA_MIGRACAO).exists():
+        # Migracao concluida, so faltou renomear o arquivo antigo
+        os.replace(legado, legado.with_name(legado.name + ".migrado"))
+        return
+
+    print(f"[Historico] Migrando {legado.name} para segmentos mensais...")
+    destino = pasta if pasta.exists() else pasta.with_name(pasta.name + ".migrando")
+    if destino != pasta and destino.exists():
+        shutil.rmtree(destino)
+    destino.mkdir(parents=True, exist_ok=True)
+
+    arquivos = {}
+    total = 0
+    try:
+        with legado.open("rb") as f:
+            for linha in f:
+                linha = linha.rstrip(b"\r\n")
+                if not linha.strip():
+                    continue
+                try:
+                    item = json.loads(linha)
+                    mes = _date_part(item.get("at", ""))[:7]
+                except Exception:
+                    continue
+                if len(mes) != 7:
+                    continue  # sem data valida nunca aparecia nas consultas
+                if mes not in arquivos:
+                    arquivos[mes] = (destino / f"{mes}.jsonl").open("ab")
+                arquivos[mes].write(linha + b"\n")
+                total += 1
+    finally:
+        for arq in arquivos.values():
+            arq.close()
+
+    (destino / _MARCA_MIGRACAO).write_text(_now_iso(), encoding="utf-8")
+    if destino != pasta:
+        os.replace(destino, pasta)
+    os.replace(legado, legado.with_name(legado.name + ".migrado"))
+    print(f"[Historico] Migracao concluida: {total} evento(s) em {len(arquivos)} segmento(s).")
+
+
+def _eventos_segmentos():
+    for segmento in sorted(_pasta_segmentos().glob("*.jsonl")):
+        with segmento.open("rb") as f:
+            for linha in f:
+                try:
+                    item = json.loads(linha)
+                except Exception:
+                    continue
+                if isinstance(item, dict):
+                    yield item
+
+
+def _preparar():
+    """Garante pasta de segmentos, migracoes e o backend configurado (chamar com _LOCK)."""
+    global _preparado, _db
+    if _preparado:
+        return
     _ensure_parent()
+    _migrar_legado()
+    _pasta_segmentos().mkdir(parents=True, exist_ok=True)
+    if str(load_settings().get("history_backend", "jsonl")) == "sqlite":
+        _db = BaseEventos(
+            _HISTORY_FILE.with_suffix(".sqlite3"),
+            colunas={
+                "type": lambda item: item.get("type", ""),
+                "cnpj_emit": lambda item: str(item.get("cnpj_emit", "") or "").strip().lower(),
+                "cnpj_dest": lambda item: str(item.get("cnpj_dest", "") or "").strip().lower(),
+            },
+            indices=["type", "cnpj_emit", "cnpj_dest"],
+        )
+        if not _db.migrado():
+            print("[Historico] Importando segmentos para o SQLite...")
+            total = _db.migrar(_eventos_segmentos(), _texto_busca, origem=str(_pasta_segmentos()))
+            print(f"[Historico] {total} evento(s) importado(s).")
+    _preparado = True
+
+
+# === Escrita ===
+def _gravar(eventos: list[dict], fsync: bool = False):
+    """Acrescenta eventos aos segmentos do mes e ao indice (chamar com _LOCK)."""
+    _preparar()
+    if _db is not None:
+        _db.inserir(eventos, _texto_busca)
+        return
+    por_segmento = {}
+    for data in eventos:
+        mes = _date_part(data.get("at", ""))[:7]
+        if len(mes) != 7:
+            mes = datetime.now().strftime("%Y-%m")
+        por_segmento.setdefault(_pasta_segmentos() / f"{mes}.jsonl", []).append(data)
+
+    for segmento, itens in por_segmento.items():
+        indice = _indice(segmento)
+        novas = []
+        with segmento.open("ab") as f:
+            offset = f.seek(0, os.SEEK_END)
+            if offset > indice.tamanho:
+                # Sobra de uma gravacao interrompida (linha sem \n): fecha a linha e
+                # ela entra no indice como invalida, mantendo os offsets continuos
+                f.write(b"\n")
+                offset += 1
+                novas.append((indice.tamanho, offset, "", "", "", ""))
+            blocos = []
+            for data in itens:
+                linha = (json.dumps(data, ensure_ascii=False) + "\n").encode("utf-8")
+                novas.append((offset, offset + len(linha)) + _campos(data))
+                blocos.append(linha)
+                offset += len(linha)
+            f.write(b"".join(blocos))
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        indice.registrar(novas)
+
+
+def _gravar_lote(eventos: list[dict], fsync: bool):
+    with _LOCK:
+        _gravar(eventos, fsync)
+
+
+def _gravador_eventos() -> GravadorEventos:
+    global _gravador
+    if _gravador is None:
+        with _LOCK:
+            if _gravador is None:
+                cfg = load_settings()
+                _gravador = GravadorEventos(
+                    "historico",
+                    _gravar_lote,
+                    max_lote=int(cfg.get("event_writer_batch", 256)),
+                    intervalo_ms=int(cfg.get("event_writer_interval_ms", 200)),
+                    fsync=str(cfg.get("event_writer_fsync", "off")),
+                )
+    return _gravador
+
+
+def append_event(event_type: str, payload: dict):
     data = {"type": event_type, "at": _now_iso()}
     data.update(payload or {})
-    line = json.dumps(data, ensure_ascii=False)
-    with _LOCK:
-        with _HISTORY_FILE.open("a", encoding="utf-8") as f:
-            f.write(line + "\n")
+    _gravador_eventos().enfileirar([data])
+
+
+def append_events(event_type: str, payloads: list[dict]):
+    """Varios eventos do mesmo tipo de uma vez (entram juntos na fila de gravacao)."""
+    if not payloads:
+        return
+    at = _now_iso()
+    eventos = []
+    for payload in payloads:
+        data = {"type": event_type, "at": at}
+        data.update(payload or {})
+        eventos.append(data)
+    _gravador_eventos().enfileirar(eventos)
 
 
 def log_email_processado(
@@ -62,6 +384,11 @@ def log_boleto_lancado(payload: dict):
     append_event("boleto_lancado", payload or {})
 
 
+def log_boletos_lancados(payloads: list[dict]):
+    append_events("boleto_lancado", payloads)
+
+
+# === Consulta ===
 def _match_filter(value: str, filter_value: str) -> bool:
     if not filter_value:
         return True
@@ -86,10 +413,7 @@ def _in_range(event_at: str, dt_from: str, dt_to: str) -> bool:
     return True
 
 
-def _match_search(item: dict, query: str) -> bool:
-    if not query:
-        return True
-    q = query.lower()
+def _texto_busca(item: dict) -> str:
     fields = [
         item.get("subject", ""),
         item.get("fornecedor", ""),
@@ -100,8 +424,48 @@ def _match_search(item: dict, query: str) -> bool:
         item.get("arquivo_xml", ""),
         item.get("local_lancamento", ""),
     ]
-    hay = " ".join(str(f) for f in fields).lower()
-    return q in hay
+    return " ".join(str(f) for f in fields)
+
+
+def _match_search(item: dict, query: str) -> bool:
+    if not query:
+        return True
+    return query.lower() in _texto_busca(item).lower()
+
+
+def _segmentos(dt_from: str, dt_to: str) -> list[Path]:
+    """Segmentos cujo mes cruza o periodo, do mais novo para o mais antigo."""
+    mes_de, mes_ate = dt_from[:7], dt_to[:7]
+    saida = []
+    for segmento in _pasta_segmentos().glob("*.jsonl"):
+        mes = segmento.stem
+        if (mes_de and mes < mes_de) or (mes_ate and mes > mes_ate):
+            continue
+        saida.append(segmento)
+    return sorted(saida, reverse=True)
+
+
+def _uniao(postings: dict, chaves) -> list[int]:
+    chaves = list(chaves)
+    if len(chaves) == 1:
+        return postings[chaves[0]]
+    return sorted(p for c in chaves for p in postings[c])
+
+
+def _candidatos(indice: _IndiceSegmento, dt_from: str, dt_to: str, cnpj_emit: str, cnpj_dest: str, event_type: str):
+    """Menor lista de posicoes que cobre os filtros indexados (None = todas)."""
+    listas = []
+    if event_type:
+        listas.append(indice.tipos.get(event_type, []))
+    if dt_from or dt_to:
+        dias = (d for d in indice.dias if d and (not dt_from or d >= dt_from) and (not dt_to or d <= dt_to))
+        listas.append(_uniao(indice.dias, dias))
+    for filtro, postings in ((cnpj_emit, indice.emit), (cnpj_dest, indice.dest)):
+        if filtro:
+            listas.append(_uniao(postings, (c for c in postings if filtro.lower() in c)))
+    if not listas:
+        return None
+    return min(listas, key=len)
 
 
 def query_events(
@@ -113,35 +477,64 @@ def query_events(
     query: str = "",
     limit: int = 500,
 ) -> list[dict]:
-    _ensure_parent()
-    if not _HISTORY_FILE.exists():
-        return []
-
+    if _gravador is not None:
+        _gravador.esvaziar()
+    max_rows = max(1, int(limit))
     rows: list[dict] = []
     with _LOCK:
-        lines = _HISTORY_FILE.read_text(encoding="utf-8", errors="replace").splitlines()
+        _preparar()
+        db = _db
+        segmentos = _segmentos(dt_from, dt_to) if db is None else []
 
-    for line in reversed(lines):
-        if not line.strip():
-            continue
-        try:
-            item = json.loads(line)
-        except Exception:
-            continue
+    if db is not None:
+        condicoes = condicoes_periodo(dt_from, dt_to)
+        if event_type:
+            condicoes.append(("type = ?", (event_type,)))
+        if cnpj_emit:
+            condicoes.append(condicao_contem("cnpj_emit", cnpj_emit))
+        if cnpj_dest:
+            condicoes.append(condicao_contem("cnpj_dest", cnpj_dest))
 
-        if event_type and item.get("type") != event_type:
-            continue
-        if not _in_range(item.get("at", ""), dt_from, dt_to):
-            continue
-        if not _match_filter(str(item.get("cnpj_emit", "")), cnpj_emit):
-            continue
-        if not _match_filter(str(item.get("cnpj_dest", "")), cnpj_dest):
-            continue
-        if not _match_search(item, query):
-            continue
+        def confirmar(item):
+            return (
+                (not event_type or item.get("type") == event_type)
+                and _in_range(item.get("at", ""), dt_from, dt_to)
+                and _match_filter(str(item.get("cnpj_emit", "")), cnpj_emit)
+                and _match_filter(str(item.get("cnpj_dest", "")), cnpj_dest)
+                and _match_search(item, query)
+            )
+
+        return db.consultar(condicoes, query.strip(), confirmar, max_rows)
+
+    for segmento in segmentos:
+        with _LOCK:
+            indice = _indice(segmento)
+            entradas = indice.entradas[:]  # listas so crescem: copia rasa e um retrato consistente
+            candidatos = _candidatos(indice, dt_from, dt_to, cnpj_emit, cnpj_dest, event_type)
+            if candidatos is not None:
+                candidatos = candidatos[:]
+        posicoes = reversed(candidatos) if candidatos is not None else range(len(entradas) - 1, -1, -1)
+
+        with segmento.open("rb") as f:
+            for pos in posicoes:
+                offset, fim, dia, tipo, emit, dest = entradas[pos]
+                # Filtros resolvidos pelo indice, sem ler a linha
+                if not dia or (event_type and tipo != event_type):
+                    continue
+                if (dt_from and dia < dt_from) or (dt_to and dia > dt_to):
+                    continue
+                if not _match_filter(emit, cnpj_emit) or not _match_filter(dest, cnpj_dest):
+                    continue
+                f.seek(offset)
+                try:
+                    item = json.loads(f.read(fim - offset))
+                except Exception:
+                    continue
+                if not _match_search(item, query):
+                    continue
 
-        rows.append(item)
-        if len(rows) >= max(1, int(limit)):
-            break
+                rows.append(item)
+                if len(rows) >= max_rows:
+                    return rows
 
     return rows
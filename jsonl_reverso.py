@@ -0,0 +1,33 @@
+"""
+Leitura de arquivos JSONL do fim para o comeco, em blocos.
+
+Para consultas "mais novos primeiro" que param no limite: o custo depende de
+quantas linhas sao lidas ate satisfazer a consulta, nao do tamanho do arquivo.
+"""
+
+import os
+
+
+BLOCO = 64 * 1024
+
+
+def linhas_reversas(caminho, fim: int | None = None, bloco: int = BLOCO):
+    """
+    Gera as linhas (bytes, sem o \\n) da ultima para a primeira, ignorando as
+    vazias. fim limita a leitura aos primeiros `fim` bytes (tamanho tirado sob
+    lock pelo chamador, para nao pegar uma linha sendo escrita).
+    """
+    with open(caminho, "rb") as f:
+        pos = f.seek(0, os.SEEK_END) if fim is None else fim
+        resto = b""
+        while pos > 0:
+            ler = min(bloco, pos)
+            pos -= ler
+            f.seek(pos)
+            partes = (f.read(ler) + resto).split(b"\n")
+            resto = partes[0]
+            for linha in reversed(partes[1:]):
+                if linha.strip():
+                    yield linha
+        if resto.strip():
+            yield resto
@@ -0,0 +1,113 @@
+import threading
+from datetime import datetime
+
+import gspread
+
+import ledger_store
+import quota_pacer
+
+
+class LedgerReconciler:
+    """
+    Compara periodicamente o ledger local com as abas das planilhas.
+    - Lancamentos feitos manualmente pelo financeiro entram no ledger.
+    - Linhas apagadas da planilha deixam de bloquear novos lancamentos.
+    """
+
+    def __init__(self, interval_minutes: int = 60, pause_seconds: float = 2.0):
+        self.interval_minutes = max(5, int(interval_minutes))
+        self.pause_seconds = max(0.0, float(pause_seconds))
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _ler_aba(self, aba):
+        import sheets_writer
+
+        for _ in range(3):
+            try:
+                quota_pacer.consumir("sheets_read")
+                return aba.get_all_values()
+            except gspread.exceptions.APIError as e:
+                if "429" in str(e):
+                    sheets_writer.backoff("sheets_read")
+                    continue
+                raise
+        return None
+
+    def _sincronizar(self, total: dict, empresa: str, ano: int, aba: str, linhas, lido_em: str):
+        res = ledger_store.sincronizar_aba(empresa, ano, aba, linhas, lido_em)
+        total["abas"] += 1
+        total["adicionados"] += res["adicionados"]
+        total["removidos"] += res["removidos"]
+
+    def reconcile_once(self) -> dict:
+        from sheets_utils import abasMensais, getPlanilha, planilhasRegistradas
+
+        total = {"abas": 0, "adicionados": 0, "removidos": 0}
+        ano_minimo = datetime.now().year - 1
+        no_ledger = {}
+        for empresa, ano, aba in ledger_store.abas_registradas(ano_minimo):
+            no_ledger.setdefault((empresa, ano), set()).add(aba)
+
+        # Todas as abas mensais de cada planilha, inclusive as que o bot nunca
+        # escreveu (lancamentos so manuais tambem precisam entrar no ledger)
+        for empresa, ano in planilhasRegistradas(ano_minimo):
+            if self._stop.is_set():
+                break
+            try:
+                planilha = getPlanilha(f"{empresa}_{ano}")
+                abas = abasMensais(planilha) if planilha else None
+            except KeyError:
+                continue
+            except Exception as e:
+                print(f"[Ledger] Falha ao listar abas de {empresa} {ano}: {e}")
+                continue
+            if abas is None:
+                continue
+
+            # Aba apagada da planilha: os lancamentos dela deixam de bloquear
+            for titulo in sorted(no_ledger.get((empresa, ano), set()) - set(abas)):
+                self._sincronizar(total, empresa, ano, titulo, [], datetime.now().isoformat())
+
+            for titulo, aba in abas.items():
+                if self._stop.is_set():
+                    break
+                # Lancamentos registrados depois deste instante podem nao estar na leitura
+                lido_em = datetime.now().isoformat()
+                try:
+                    linhas = self._ler_aba(aba)
+                except Exception as e:
+                    print(f"[Ledger] Falha ao ler {empresa} {ano}/{titulo}: {e}")
+                    continue
+                if linhas is None:
+                    continue
+                self._sincronizar(total, empresa, ano, titulo, linhas, lido_em)
+                if self.pause_seconds:
+                    self._stop.wait(self.pause_seconds)
+
+        if total["adicionados"] or total["removidos"]:
+            print(
+                f"[Ledger] Reconciliacao: {total['abas']} aba(s), "
+                f"+{total['adicionados']} / -{total['removidos']} lancamento(s)."
+            )
+        return total
+
+    def _loop(self):
+        print(f"[Ledger] Reconciliador ativo: intervalo={self.interval_minutes}min")
+        while not self._stop.is_set():
+            if self._stop.wait(self.interval_minutes * 60):
+                return
+            try:
+                self.reconcile_once()
+            except Exception as e:
+                print(f"[Ledger] Falha na reconciliacao: {e}")
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,194 @@
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from config import APPDATA_BASE
+
+
+_LOCK = threading.Lock()
+_LEDGER_FILE = Path(APPDATA_BASE) / "ledger_lancamentos.sqlite3"
+_conn = None
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS lancamentos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    empresa TEXT NOT NULL,
+    ano INTEGER NOT NULL,
+    aba TEXT NOT NULL,
+    numero TEXT NOT NULL,
+    vencimento TEXT NOT NULL,
+    chave_acesso TEXT NOT NULL DEFAULT '',
+    doc_tipo TEXT NOT NULL DEFAULT '',
+    fornecedor TEXT NOT NULL DEFAULT '',
+    cnpj_emit TEXT NOT NULL DEFAULT '',
+    cnpj_dest TEXT NOT NULL DEFAULT '',
+    parcela TEXT NOT NULL DEFAULT '',
+    valor_parcela TEXT NOT NULL DEFAULT '',
+    origem TEXT NOT NULL DEFAULT 'bot',
+    registrado_em TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_lancamentos_local
+    ON lancamentos(empresa, ano, aba, numero, vencimento);
+CREATE INDEX IF NOT EXISTS ix_lancamentos_numero_venc ON lancamentos(numero, vencimento);
+CREATE INDEX IF NOT EXISTS ix_lancamentos_chave ON lancamentos(chave_acesso);
+CREATE INDEX IF NOT EXISTS ix_lancamentos_aba ON lancamentos(empresa, ano, aba);
+"""
+
+
+def _now_iso() -> str:
+    return datetime.now().isoformat()
+
+
+def _connection() -> sqlite3.Connection:
+    """Conexao unica (protegida por _LOCK), criada sob demanda."""
+    global _conn
+    if _conn is None:
+        _LEDGER_FILE.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(_LEDGER_FILE), check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        _conn = conn
+    return _conn
+
+
+def definir_arquivo(caminho):
+    """Aponta o ledger para outro arquivo (ex: --dry-run, benchmarks)."""
+    global _LEDGER_FILE, _conn
+    with _LOCK:
+        if _conn is not None:
+            _conn.close()
+            _conn = None
+        _LEDGER_FILE = Path(caminho)
+
+
+def _norm(value) -> str:
+    return str(value or "").strip()
+
+
+def ja_lancado(empresa: str, ano: int, aba: str, numero: str, vencimento: str) -> bool:
+    """Consulta local (sem rede) se o par numero+vencimento ja foi lancado na aba."""
+    with _LOCK:
+        row = _connection().execute(
+            "SELECT 1 FROM lancamentos WHERE numero = ? AND vencimento = ? AND empresa = ? AND ano = ? AND aba = ? LIMIT 1",
+            (_norm(numero), _norm(vencimento), _norm(empresa), int(ano), _norm(aba)),
+        ).fetchone()
+    return row is not None
+
+
+def parcelas_lancadas_chave(chave_acesso: str) -> int:
+    chave = _norm(chave_acesso)
+    if not chave:
+        return 0
+    with _LOCK:
+        row = _connection().execute(
+            "SELECT COUNT(*) FROM lancamentos WHERE chave_acesso = ?",
+            (chave,),
+        ).fetchone()
+    return int(row[0] if row else 0)
+
+
+_SQL_INSERIR = """
+    INSERT OR IGNORE INTO lancamentos (
+        empresa, ano, aba, numero, vencimento, chave_acesso, doc_tipo, fornecedor,
+        cnpj_emit, cnpj_dest, parcela, valor_parcela, origem, registrado_em
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def _linha_lancamento(item: dict, origem: str, agora: str) -> tuple:
+    return (
+        _norm(item.get("empresa")),
+        int(item.get("ano") or 0),
+        _norm(item.get("aba")),
+        _norm(item.get("numero")),
+        _norm(item.get("vencimento")),
+        _norm(item.get("chave_acesso")),
+        _norm(item.get("doc_tipo")),
+        _norm(item.get("fornecedor")),
+        _norm(item.get("cnpj_emit")),
+        _norm(item.get("cnpj_dest")),
+        _norm(item.get("parcela")),
+        _norm(item.get("valor_parcela")),
+        origem,
+        agora,
+    )
+
+
+def registrar_lancamento(payload: dict, origem: str = "bot"):
+    """Grava um lancamento usando o mesmo payload de log_boleto_lancado."""
+    with _LOCK:
+        conn = _connection()
+        conn.execute(_SQL_INSERIR, _linha_lancamento(payload or {}, origem, _now_iso()))
+        conn.commit()
+
+
+def registrar_lancamentos(payloads: list[dict], origem: str = "bot"):
+    """Varios lancamentos em uma unica transacao."""
+    if not payloads:
+        return
+    agora = _now_iso()
+    with _LOCK:
+        conn = _connection()
+        conn.executemany(_SQL_INSERIR, [_linha_lancamento(p or {}, origem, agora) for p in payloads])
+        conn.commit()
+
+
+def abas_registradas(ano_minimo: int = 0) -> list[tuple[str, int, str]]:
+    with _LOCK:
+        rows = _connection().execute(
+            "SELECT DISTINCT empresa, ano, aba FROM lancamentos WHERE ano >= ? ORDER BY ano, empresa, aba",
+            (int(ano_minimo),),
+        ).fetchall()
+    return [(r[0], int(r[1]), r[2]) for r in rows]
+
+
+def sincronizar_aba(empresa: str, ano: int, aba: str, linhas: list[list[str]], lido_em: str | None = None) -> dict:
+    """
+    Reconcilia o ledger com o conteudo atual da aba (get_all_values).
+    - Linhas presentes na planilha e ausentes no ledger entram com origem 'planilha'.
+    - Linhas do ledger removidas manualmente da planilha saem do ledger.
+    lido_em: instante (isoformat) tomado antes da leitura; lancamentos registrados
+    a partir dele podem nao aparecer em `linhas` e nao sao removidos.
+    """
+    na_planilha = set()
+    for linha in linhas or []:
+        if len(linha) < 3:
+            continue
+        venc = _norm(linha[0])
+        numero = _norm(linha[2])
+        if not venc or not numero or "Vencimento" in venc:
+            continue
+        na_planilha.add((numero, venc))
+
+    empresa = _norm(empresa)
+    aba = _norm(aba)
+    agora = _now_iso()
+    with _LOCK:
+        conn = _connection()
+        registrados = {
+            (r[0], r[1]): r[2]
+            for r in conn.execute(
+                "SELECT numero, vencimento, registrado_em FROM lancamentos WHERE empresa = ? AND ano = ? AND aba = ?",
+                (empresa, int(ano), aba),
+            )
+        }
+        novos = na_planilha - set(registrados)
+        removidos = {
+            par for par, registrado_em in registrados.items()
+            if par not in na_planilha and (lido_em is None or registrado_em < lido_em)
+        }
+        conn.executemany(
+            """
+            INSERT OR IGNORE INTO lancamentos (empresa, ano, aba, numero, vencimento, origem, registrado_em)
+            VALUES (?, ?, ?, ?, ?, 'planilha', ?)
+            """,
+            [(empresa, int(ano), aba, numero, venc, agora) for numero, venc in novos],
+        )
+        conn.executemany(
+            "DELETE FROM lancamentos WHERE empresa = ? AND ano = ? AND aba = ? AND numero = ? AND vencimento = ?",
+            [(empresa, int(ano), aba, numero, venc) for numero, venc in removidos],
+        )
+        conn.commit()
+    return {"adicionados": len(novos), "removidos": len(removidos)}
@@ -1,204 +1,226 @@
 """
 Braspress login and invoice fetch helpers.
 
-- Login on Braspress portal using Playwright (when needed)
-- Persist cookies per CNPJ
+- Login on Braspress portal using Playwright (when needed), through the
+  persistent browser process in braspress_browser
+- Persist cookies per CNPJ and check they are still accepted (expired
+  sessions raise SessaoBraspressExpirada instead of looking like "no invoices")
 - Query invoice list via HTTP POST
-- Extract (fatura, vencimento, valor) from returned HTML
+- Extract (fatura, vencimento, valor) from returned HTML (braspress_html)
+
+Importing this module has no side effects; inicializar() reads the secrets
+and prepares the archive dir (braspress_service calls it once, off the cycle).
 """
 
 import json
-import re
-import sys
+import threading
 import time
-from datetime import datetime
 from pathlib import Path
 
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
 
+import braspress_browser
+import braspress_debug
+from braspress_html import extrair_tabela_rapida
 from config import BRASPRESS_ARCHIVE_DIR, BRASPRESS_CONFIG_PATH
 
 
-MAIN_URL = "https://www.braspress.com/area-do-cliente/minha-conta/"
-FRAME_ORIGIN = "https://blue.braspress.com"
-
 ARCHIVE_DIR = Path(BRASPRESS_ARCHIVE_DIR)
 SECRETS_PATH = Path(BRASPRESS_CONFIG_PATH) if BRASPRESS_CONFIG_PATH else Path("")
-ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
 
 
-def _get_sync_playwright():
-    try:
-        from playwright.sync_api import sync_playwright as _sync_playwright
-        return _sync_playwright
-    except Exception as e:
-        raise RuntimeError(
-            "Playwright/greenlet indisponivel no servidor. "
-            "Reinstale dependencias com: "
-            "pip install --upgrade pip setuptools wheel ; "
-            "pip install --force-reinstall --no-cache-dir playwright greenlet ; "
-            "python -m playwright install chromium"
-        ) from e
-
-
-def limpar_cookies_diariamente():
-    """Apaga cookies e debug uma vez por dia."""
-    last_file = ARCHIVE_DIR / ".last_refresh"
-    hoje = datetime.now().strftime("%Y-%m-%d")
-    if not last_file.exists():
-        last_file.write_text(hoje, encoding="utf-8")
-        return
+# Preenchidos por inicializar()
+CONFIG_PRIV = {}
+PASSWORD_PADRAO = ""
+CNPJ_EH = ""
+CNPJ_MVA = ""
+COOKIES_FILES = {}
+_inicializado = False
+_lock_init = threading.Lock()
+
+
+def path_in_archives(name: str) -> Path:
+    return ARCHIVE_DIR / name
+
 
-    ultima_data = last_file.read_text(encoding="utf-8").strip()
-    if ultima_data == hoje:
+def inicializar():
+    """Le braspress_config.json e prepara a pasta de arquivos (uma vez)."""
+    global CONFIG_PRIV, PASSWORD_PADRAO, CNPJ_EH, CNPJ_MVA, COOKIES_FILES, _inicializado
+    if _inicializado:
         return
+    with _lock_init:
+        if _inicializado:
+            return
+        if not SECRETS_PATH.is_file():
+            raise FileNotFoundError(
+                f"Arquivo {SECRETS_PATH} nao encontrado.\n"
+                "Crie 'braspress_config.json' no diretorio de secrets."
+            )
+
+        with open(SECRETS_PATH, "r", encoding="utf-8") as f:
+            CONFIG_PRIV = json.load(f)
+
+        PASSWORD_PADRAO = CONFIG_PRIV["senha"]
+        CNPJ_EH = CONFIG_PRIV["cnpjs"]["EH"]
+        CNPJ_MVA = CONFIG_PRIV["cnpjs"]["MVA"]
+        COOKIES_FILES = {
+            CNPJ_EH: path_in_archives("cookies_EH.json"),
+            CNPJ_MVA: path_in_archives("cookies_MVA.json"),
+        }
+
+        ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+        _inicializado = True
 
-    print("[Braspress] Novo dia detectado, limpando cookies e debug antigos...")
-    for arquivo in ARCHIVE_DIR.glob("*"):
-        if arquivo.suffix.lower() in {".json", ".html"}:
-            try:
-                arquivo.unlink()
-            except Exception as e:
-                print(f"[Braspress] Falha ao remover {arquivo.name}: {e}")
-    last_file.write_text(hoje, encoding="utf-8")
-    print("[Braspress] Limpeza concluida.")
 
+URL_FATURAS = "https://blue.braspress.com/site/list/fatura"
+# Renova a sessao quando algum cookie expira em menos que isso
+MARGEM_RENOVACAO = 30 * 60
 
-limpar_cookies_diariamente()
 
-if not SECRETS_PATH.exists():
-    raise FileNotFoundError(
-        f"Arquivo {SECRETS_PATH} nao encontrado.\n"
-        "Crie 'braspress_config.json' no diretorio de secrets."
+class SessaoBraspressExpirada(RuntimeError):
+    """O portal respondeu com a tela de login mesmo apos renovar os cookies."""
+
+
+def _arquivo_cookies(cnpj_login: str) -> Path:
+    return COOKIES_FILES.get(cnpj_login, path_in_archives(f"cookies_{cnpj_login}.json"))
+
+
+def _carregar_cookies(cnpj_login: str):
+    cookies_file = _arquivo_cookies(cnpj_login)
+    if not cookies_file.exists():
+        return None
+    try:
+        with open(cookies_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+def _expira_em(cookies) -> float | None:
+    """Menor expiracao (epoch) entre os cookies do portal; None se forem de sessao."""
+    prazos = [
+        float(c["expires"])
+        for c in cookies or []
+        if "blue.braspress.com" in c.get("domain", "") and float(c.get("expires") or -1) > 0
+    ]
+    return min(prazos) if prazos else None
+
+
+# Uma sessao HTTP keep-alive por CNPJ: (cookies aplicados, Session)
+_sessoes_http = {}
+_lock_http = threading.Lock()
+TIMEOUT_CONEXAO = 10
+
+
+def _sessao_http(cnpj_login: str, cookies) -> requests.Session:
+    """Sessao reaproveitada entre consultas; os cookies so sao trocados quando mudam."""
+    aplicar = tuple(sorted((c["name"], c["value"]) for c in cookies if "blue.braspress.com" in c.get("domain", "")))
+    with _lock_http:
+        atual = _sessoes_http.get(cnpj_login)
+        if atual is None:
+            session = requests.Session()
+            # Pool pequeno por host; so falhas de conexao sao repetidas (POST nao e reenviado apos leitura)
+            session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=4, max_retries=2))
+            atual = _sessoes_http[cnpj_login] = [None, session]
+        if atual[0] != aplicar:
+            atual[1].cookies.clear()
+            for nome, valor in aplicar:
+                atual[1].cookies.set(nome, valor)
+            atual[0] = aplicar
+        return atual[1]
+
+
+def _consultar(cnpj_login: str, cookies, fat_numero: str = "", timeout: int = 30):
+    session = _sessao_http(cnpj_login, cookies)
+    return session.post(
+        URL_FATURAS,
+        data={"titulosAbertos": "true", "fatNumero": fat_numero},
+        timeout=(TIMEOUT_CONEXAO, timeout),
     )
 
-with open(SECRETS_PATH, "r", encoding="utf-8") as f:
-    CONFIG_PRIV = json.load(f)
 
-PASSWORD_PADRAO = CONFIG_PRIV["senha"]
-CNPJ_EH = CONFIG_PRIV["cnpjs"]["EH"]
-CNPJ_MVA = CONFIG_PRIV["cnpjs"]["MVA"]
+def _sessao_expirada(resp) -> bool:
+    """Cookies recusados: 401/403, redirecionamento para login ou formulario de login na resposta."""
+    if resp.status_code in (401, 403):
+        return True
+    if any("login" in (r.headers.get("Location") or "").lower() for r in resp.history):
+        return True
+    html = resp.text.lower()
+    return "name='pass'" in html or 'name="pass"' in html
 
 
-def path_in_archives(name: str) -> Path:
-    return ARCHIVE_DIR / name
+def playwright_login(cnpj_login: str, forcar: bool = False):
+    """Faz login no portal Braspress (navegador persistente) e salva cookies."""
+    inicializar()
+    cookies_file = _arquivo_cookies(cnpj_login)
+    print(f"[*] Obtendo sessao da Braspress para CNPJ {cnpj_login}...")
 
+    cookies = braspress_browser.login(cnpj_login, PASSWORD_PADRAO, forcar=forcar)
+    with open(cookies_file, "w", encoding="utf-8") as f:
+        json.dump(cookies, f, indent=2, ensure_ascii=False)
+    return cookies
 
-COOKIES_FILES = {
-    CNPJ_EH: path_in_archives("cookies_EH.json"),
-    CNPJ_MVA: path_in_archives("cookies_MVA.json"),
-}
-
-
-def playwright_login(cnpj_login: str):
-    """Faz login no portal Braspress usando o CNPJ e salva cookies."""
-    cookies_file = COOKIES_FILES.get(cnpj_login, path_in_archives(f"cookies_{cnpj_login}.json"))
-    print(f"[*] Iniciando login na Braspress com CNPJ {cnpj_login}...")
-
-    sync_playwright = _get_sync_playwright()
-    with sync_playwright() as p:
-        if getattr(sys, "frozen", False):
-            base_path = Path(sys._MEIPASS) if hasattr(sys, "_MEIPASS") else Path(sys.executable).parent
-        else:
-            base_path = Path(__file__).resolve().parent
-
-        local_browser_path = base_path / "playwright" / ".local-browsers"
-        chrome_exec = next(local_browser_path.rglob("headless_shell.exe"), None) if local_browser_path.exists() else None
-
-        if chrome_exec and chrome_exec.exists():
-            print(f"[Braspress] Usando Chromium empacotado: {chrome_exec}")
-            browser = p.chromium.launch(headless=True, executable_path=str(chrome_exec))
-        else:
-            try:
-                browser = p.chromium.launch(channel="chromium", headless=True)
-            except Exception:
-                browser = p.chromium.launch(headless=True)
-
-        context = browser.new_context()
-        page = context.new_page()
-
-        print("[*] Acessando pagina de login...")
-        page.goto(MAIN_URL, timeout=60000)
-        page.wait_for_selector("iframe", timeout=15000)
-
-        frame = None
-        for f in page.frames:
-            if FRAME_ORIGIN in (f.url or ""):
-                frame = f
-                break
-        if not frame:
-            browser.close()
-            raise RuntimeError("Frame de login da Braspress nao encontrado.")
-
-        print("[*] Preenchendo login...")
-        frame.fill("input[name='login']", cnpj_login)
-        frame.fill("input[name='pass']", PASSWORD_PADRAO)
-        frame.click("input[type='submit']")
-        time.sleep(5)
-
-        try:
-            frame.wait_for_load_state("networkidle", timeout=15000)
-        except Exception:
-            pass
-
-        html = frame.content().lower()
-        if "minhas faturas" not in html:
-            browser.close()
-            raise RuntimeError(f"Login falhou para CNPJ {cnpj_login}.")
-
-        cookies = context.cookies()
-        with open(cookies_file, "w", encoding="utf-8") as f:
-            json.dump(cookies, f, indent=2, ensure_ascii=False)
-
-        browser.close()
-        print(f"[Braspress] Login concluido para CNPJ {cnpj_login}.")
-        return cookies
-
-
-def extrair_tabela(html: str):
-    """Extrai dados de Fatura, Vencimento e Valor do HTML retornado."""
-    soup = BeautifulSoup(html, "html.parser")
-    dados = []
-    for linha in soup.select("table tr"):
-        cols = [c.get_text(strip=True) for c in linha.find_all("td")]
-        if len(cols) >= 3 and re.search(r"\d", cols[0]):
-            dados.append((cols[0], cols[1], cols[2]))
-    return dados
+
+def verificar_sessao(cnpj_login: str) -> bool:
+    """Sonda barata: consulta uma fatura inexistente e verifica se os cookies ainda valem."""
+    inicializar()
+    cookies = _carregar_cookies(cnpj_login)
+    if not cookies:
+        return False
+    try:
+        return not _sessao_expirada(_consultar(cnpj_login, cookies, fat_numero="0", timeout=15))
+    except requests.RequestException as e:
+        print(f"[Braspress] Falha ao verificar sessao de {cnpj_login}: {e}")
+        return False
+
+
+def renovar_sessao(cnpj_login: str, margem: float = MARGEM_RENOVACAO) -> bool:
+    """
+    Garante cookies validos para o CNPJ: refaz o login se estiverem ausentes,
+    perto de expirar ou recusados pelo portal. Retorna True se renovou.
+    """
+    inicializar()
+    cookies = _carregar_cookies(cnpj_login)
+    if cookies:
+        expira = _expira_em(cookies)
+        if (expira is None or expira - time.time() > margem) and verificar_sessao(cnpj_login):
+            return False
+    playwright_login(cnpj_login, forcar=bool(cookies))
+    return True
 
 
 def obter_faturas(cnpj_login: str):
-    """Usa cookies salvos (ou faz login) e retorna lista de faturas."""
-    cookies_file = COOKIES_FILES.get(cnpj_login, path_in_archives(f"cookies_{cnpj_login}.json"))
-
-    if cookies_file.exists():
-        try:
-            with open(cookies_file, "r", encoding="utf-8") as f:
-                cookies = json.load(f)
-            print(f"[*] Usando cookies salvos para {cnpj_login}.")
-        except Exception:
-            cookies = playwright_login(cnpj_login)
+    """
+    Usa cookies salvos (ou faz login) e retorna lista de faturas.
+    Sessao recusada pelo portal e renovada uma vez; se persistir, levanta
+    SessaoBraspressExpirada (lista vazia significa de fato nenhuma fatura).
+    """
+    inicializar()
+    cookies = _carregar_cookies(cnpj_login)
+    if cookies:
+        print(f"[*] Usando cookies salvos para {cnpj_login}.")
     else:
         cookies = playwright_login(cnpj_login)
 
-    session = requests.Session()
-    for c in cookies:
-        if "blue.braspress.com" in c.get("domain", ""):
-            session.cookies.set(c["name"], c["value"])
-
-    url = "https://blue.braspress.com/site/list/fatura"
-    print(f"[*] Fazendo POST para {url}")
-    resp = session.post(url, data={"titulosAbertos": "true", "fatNumero": ""}, timeout=30)
+    print(f"[*] Fazendo POST para {URL_FATURAS}")
+    resp = _consultar(cnpj_login, cookies)
+    if _sessao_expirada(resp):
+        print(f"[Braspress] Sessao expirada para {cnpj_login}; renovando login...")
+        resp = _consultar(cnpj_login, playwright_login(cnpj_login, forcar=True))
+        if _sessao_expirada(resp):
+            raise SessaoBraspressExpirada(f"Portal Braspress recusou a sessao de {cnpj_login} apos novo login.")
     html = resp.text
 
-    debug_file = path_in_archives(f"debug_faturas_{cnpj_login}.html")
-    debug_file.write_text(html, encoding="utf-8")
+    # Gravacao comprimida em segundo plano (arquivo circular em ARCHIVE_DIR/debug)
+    captura = braspress_debug.capturar(cnpj_login, html)
 
-    dados = extrair_tabela(html)
+    dados = extrair_tabela_rapida(html)
     if not dados:
-        print(f"[Braspress] Nenhum dado encontrado. Verifique {debug_file.name}")
+        print(f"[Braspress] Nenhuma fatura em aberto para {cnpj_login} (sessao valida). Debug: {captura or '-'}")
     return dados
 
 
 if __name__ == "__main__":
+    inicializar()
     obter_faturas(CNPJ_EH)
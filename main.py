@@ -3,6 +3,7 @@ import sys
 import time
 import argparse
 import threading
+import multiprocessing
 from datetime import datetime
 from pathlib import Path
 
@@ -10,7 +11,18 @@ import auth
 from gmail_fetcher import processarEmails
 from panel_web import start_control_panel
 import runtime_status
+import quota_pacer
+import braspress_browser
+import braspress_debug
+import braspress_service
+import dry_run
+import events_writer
+import sheets_writer
+import xml_pool
 from auto_updater import AutoUpdater
+from ledger_reconciler import LedgerReconciler
+from braspress_refresher import BraspressSessionRefresher
+from sheets_utils import aquecerPlanilhas, provisionarProximosMeses
 from reporter import (
     eventosProcessados,
     eventosIgnorados,
@@ -29,6 +41,8 @@ from settings_manager import load_settings
 running = False
 stop_event = threading.Event()
 _auto_updater = None
+_ledger_reconciler = None
+_braspress_refresher = None
 
 
 def _is_transient_api_error(exc: Exception) -> bool:
@@ -87,6 +101,33 @@ def _setup_auto_updater():
     _auto_updater.start()
 
 
+def _setup_ledger_reconciler():
+    global _ledger_reconciler
+    cfg = load_settings()
+    _ledger_reconciler = LedgerReconciler(
+        interval_minutes=int(cfg.get("ledger_reconcile_interval_minutes", 60)),
+    )
+    _ledger_reconciler.start()
+
+
+def _setup_braspress_refresher():
+    global _braspress_refresher
+    cfg = load_settings()
+    _braspress_refresher = BraspressSessionRefresher(
+        interval_minutes=int(cfg.get("braspress_session_refresh_minutes", 20)),
+    )
+    _braspress_refresher.start()
+
+
+def _aquecer_planilhas():
+    cfg = load_settings()
+    aquecerPlanilhas()
+    try:
+        provisionarProximosMeses(int(cfg.get("sheets_provision_months_ahead", 1)))
+    except Exception as e:
+        print(f"[Planilhas] Falha ao provisionar abas dos proximos meses: {e}")
+
+
 def _restart_process(reason: str):
     print(f"[Updater] {reason}. Reiniciando processo...")
     os.chdir(str(Path(__file__).resolve().parent))
@@ -118,6 +159,7 @@ def main_loop():
         eventosProcessados.clear()
         eventosIgnorados.clear()
         eventosAvisos.clear()
+        quota_pacer.iniciar_ciclo()
 
         runtime_status.set_account_status("principal", "running", "Executando leitura da conta principal...")
         try:
@@ -196,6 +238,14 @@ def main_loop():
                 consolidarRelatorioTMP()
                 ultimoRelatorio["vazio"] = hora_chave
 
+        pacing = quota_pacer.resumo_ciclo()
+        runtime_status.set_pacing(pacing)
+        if pacing["wait_seconds"] > 0:
+            print(f"[Loop] Tempo total aguardando cota no ciclo: {pacing['wait_seconds']:.1f}s {pacing['wait_by_budget']}")
+        if dry_run.ATIVO:
+            print(f"[DryRun] Chamadas simuladas ao Sheets: {dry_run.resumo()}")
+            dry_run.cliente.zerar_registro()
+
         cfg = load_settings()
         interval_min = int(cfg.get("loop_interval_minutes", max(1, int(INTERVALO / 60))))
         interval_sec = max(60, interval_min * 60)
@@ -242,7 +292,16 @@ def parar_verificacao():
 def on_quit():
     if _auto_updater:
         _auto_updater.stop()
+    if _ledger_reconciler:
+        _ledger_reconciler.stop()
+    if _braspress_refresher:
+        _braspress_refresher.stop()
     parar_verificacao()
+    xml_pool.encerrar()
+    sheets_writer.encerrar()
+    braspress_browser.encerrar()
+    braspress_debug.encerrar()
+    events_writer.encerrar()
     print("[Main] Encerrando Finance Bot...")
     time.sleep(1)
     sys.exit(0)
@@ -252,11 +311,19 @@ def _parse_args():
     parser = argparse.ArgumentParser(description="FinanceBot")
     parser.add_argument("--server", action="store_true", help="Executa em modo servidor (sem tray)")
     parser.add_argument("--no-browser", action="store_true", help="Nao abre navegador no start")
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Executa o ciclo contra planilhas simuladas (sem escrever em producao nem rotular e-mails)",
+    )
     return parser.parse_args()
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     args = _parse_args()
+    if args.dry_run:
+        dry_run.ativar()
     cfg = load_settings()
     panel_host = str(cfg.get("panel_bind_host", "0.0.0.0"))
     panel_port = int(cfg.get("panel_port", 8765))
@@ -264,6 +331,12 @@ if __name__ == "__main__":
     panel_url = start_control_panel(host=panel_host, port=panel_port, open_browser=open_browser)
     print(f"[Main] Painel web: {panel_url}")
     _setup_auto_updater()
+    _setup_ledger_reconciler()
+    if not args.dry_run:
+        braspress_service.servico.iniciar_em_segundo_plano()
+        _setup_braspress_refresher()
+    xml_pool.aquecer(int(cfg.get("xml_parse_workers", 0)))
+    threading.Thread(target=_aquecer_planilhas, daemon=True).start()
     print("[Main] Aguardando 5 segundos para iniciar a verificacao...")
     time.sleep(5)
     iniciar_verificacao()
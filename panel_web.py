@@ -1014,6 +1014,20 @@ class _Handler(BaseHTTPRequestHandler):
             )
             return _json_response(self, 200, {"items": items})
 
+        if parsed.path == "/api/braspress/debug":
+            if not _is_dev(current_user):
+                return _json_response(self, 403, {"ok": False, "message": "Apenas dev pode visualizar as capturas Braspress"})
+            import braspress_debug
+
+            qs = parse_qs(parsed.query or "")
+            cnpj = (qs.get("cnpj", [""])[0] or "").strip()
+            try:
+                limit = int((qs.get("limit", ["5"])[0] or "5").strip())
+            except Exception:
+                limit = 5
+            items = braspress_debug.ultimas(max(1, min(limit, 50)), cnpj=cnpj)
+            return _json_response(self, 200, {"items": items, "archive": braspress_debug.estatisticas()})
+
         if parsed.path == "/":
             return _html_response(self, 200, _render_html())
 
@@ -1252,6 +1266,28 @@ class _Handler(BaseHTTPRequestHandler):
             )
             return _json_response(self, 200, {"ok": True, "message": "Solicitação de parada enviada"})
 
+        if parsed.path == "/api/braspress/cache-clear":
+            if not _can_operate(current_user):
+                return _json_response(self, 403, {"ok": False, "message": "Sem permissão para limpar o cache Braspress"})
+            cnpj = str(data.get("cnpj") or "").strip() or None
+            try:
+                from braspress_service import servico
+
+                removidos = servico.invalidar_cache(cnpj)
+            except Exception as e:
+                _add_diagnostic("braspress_cache_clear", e)
+                return _json_response(self, 400, {"ok": False, "message": f"Falha ao limpar cache Braspress: {e}"})
+            _audit(
+                actor=current_user,
+                action="limpar_cache_braspress",
+                target=cnpj or "todos",
+                before={"cnpjs_em_cache": removidos},
+                after={},
+                status="ok",
+                details="Cache de faturas Braspress limpo",
+            )
+            return _json_response(self, 200, {"ok": True, "cleared": removidos, "message": "Cache de faturas Braspress limpo"})
+
         if parsed.path == "/api/reauth":
             if not _can_operate(current_user):
                 return _json_response(self, 403, {"ok": False, "message": "Sem permissão para reautenticar"})
@@ -1501,7 +1537,7 @@ pre{margin:6px 0 0;background:#fff7ef;border:1px dashed #cf9f78;padding:8px;bord
 </div>
 </section>
 </div>
-<div id="tabDiag" class="c tab-panel hidden"><section class="card"><h3>Diagnóstico</h3><div id="fr" class="pill info"><span class="dot"></span>Nenhum erro recente</div><pre id="tech"></pre></section></div>
+<div id="tabDiag" class="c tab-panel hidden"><section class="card"><h3>Diagnóstico</h3><div id="fr" class="pill info"><span class="dot"></span>Nenhum erro recente</div><pre id="tech"></pre><button onclick="clearBraspressCache()">Limpar cache Braspress</button><button onclick="braspressDebug()">Últimas capturas Braspress</button></section></div>
 </main>
 <script>
 const tech=document.getElementById('tech');
@@ -1573,6 +1609,7 @@ function _setPanelWriteAccess(canWrite){
     'button[onclick="stopRunNow()"]',
     'button[onclick="reauth(\\'principal\\')"]',
     'button[onclick="reauth(\\'nfe\\')"]',
+    'button[onclick="clearBraspressCache()"]',
   ];
   btnSelectors.forEach(sel=>{document.querySelectorAll(sel).forEach(b=>{b.disabled=!canWrite;});});
 }
@@ -1688,7 +1725,9 @@ function _fmtAuditAction(v){
 function _fmtAuditStatus(v){const s=String(v||'').toLowerCase();if(s==='ok')return '<span class="audit-status ok">OK</span>';return '<span class="audit-status erro">Erro</span>';}
 function _renderAudit(items){const body=document.getElementById('aBody');if(!body)return;body.innerHTML='';const arr=Array.isArray(items)?items:[];if(!arr.length){body.innerHTML='<tr><td colspan="6">Sem dados para os filtros selecionados</td></tr>';return;}arr.forEach(it=>{const tr=document.createElement('tr');tr.innerHTML=`<td>${_fmtDateTime(it.at)}</td><td>${_esc(it.actor||'-')}</td><td>${_esc(_fmtAuditAction(it.action||'-'))}</td><td>${_esc(it.target||'-')}</td><td>${_fmtAuditStatus(it.status||'')}</td><td>${_esc(it.details||'-')}</td>`;body.appendChild(tr);});}
 async function loadAudit(silent=false){if(!_authCtx.can_view_audit)return;if(!silent)showToast('Buscando registro de alterações');const p=new URLSearchParams();const vFrom=document.getElementById('aFrom')?.value||'';const vTo=document.getElementById('aTo')?.value||'';const vUser=(document.getElementById('aUser')?.value||'').trim();const vAction=(document.getElementById('aAction')?.value||'').trim();const vQuery=(document.getElementById('aQuery')?.value||'').trim();const vLimit=Number(document.getElementById('aLimit')?.value||300);if(vFrom)p.set('from',vFrom);if(vTo)p.set('to',vTo);if(vUser)p.set('user',vUser);if(vAction)p.set('action',vAction);if(vQuery)p.set('q',vQuery);p.set('limit',String(Math.max(10,Math.min(2000,vLimit||300))));const {j}=await api(`/api/audit?${p.toString()}`);const items=j.items||[];_renderAudit(items);if(!silent)showToast(items.length?`Resultado: ${items.length} registro(s)`:'Nenhum resultado para os filtros selecionados');}
-async function state(){const {j}=await api('/api/state');_setAuthUi(j.auth||{});const s=j.settings||{};if(!_cfgDirty&&!_cfgEditingNow()){document.getElementById('mode').value=s.gmail_filter_mode;document.getElementById('maxPages').value=s.gmail_max_pages;document.getElementById('pageSize').value=s.gmail_page_size;document.getElementById('intervalMin').value=s.loop_interval_minutes||30;}document.getElementById('last').value=(j.last_run&&j.last_run.friendly)||(j.last_run&&j.last_run.message)||'-';const rt=j.runtime||{};const a=rt.accounts||{};const sch=rt.scheduler||{};const cd=rt.cooldown||{};const man=j.manual||{};upd('P',a.principal||{},(j.connected||{}).principal||{});upd('N',a.nfe||{},(j.connected||{}).nfe||{});syncManualButtons(man);const left=Number(sch.remaining_seconds||0);const cdLeft=Number(cd.remaining_seconds||0);const cdActive=Boolean(cd.active)&&cdLeft>0;document.getElementById('cool').textContent=cdActive?('Limite da API atingido, nova tentativa em '+fmt(cdLeft)):(left>0?('Próxima verificação automática em '+fmt(left)):'Próxima verificação automática: sem contagem no momento');report(j.report||{});let msg='Nenhum erro recente',k='info';const p=(j.connected||{}).principal||{};const n=(j.connected||{}).nfe||{};if(p.friendly_error||n.friendly_error){msg=p.friendly_error||n.friendly_error;k='warn';}if((a.principal||{}).status==='error'||(a.nfe||{}).status==='error'){msg=(a.principal||{}).friendly_detail||(a.nfe||{}).friendly_detail||msg;k='error';}box(msg,k);}
+async function state(){const {j}=await api('/api/state');_setAuthUi(j.auth||{});const s=j.settings||{};if(!_cfgDirty&&!_cfgEditingNow()){document.getElementById('mode').value=s.gmail_filter_mode;document.getElementById('maxPages').value=s.gmail_max_pages;document.getElementById('pageSize').value=s.gmail_page_size;document.getElementById('intervalMin').value=s.loop_interval_minutes||30;}document.getElementById('last').value=(j.last_run&&j.last_run.friendly)||(j.last_run&&j.last_run.message)||'-';const rt=j.runtime||{};const a=rt.accounts||{};const sch=rt.scheduler||{};const cd=rt.cooldown||{};const man=j.manual||{};upd('P',a.principal||{},(j.connected||{}).principal||{});upd('N',a.nfe||{},(j.connected||{}).nfe||{});syncManualButtons(man);const left=Number(sch.remaining_seconds||0);const cdLeft=Number(cd.remaining_seconds||0);const cdActive=Boolean(cd.active)&&cdLeft>0;const lanesCd=Object.entries(rt.sheets_lanes||{}).filter(([,l])=>l&&l.cooldown_active);document.getElementById('cool').textContent=cdActive?('Limite da API atingido, nova tentativa em '+fmt(cdLeft)):lanesCd.length?('Limite da API nas planilhas: '+lanesCd.map(([n,l])=>n+' ('+fmt(Number(l.cooldown_remaining_seconds||0))+')').join(', ')):(left>0?('Próxima verificação automática em '+fmt(left)):'Próxima verificação automática: sem contagem no momento');report(j.report||{});let msg='Nenhum erro recente',k='info';const p=(j.connected||{}).principal||{};const n=(j.connected||{}).nfe||{};if(p.friendly_error||n.friendly_error){msg=p.friendly_error||n.friendly_error;k='warn';}if((a.principal||{}).status==='error'||(a.nfe||{}).status==='error'){msg=(a.principal||{}).friendly_detail||(a.nfe||{}).friendly_detail||msg;k='error';}box(msg,k);}
+async function clearBraspressCache(){const {j}=await api('/api/braspress/cache-clear',{method:'POST',headers:{'Content-Type':'application/json'},body:'{}'});showToast(j.message||'Cache de faturas Braspress limpo');await diag();}
+async function braspressDebug(){const {j}=await api('/api/braspress/debug?limit=5');tech.textContent=JSON.stringify(j,null,2);}
 async function diag(){const {j}=await api('/api/diagnostics');tech.textContent=JSON.stringify(j,null,2);}
 async function saveSettings(){const p={gmail_filter_mode:document.getElementById('mode').value,gmail_max_pages:Number(document.getElementById('maxPages').value),gmail_page_size:Number(document.getElementById('pageSize').value),loop_interval_minutes:Number(document.getElementById('intervalMin').value)};await api('/api/settings',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify(p)});_cfgDirty=false;await state();await diag();}
 async function changeOwnPassword(){if(!_authCtx.can_change_password){showToast('Perfil sem permissão para redefinir senha');return;}const curr=document.getElementById('pwdCurr').value||'';const np=document.getElementById('pwdNew').value||'';const np2=document.getElementById('pwdNew2').value||'';_clearPwdFieldErrors();const r=_updatePwdReqUi();let invalid=false;if(!curr){_markFieldError('pwdCurr',true);invalid=true;}if(!np){_markFieldError('pwdNew',true);invalid=true;}if(!(r.len&&r.low&&r.up&&r.dig&&r.sp)){_markFieldError('pwdNew',true);invalid=true;}if(np!==np2||!np2){_markFieldError('pwdNew2',true);invalid=true;}if(invalid){showToast('Corrija os campos destacados em vermelho');return;}const {j}=await api('/api/auth/change-password',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify({current_password:curr,new_password:np})});if(!j.ok){const m=String(j.message||'Falha ao atualizar senha');if(m.toLowerCase().includes('atual'))_markFieldError('pwdCurr',true);else _markFieldError('pwdNew',true);showToast(m);return;}showToast(j.message||'Senha atualizada');document.getElementById('pwdCurr').value='';document.getElementById('pwdNew').value='';document.getElementById('pwdNew2').value='';_clearPwdFieldErrors();_updatePwdReqUi();await state();}
@@ -1,23 +1,18 @@
 import os
-import time
-import xml.etree.ElementTree as ET
 from datetime import datetime
-from decimal import Decimal, InvalidOperation
 
 import gspread
 
-from config import CNPJ_EH, CNPJ_MVA
-from sheets_utils import escolherPlanilha
+from config import CNPJ_EH, CNPJ_MVA, EMPRESAS_CNPJ
+from sheets_utils import CABECALHO_CTE, CABECALHO_NF, escolherPlanilha, nome_aba_pt, obterAba
 from reporter import registrarEvento, registrarAviso, escreverRelatorio
-from auth import apiCooldown
+import braspress_matcher
+from braspress_service import servico
+import quota_pacer
+import sheets_writer
 from history_store import log_boleto_lancado
-
-
-MES_ABREV_PT = ["Jan", "Fev", "Mar", "Abr", "Mai", "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez"]
-
-
-def nome_aba_pt(dt):
-    return f"{MES_ABREV_PT[dt.month - 1]}/{dt.year}"
+from ledger_store import ja_lancado, parcelas_lancadas_chave, registrar_lancamento
+from xml_model import DocumentoCTe, DocumentoNFe, ler_documento
 
 
 def _doc_ref(prefixo, numero, file_path):
@@ -31,65 +26,63 @@ def _texto_parcela(indice):
     return f"{indice}\u00aa Parcela"
 
 
-# === Extrair fornecedor do XML ===
-def extrairFornecedor(file_path):
-    try:
-        tree = ET.parse(file_path)
-        root = tree.getroot()
-        ns = {
-            "nfe": "http://www.portalfiscal.inf.br/nfe",
-            "cte": "http://www.portalfiscal.inf.br/cte",
-        }
+def _parcela_na_aba(dados, num, vencFmt) -> bool:
+    """numero+vencimento ja presente nos valores da aba (cabecalho e linhas incompletas ignorados)."""
+    dadosValidos = [
+        linha
+        for linha in dados
+        if len(linha) >= 3 and linha[0] and linha[2] and "Vencimento" not in linha[0]
+    ]
+    return any(num == linha[2].strip() and vencFmt == linha[0].strip() for linha in dadosValidos)
+
 
-        emit = root.find(".//nfe:emit", ns)
-        if emit is None:
-            emit = root.find(".//cte:emit", ns)
+def _linha_parcela(vencFmt, fornecedor, num, valorTotal, qtdParcelas, i, valor) -> list:
+    """Linha A:I de uma parcela de NF-e."""
+    return [
+        vencFmt,
+        fornecedor,
+        num,
+        f"{valorTotal:.2f}".replace(".", ","),
+        qtdParcelas,
+        _texto_parcela(i),
+        f"{valor:.2f}".replace(".", ","),
+        "",
+        "",
+    ]
 
-        if emit is not None:
-            nome = emit.find("nfe:xNome", ns)
-            if nome is None:
-                nome = emit.find("cte:xNome", ns)
 
-            if nome is not None and nome.text:
-                return nome.text.strip().upper()
+def _registrar_ledger(lancamento, origem="bot"):
+    try:
+        registrar_lancamento(lancamento, origem=origem)
+    except Exception as e:
+        print(f"[Ledger] Falha ao registrar lancamento {lancamento.get('numero', '')}: {e}")
 
-        return "DESCONHECIDO"
 
+# === Extrair fornecedor do XML ===
+def extrairFornecedor(file_path):
+    try:
+        documento = ler_documento(file_path)
     except Exception:
         return "DESCONHECIDO"
+    return documento.fornecedor_upper if documento is not None else "DESCONHECIDO"
 
 
 # === Processar NF-e ===
-def processarNFE(root, filePath):
+def processarNFE(documento: DocumentoNFe, filePath):
     inseriu_alguma = False
-    ns = {"nfe": "http://www.portalfiscal.inf.br/nfe"}
-    emit = root.find(".//nfe:emit", ns)
-    dest = root.find(".//nfe:dest", ns)
-    ide = root.find(".//nfe:ide", ns)
-    total = root.find(".//nfe:ICMSTot", ns)
-    duplicatas = root.findall(".//nfe:cobr/nfe:dup", ns)
-
-    fornecedor = emit.find("nfe:xNome", ns).text if emit is not None and emit.find("nfe:xNome", ns) is not None else "-"
-    fornecedor = f"{fornecedor} (Bot)"
-    nfNum = ide.find("nfe:nNF", ns).text if ide is not None and ide.find("nfe:nNF", ns) is not None else "-"
-    valorTotal = float(total.find("nfe:vNF", ns).text) if total is not None and total.find("nfe:vNF", ns) is not None else 0.0
-    cnpjDest = dest.find("nfe:CNPJ", ns).text if dest is not None and dest.find("nfe:CNPJ", ns) is not None else ""
-    cnpjEmit = emit.find("nfe:CNPJ", ns).text if emit is not None and emit.find("nfe:CNPJ", ns) is not None else ""
+    chave = documento.chave
+    fornecedor = f"{documento.fornecedor} (Bot)"
+    nfNum = documento.numero
+    valorTotal = documento.valor_total
+    cnpjDest = documento.cnpj_dest
+    cnpjEmit = documento.cnpj_emit
 
     if cnpjEmit in [CNPJ_EH, CNPJ_MVA]:
         print(f"NF {nfNum} ignorada: emitente e a propria empresa ({cnpjEmit})")
         registrarEvento("ignorado", fornecedor, "Conta Principal")
-        try:
-            os.remove(filePath)
-        except Exception:
-            pass
         return False
 
-    parcelas = []
-    for dup in duplicatas:
-        vencimento = dup.find("nfe:dVenc", ns).text if dup.find("nfe:dVenc", ns) is not None else "-"
-        valor = float(dup.find("nfe:vDup", ns).text) if dup.find("nfe:vDup", ns) is not None else 0.0
-        parcelas.append((nfNum, vencimento, valor))
+    parcelas = [(nfNum, p.vencimento, p.valor) for p in documento.parcelas]
 
     if not parcelas:
         aviso = f"{_doc_ref('NF', nfNum, filePath)} sem duplicatas/vencimento no XML; nota nao lancada"
@@ -100,57 +93,29 @@ def processarNFE(root, filePath):
 
     qtdParcelas = len(parcelas)
 
-    for i, (num, vencimento, valor) in enumerate(parcelas, start=1):
-        try:
-            dataVencimento = datetime.strptime(vencimento, "%Y-%m-%d")
-        except Exception:
-            aviso = f"{_doc_ref('NF', num, filePath)} com vencimento invalido '{vencimento}'; parcela ignorada"
-            print(aviso)
-            registrarAviso(aviso, "Conta Principal")
-            continue
+    if chave and parcelas_lancadas_chave(chave) >= qtdParcelas:
+        aviso = f"{_doc_ref('NF', nfNum, filePath)} já lançada (ledger local)"
+        print(aviso)
+        registrarAviso(aviso, "Conta Principal")
+        return False
 
-        ano = dataVencimento.year
-        planilha, empresa = escolherPlanilha(cnpjDest, ano)
-        if not planilha:
-            aviso = f"{_doc_ref('NF', num, filePath)} sem planilha para CNPJ destino {cnpjDest} ({ano})"
+    def _lancarParcela(planilha, empresa, ano, nomeAba, vencFmt, num, i, valor):
+        try:
+            aba = obterAba(planilha, nomeAba, CABECALHO_NF)
+        except RuntimeError:
+            aviso = f"{_doc_ref('NF', num, filePath)}: falha ao acessar aba {nomeAba}"
             print(aviso)
             registrarAviso(aviso, "Conta Principal")
-            continue
-
-        nomeAba = nome_aba_pt(dataVencimento)
-
-        try:
-            for _ in range(3):
-                try:
-                    aba = planilha.worksheet(nomeAba)
-                    break
-                except gspread.exceptions.APIError as e:
-                    if "429" in str(e):
-                        apiCooldown()
-                        continue
-                    raise
-            else:
-                aviso = f"{_doc_ref('NF', num, filePath)}: falha ao acessar aba {nomeAba}"
-                print(aviso)
-                registrarAviso(aviso, "Conta Principal")
-                return False
-        except gspread.exceptions.WorksheetNotFound:
-            try:
-                aba = planilha.add_worksheet(title=nomeAba, rows="100", cols="9")
-                aba.append_row(["Vencimento", "Descricao", "NF", "Valor Total", "Qtd Parcelas", "Parcela", "Valor Parcela", "Valor Pago", "Status"])
-            except gspread.exceptions.APIError as e:
-                if "already exists" in str(e).lower():
-                    aba = planilha.worksheet(nomeAba)
-                else:
-                    raise
+            return False
 
         for _ in range(3):
             try:
+                quota_pacer.consumir("sheets_read")
                 dados = aba.get_all_values()
                 break
             except gspread.exceptions.APIError as e:
                 if "429" in str(e):
-                    apiCooldown()
+                    sheets_writer.backoff("sheets_read")
                     continue
                 raise
         else:
@@ -159,195 +124,188 @@ def processarNFE(root, filePath):
             registrarAviso(aviso, "Conta Principal")
             return False
 
-        dadosValidos = [
-            linha
-            for linha in dados
-            if len(linha) >= 3 and linha[0] and linha[2] and "Vencimento" not in linha[0]
-        ]
-        duplicado = any(
-            num == linha[2].strip() and dataVencimento.strftime("%d/%m/%Y") == linha[0].strip()
-            for linha in dadosValidos
-        )
-        if duplicado:
-            aviso = f"{_doc_ref('NF', num, filePath)} já lançada em {empresa} {nomeAba} ({dataVencimento.strftime('%d/%m/%Y')})"
+        if _parcela_na_aba(dados, num, vencFmt):
+            aviso = f"{_doc_ref('NF', num, filePath)} já lançada em {empresa} {nomeAba} ({vencFmt})"
             print(aviso)
             registrarAviso(aviso, "Conta Principal")
-            continue
+            _registrar_ledger(
+                {"empresa": empresa, "ano": ano, "aba": nomeAba, "numero": num, "vencimento": vencFmt, "chave_acesso": chave},
+                origem="planilha",
+            )
+            return False
 
-        novaLinha = [
-            dataVencimento.strftime("%d/%m/%Y"),
-            fornecedor,
-            num,
-            f"{valorTotal:.2f}".replace(".", ","),
-            qtdParcelas,
-            _texto_parcela(i),
-            f"{valor:.2f}".replace(".", ","),
-            "",
-            "",
-        ]
+        novaLinha = _linha_parcela(vencFmt, fornecedor, num, valorTotal, qtdParcelas, i, valor)
 
         for _ in range(3):
             try:
                 linha_vazia = len(dados) + 1
                 cell_range = f"A{linha_vazia}:I{linha_vazia}"
+                quota_pacer.consumir("sheets_write")
                 aba.update(cell_range, [novaLinha], value_input_option="USER_ENTERED")
                 dados.append(novaLinha)
                 break
             except gspread.exceptions.APIError as e:
                 if "429" in str(e):
-                    apiCooldown()
+                    sheets_writer.backoff("sheets_write")
                     continue
                 raise
+        else:
+            aviso = f"{_doc_ref('NF', num, filePath)}: falha ao gravar parcela {i} na aba {nomeAba}"
+            print(aviso)
+            registrarAviso(aviso, "Conta Principal")
+            return False
 
         print(f"Inserido: {empresa} {ano} | {nomeAba} | Parcela {i}/{qtdParcelas} - {fornecedor} - {num}")
         registrarEvento("processado", fornecedor, "Conta Principal")
+        lancamento = {
+            "conta": "Conta Principal",
+            "doc_tipo": "NF",
+            "numero": str(num),
+            "fornecedor": fornecedor,
+            "cnpj_emit": cnpjEmit,
+            "cnpj_dest": cnpjDest,
+            "chave_acesso": chave,
+            "vencimento": vencFmt,
+            "valor_total": f"{valorTotal:.2f}",
+            "valor_parcela": f"{valor:.2f}",
+            "parcela": _texto_parcela(i),
+            "qtd_parcelas": int(qtdParcelas),
+            "empresa": empresa,
+            "ano": int(ano),
+            "aba": nomeAba,
+            "arquivo_xml": os.path.basename(filePath),
+            "local_lancamento": f"{empresa} {ano}/{nomeAba}",
+        }
+        _registrar_ledger(lancamento)
         try:
-            log_boleto_lancado(
-                {
-                    "conta": "Conta Principal",
-                    "doc_tipo": "NF",
-                    "numero": str(num),
-                    "fornecedor": fornecedor,
-                    "cnpj_emit": cnpjEmit,
-                    "cnpj_dest": cnpjDest,
-                    "vencimento": dataVencimento.strftime("%d/%m/%Y"),
-                    "valor_total": f"{valorTotal:.2f}",
-                    "valor_parcela": f"{valor:.2f}",
-                    "parcela": _texto_parcela(i),
-                    "qtd_parcelas": int(qtdParcelas),
-                    "empresa": empresa,
-                    "ano": int(ano),
-                    "aba": nomeAba,
-                    "arquivo_xml": os.path.basename(filePath),
-                    "local_lancamento": f"{empresa} {ano}/{nomeAba}",
-                }
-            )
+            log_boleto_lancado(lancamento)
         except Exception:
             pass
-        inseriu_alguma = True
+        return True
+
+    pendentes = []
+    for i, (num, vencimento, valor) in enumerate(parcelas, start=1):
+        try:
+            dataVencimento = datetime.strptime(vencimento, "%Y-%m-%d")
+        except Exception:
+            aviso = f"{_doc_ref('NF', num, filePath)} com vencimento invalido '{vencimento}'; parcela ignorada"
+            print(aviso)
+            registrarAviso(aviso, "Conta Principal")
+            continue
+
+        ano = dataVencimento.year
+        planilha, empresa = escolherPlanilha(cnpjDest, ano)
+        if not planilha:
+            aviso = f"{_doc_ref('NF', num, filePath)} sem planilha para CNPJ destino {cnpjDest} ({ano})"
+            print(aviso)
+            registrarAviso(aviso, "Conta Principal")
+            continue
+
+        nomeAba = nome_aba_pt(dataVencimento)
+        vencFmt = dataVencimento.strftime("%d/%m/%Y")
+
+        if ja_lancado(empresa, ano, nomeAba, num, vencFmt):
+            aviso = f"{_doc_ref('NF', num, filePath)} já lançada em {empresa} {nomeAba} ({vencFmt})"
+            print(aviso)
+            registrarAviso(aviso, "Conta Principal")
+            continue
+
+        pendentes.append(
+            sheets_writer.executar(planilha, _lancarParcela, planilha, empresa, ano, nomeAba, vencFmt, num, i, valor)
+        )
+
+    # Cada parcela e escrita na faixa da sua planilha; o documento espera todas
+    for futuro in pendentes:
+        if futuro.result():
+            inseriu_alguma = True
 
     return inseriu_alguma
 
 
 # === Processar CT-e ===
-def processarCTE(root, filePath):
+def processarCTE(documento: DocumentoCTe, filePath):
     inseriu_alguma = False
-    ns = {"cte": "http://www.portalfiscal.inf.br/cte", "nfe": "http://www.portalfiscal.inf.br/nfe"}
-    emit = root.find(".//cte:emit", ns)
-    dest = root.find(".//cte:dest", ns)
-    ide = root.find(".//cte:ide", ns)
-    total = root.find(".//cte:vPrest/cte:vTPrest", ns)
-    entrega = root.find(".//cte:compl/cte:Entrega/cte:comData/cte:dProg", ns)
-
-    fornecedor = emit.find("cte:xNome", ns).text if emit is not None and emit.find("cte:xNome", ns) is not None else "-"
+    chave = documento.chave
+    fornecedor = documento.fornecedor
     fornecedorUpper = fornecedor.upper() if fornecedor else "-"
-    nfNum = ide.find("cte:nCT", ns).text if ide is not None and ide.find("cte:nCT", ns) is not None else "-"
-    valorTotal = float(total.text) if total is not None and total.text else 0.0
-    cnpjDest = dest.find("cte:CNPJ", ns).text if dest is not None and dest.find("cte:CNPJ", ns) is not None else ""
-    cnpjEmit = emit.find("cte:CNPJ", ns).text if emit is not None and emit.find("cte:CNPJ", ns) is not None else ""
+    nfNum = documento.numero
+    valorTotal = documento.valor_total
+    cnpjDest = documento.cnpj_dest
+    cnpjEmit = documento.cnpj_emit
 
     if cnpjEmit in [CNPJ_EH, CNPJ_MVA]:
         print(f"CT-e {nfNum} ignorado: emitente e a propria empresa ({cnpjEmit})")
         registrarEvento("ignorado", fornecedor, "Conta Principal")
-        try:
-            os.remove(filePath)
-        except Exception:
-            pass
         return inseriu_alguma
 
     if "BRASPRESS" in fornecedorUpper:
-        try:
-            from braspress_utils import buscarBraspressFaturas, inserir_fatura_braspress
-        except Exception as e:
+        if not servico.disponivel():
             aviso = (
-                f"{_doc_ref('CT-e', nfNum, filePath)} Braspress sem dependencias de runtime "
-                f"(playwright/bs4/greenlet): {e}"
+                f"{_doc_ref('CT-e', nfNum, filePath)} Braspress indisponivel "
+                f"({servico.status}: {servico.detail})"
             )
             print(aviso)
             registrarAviso(aviso, "Conta NFe")
             registrarEvento("ignorado", fornecedor, "Conta NFe")
-            try:
-                os.remove(filePath)
-            except Exception:
-                pass
             return inseriu_alguma
 
         print(f"[Braspress] Detectado CT-e {nfNum} - buscando vencimento automatico...")
-        faturas = buscarBraspressFaturas(cnpjDest)
+        faturas = servico.buscar_faturas(cnpjDest)
+        if faturas is None:
+            aviso = (
+                f"{_doc_ref('CT-e', nfNum, filePath)} Braspress: portal indisponivel ou sessao recusada "
+                f"para CNPJ {cnpjDest}; nota nao lancada"
+            )
+            print(aviso)
+            registrarAviso(aviso, "Conta NFe")
+            registrarEvento("ignorado", fornecedor, "Conta NFe")
+            return inseriu_alguma
 
-        for item in faturas:
-            if inserir_fatura_braspress(cnpjDest, item["fatura"], item["vencimento"], item["valor"]):
-                inseriu_alguma = True
+        # Uma leitura e uma escrita por aba para todas as faturas em aberto. O cache
+        # nao e invalidado: a lista do portal nao muda e o ledger evita repeticao.
+        if servico.inserir_faturas(cnpjDest, faturas):
+            inseriu_alguma = True
 
         if not faturas:
             aviso = f"{_doc_ref('CT-e', nfNum, filePath)} Braspress sem faturas para CNPJ {cnpjDest}; nota nao lancada"
             print(aviso)
             registrarAviso(aviso, "Conta NFe")
             registrarEvento("ignorado", fornecedor, "Conta NFe")
-            try:
-                os.remove(filePath)
-            except Exception:
-                pass
             return inseriu_alguma
 
-        try:
-            if isinstance(valorTotal, Decimal):
-                valDec = valorTotal.quantize(Decimal("0.01"))
-            else:
-                valDec = Decimal(str(round(float(valorTotal), 2))).quantize(Decimal("0.01"))
-        except (InvalidOperation, ValueError):
-            valDec = Decimal("0.00")
-
-        correspondentes = []
-        for f in faturas:
-            try:
-                f_val = f["valor"]
-                f_val_dec = f_val if isinstance(f_val, Decimal) else Decimal(str(f_val))
-                if abs(f_val_dec - valDec) < Decimal("0.05"):
-                    correspondentes.append(f)
-            except Exception:
-                continue
-
-        if not correspondentes:
+        # Indice por centavos compartilhado no ciclo (faturas ja casadas nao voltam a ser usadas)
+        casamento = braspress_matcher.casar(cnpjDest, braspress_matcher.id_cte(chave, nfNum, cnpjEmit), valorTotal, faturas)
+        if casamento.fatura is None:
             aviso = f"{_doc_ref('CT-e', nfNum, filePath)} Braspress sem fatura com valor correspondente ({valorTotal})"
             print(aviso)
             registrarAviso(aviso, "Conta NFe")
             registrarEvento("ignorado", fornecedor, "Conta NFe")
-            try:
-                os.remove(filePath)
-            except Exception:
-                pass
             return inseriu_alguma
 
-        if len(correspondentes) > 1:
-            msg = f"{_doc_ref('CT-e', nfNum, filePath)} Braspress com multiplas faturas no mesmo valor ({valorTotal})"
+        if casamento.ambiguo:
+            msg = (
+                f"{_doc_ref('CT-e', nfNum, filePath)} Braspress com multiplas faturas no mesmo valor ({valorTotal}); "
+                f"usada a fatura {casamento.fatura['fatura']}"
+            )
             print(msg)
             escreverRelatorio(msg)
             registrarAviso(msg, "Conta NFe")
 
-        vencimento = correspondentes[0]["vencimento"]
-        nfNum = correspondentes[0]["fatura"]
+        vencimento = casamento.fatura["vencimento"]
+        nfNum = casamento.fatura["fatura"]
         print(f"[Braspress] Valor {valorTotal} -> vencimento {vencimento}")
     else:
         if any(x in fornecedorUpper for x in ["DOMINIO"]):
             print(f"Ignorado CT-e de transportadora ({filePath})")
-            try:
-                os.remove(filePath)
-            except Exception:
-                pass
             return inseriu_alguma
 
-        vencimento = entrega.text if entrega is not None else None
+        vencimento = documento.vencimento_entrega
 
     fornecedor = f"{fornecedor} (Bot)"
     if not vencimento:
         aviso = f"{_doc_ref('CT-e', nfNum, filePath)} sem data de vencimento; nota nao lancada"
         print(aviso)
         registrarAviso(aviso, "Conta NFe")
-        try:
-            os.remove(filePath)
-        except Exception:
-            pass
         return inseriu_alguma
 
     try:
@@ -359,10 +317,6 @@ def processarCTE(root, filePath):
             aviso = f"{_doc_ref('CT-e', nfNum, filePath)} com data invalida '{vencimento}'; nota nao lancada"
             print(aviso)
             registrarAviso(aviso, "Conta NFe")
-            try:
-                os.remove(filePath)
-            except Exception:
-                pass
             return inseriu_alguma
 
     ano = dataVencimento.year
@@ -371,109 +325,207 @@ def processarCTE(root, filePath):
         aviso = f"{_doc_ref('CT-e', nfNum, filePath)} sem planilha para CNPJ destino {cnpjDest} ({ano})"
         print(aviso)
         registrarAviso(aviso, "Conta NFe")
-        try:
-            os.remove(filePath)
-        except Exception:
-            pass
         return inseriu_alguma
 
     nomeAba = nome_aba_pt(dataVencimento)
-    try:
-        aba = planilha.worksheet(nomeAba)
-    except gspread.exceptions.WorksheetNotFound:
-        try:
-            aba = planilha.add_worksheet(title=nomeAba, rows="100", cols="9")
-            aba.append_row(["Vencimento", "Descricao", "CT-e", "Valor Total", "Qtd Parcelas", "Parcela", "Valor Parcela", "Valor Pago", "Status"])
-        except gspread.exceptions.APIError as e:
-            if "already exists" in str(e).lower():
-                aba = planilha.worksheet(nomeAba)
-            else:
-                raise
+    vencFmt = dataVencimento.strftime("%d/%m/%Y")
 
-    dados = aba.get_all_values()
-    duplicado = any(
-        nfNum == linha[2].strip() and dataVencimento.strftime("%d/%m/%Y") == linha[0].strip()
-        for linha in dados
-        if len(linha) >= 3
-    )
-
-    if duplicado:
-        aviso = f"{_doc_ref('CT-e', nfNum, filePath)} já lançado em {empresa} {nomeAba} ({dataVencimento.strftime('%d/%m/%Y')})"
+    if ja_lancado(empresa, ano, nomeAba, nfNum, vencFmt):
+        aviso = f"{_doc_ref('CT-e', nfNum, filePath)} já lançado em {empresa} {nomeAba} ({vencFmt})"
         print(aviso)
         registrarAviso(aviso, "Conta NFe")
-        try:
-            os.remove(filePath)
-        except Exception:
-            pass
         return inseriu_alguma
 
-    novaLinha = [
-        dataVencimento.strftime("%d/%m/%Y"),
-        fornecedor,
-        nfNum,
-        f"{valorTotal:.2f}".replace(".", ","),
-        1,
-        _texto_parcela(1),
-        f"{valorTotal:.2f}".replace(".", ","),
-        "",
-        "",
-    ]
+    def _gravar():
+        aba = obterAba(planilha, nomeAba, CABECALHO_CTE)
 
-    aba.append_row(novaLinha, value_input_option="USER_ENTERED")
-    print(f"Inserido: {empresa} {ano} | {nomeAba} | Parcela 1/1 - {fornecedor} - {nfNum}")
-    registrarEvento("processado", fornecedor, "Conta NFe")
-    try:
-        log_boleto_lancado(
-            {
-                "conta": "Conta NFe",
-                "doc_tipo": "CT-e",
-                "numero": str(nfNum),
-                "fornecedor": fornecedor,
-                "cnpj_emit": cnpjEmit,
-                "cnpj_dest": cnpjDest,
-                "vencimento": dataVencimento.strftime("%d/%m/%Y"),
-                "valor_total": f"{valorTotal:.2f}",
-                "valor_parcela": f"{valorTotal:.2f}",
-                "parcela": _texto_parcela(1),
-                "qtd_parcelas": 1,
-                "empresa": empresa,
-                "ano": int(ano),
-                "aba": nomeAba,
-                "arquivo_xml": os.path.basename(filePath),
-                "local_lancamento": f"{empresa} {ano}/{nomeAba}",
-            }
+        quota_pacer.consumir("sheets_read")
+        dados = aba.get_all_values()
+        duplicado = any(
+            nfNum == linha[2].strip() and dataVencimento.strftime("%d/%m/%Y") == linha[0].strip()
+            for linha in dados
+            if len(linha) >= 3
         )
-    except Exception:
-        pass
-    inseriu_alguma = True
 
-    try:
-        os.remove(filePath)
-        print(f"XML removido: {filePath}")
-    except Exception:
-        pass
-    time.sleep(1.0)
+        if duplicado:
+            aviso = f"{_doc_ref('CT-e', nfNum, filePath)} já lançado em {empresa} {nomeAba} ({dataVencimento.strftime('%d/%m/%Y')})"
+            print(aviso)
+            registrarAviso(aviso, "Conta NFe")
+            _registrar_ledger(
+                {"empresa": empresa, "ano": ano, "aba": nomeAba, "numero": nfNum, "vencimento": vencFmt, "chave_acesso": chave},
+                origem="planilha",
+            )
+            return False
+
+        novaLinha = [
+            dataVencimento.strftime("%d/%m/%Y"),
+            fornecedor,
+            nfNum,
+            f"{valorTotal:.2f}".replace(".", ","),
+            1,
+            _texto_parcela(1),
+            f"{valorTotal:.2f}".replace(".", ","),
+            "",
+            "",
+        ]
+
+        quota_pacer.consumir("sheets_write")
+        aba.append_row(novaLinha, value_input_option="USER_ENTERED")
+        print(f"Inserido: {empresa} {ano} | {nomeAba} | Parcela 1/1 - {fornecedor} - {nfNum}")
+        registrarEvento("processado", fornecedor, "Conta NFe")
+        lancamento = {
+            "conta": "Conta NFe",
+            "doc_tipo": "CT-e",
+            "numero": str(nfNum),
+            "fornecedor": fornecedor,
+            "cnpj_emit": cnpjEmit,
+            "cnpj_dest": cnpjDest,
+            "chave_acesso": chave,
+            "vencimento": vencFmt,
+            "valor_total": f"{valorTotal:.2f}",
+            "valor_parcela": f"{valorTotal:.2f}",
+            "parcela": _texto_parcela(1),
+            "qtd_parcelas": 1,
+            "empresa": empresa,
+            "ano": int(ano),
+            "aba": nomeAba,
+            "arquivo_xml": os.path.basename(filePath),
+            "local_lancamento": f"{empresa} {ano}/{nomeAba}",
+        }
+        _registrar_ledger(lancamento)
+        try:
+            log_boleto_lancado(lancamento)
+        except Exception:
+            pass
+        return True
+
+    # A escrita roda na faixa da planilha de destino (backoff independente por planilha)
+    if sheets_writer.executar(planilha, _gravar).result():
+        inseriu_alguma = True
+
     return inseriu_alguma
 
 
-# === Decide tipo do XML ===
-def processarXML(filePath):
-    try:
-        tree = ET.parse(filePath)
-        root = tree.getroot()
-    except Exception as e:
-        aviso = f"XML invalido ({os.path.basename(filePath)}): {e}"
-        print(aviso)
-        registrarAviso(aviso, "Conta Principal")
-        return False
+def _aviso_tipo_desconhecido(filePath):
+    aviso = f"Tipo de XML desconhecido ({os.path.basename(filePath)}); nao processado"
+    print(aviso)
+    registrarAviso(aviso, "Conta Principal")
 
-    tag = root.tag.lower()
-    if tag.endswith("nfeproc"):
-        return processarNFE(root, filePath)
-    elif tag.endswith("cteproc"):
-        return processarCTE(root, filePath)
-    else:
-        aviso = f"Tipo de XML desconhecido ({os.path.basename(filePath)}); nao processado"
+
+def validarDocumento(documento, erro, filePath):
+    """Recebe o resultado do parse (local ou do pool) e avisa se invalido/desconhecido."""
+    if erro:
+        aviso = f"XML invalido ({os.path.basename(filePath)}): {erro}"
         print(aviso)
         registrarAviso(aviso, "Conta Principal")
+        return None
+
+    if documento is None:
+        _aviso_tipo_desconhecido(filePath)
+    return documento
+
+
+# === Abas mensais que o documento vai precisar (para provisionar em lote) ===
+def vencimentosDocumento(documento):
+    """
+    Trincas (cnpj_dest, data de vencimento, cabecalho da aba) conhecidas sem
+    acessar a planilha.
+    CT-e Braspress fica de fora: o vencimento so vem do portal.
+    """
+    if documento is None or not documento.com_protocolo:
+        return []
+    if documento.cnpj_emit in [CNPJ_EH, CNPJ_MVA]:
+        return []
+    if isinstance(documento, DocumentoNFe):
+        datas = [p.vencimento for p in documento.parcelas]
+        cabecalho = CABECALHO_NF
+    elif isinstance(documento, DocumentoCTe):
+        if "BRASPRESS" in documento.fornecedor_upper or not documento.vencimento_entrega:
+            return []
+        datas = [documento.vencimento_entrega]
+        cabecalho = CABECALHO_CTE
+    else:
+        return []
+
+    pares = []
+    for venc in datas:
+        try:
+            pares.append((documento.cnpj_dest, datetime.strptime(venc, "%Y-%m-%d"), cabecalho))
+        except (TypeError, ValueError):
+            continue
+    return pares
+
+
+def _ehCteBraspress(documento) -> bool:
+    return (
+        isinstance(documento, DocumentoCTe)
+        and documento.com_protocolo
+        and documento.cnpj_emit not in [CNPJ_EH, CNPJ_MVA]
+        and "BRASPRESS" in documento.fornecedor_upper
+    )
+
+
+# === Casamento em lote dos CT-e Braspress com as faturas do portal ===
+def casarBraspressLote(documentos, workers: int = 2):
+    """
+    Casa todos os CT-e Braspress do lote de uma vez, por CNPJ destino, antes do
+    roteamento; processarCTE usa a fatura atribuida aqui.
+    """
+    porCnpj = {}
+    for documento in documentos:
+        if not _ehCteBraspress(documento):
+            continue
+        identificador = braspress_matcher.id_cte(documento.chave, documento.numero, documento.cnpj_emit)
+        if identificador:
+            porCnpj.setdefault(documento.cnpj_dest, []).append((identificador, documento.valor_total))
+    if not porCnpj:
+        return {}
+
+    if not servico.disponivel():
+        print(f"[Braspress] Casamento em lote indisponivel ({servico.status}): {servico.detail}")
+        return {}
+
+    # Havendo CT-e Braspress, as listas de todas as empresas sao buscadas juntas e
+    # ficam para o roteamento deste lote (liberarBraspressLote ao final)
+    listas = servico.prefetch(list(porCnpj) + list(EMPRESAS_CNPJ.values()), workers)
+
+    resultado = {}
+    for cnpj, ctes in porCnpj.items():
+        faturas = listas.get(str(cnpj).strip())
+        if faturas:
+            resultado.update(braspress_matcher.casar_lote(cnpj, ctes, faturas))
+    casados = sum(1 for c in resultado.values() if c.fatura is not None)
+    print(f"[Braspress] Casamento em lote: {casados}/{len(resultado)} CT-e com fatura.")
+    return resultado
+
+
+def liberarBraspressLote():
+    """Descarta as listas pre-carregadas por casarBraspressLote (lote roteado)."""
+    servico.fim_lote()
+
+
+# === Le o XML uma unica vez (caminho ou bytes) ===
+def carregarDocumento(origem, filePath):
+    """Retorna o modelo do documento ou None (com aviso) se o XML for invalido/desconhecido."""
+    try:
+        documento, erro = ler_documento(origem), ""
+    except Exception as e:
+        documento, erro = None, str(e) or e.__class__.__name__
+    return validarDocumento(documento, erro, filePath)
+
+
+# === Decide tipo do documento ===
+def processarDocumento(documento, filePath):
+    if isinstance(documento, DocumentoNFe) and documento.com_protocolo:
+        return processarNFE(documento, filePath)
+    if isinstance(documento, DocumentoCTe) and documento.com_protocolo:
+        return processarCTE(documento, filePath)
+    _aviso_tipo_desconhecido(filePath)
+    return False
+
+
+def processarXML(filePath):
+    documento = carregarDocumento(filePath, filePath)
+    if documento is None:
         return False
+    return processarDocumento(documento, filePath)
@@ -0,0 +1,136 @@
+"""
+Controle de ritmo por cota (token bucket) para Sheets e Gmail.
+
+Cada chamada de API consome do seu orcamento; so ha espera quando o
+orcamento esta esgotado. O tempo total aguardando e acumulado por ciclo.
+"""
+
+import threading
+import time
+
+
+# Custos em unidades de cota do Gmail (users.messages.*, users.labels.*)
+GMAIL_CUSTOS = {
+    "labels.list": 1,
+    "labels.create": 5,
+    "messages.list": 5,
+    "messages.get": 5,
+    "attachments.get": 5,
+    "messages.modify": 5,
+    "getProfile": 1,
+}
+
+_DEFAULT_LIMITES = {
+    # orcamento: (capacidade, periodo em segundos)
+    "sheets_read": (60, 60.0),
+    "sheets_write": (60, 60.0),
+    "gmail": (250, 1.0),
+}
+
+
+class _Balde:
+    def __init__(self, capacidade: float, periodo: float):
+        self.capacidade = float(capacidade)
+        self.taxa = self.capacidade / max(0.001, float(periodo))
+        self.tokens = self.capacidade
+        self.atualizado = time.monotonic()
+
+    def reservar(self, custo: float) -> float:
+        """Reserva custo e retorna quantos segundos aguardar antes de usar."""
+        agora = time.monotonic()
+        self.tokens = min(self.capacidade, self.tokens + (agora - self.atualizado) * self.taxa)
+        self.atualizado = agora
+        self.tokens -= custo
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.taxa
+
+    def esgotar(self):
+        self.tokens = min(self.tokens, 0.0)
+        self.atualizado = time.monotonic()
+
+
+_lock = threading.Lock()
+_baldes = {nome: _Balde(*lim) for nome, lim in _DEFAULT_LIMITES.items()}
+_ciclo = {"espera": {}, "consumo": {}, "inicio": time.monotonic()}
+_ativo = True
+
+
+def configurar(cfg: dict):
+    """Aplica limites vindos de settings (sem perder o saldo atual dos baldes)."""
+    limites = {
+        "sheets_read": (int(cfg.get("sheets_read_per_minute", 60)), 60.0),
+        "sheets_write": (int(cfg.get("sheets_write_per_minute", 60)), 60.0),
+        "gmail": (int(cfg.get("gmail_units_per_second", 250)), 1.0),
+    }
+    with _lock:
+        for nome, (capacidade, periodo) in limites.items():
+            balde = _baldes.get(nome)
+            if balde and balde.capacidade == float(capacidade):
+                continue
+            novo = _Balde(capacidade, periodo)
+            if balde:
+                novo.tokens = min(novo.capacidade, balde.tokens)
+            _baldes[nome] = novo
+
+
+def definir_ativo(ativo: bool):
+    """Desligado, o consumo continua contabilizado mas nunca ha espera (benchmarks)."""
+    global _ativo
+    with _lock:
+        _ativo = bool(ativo)
+
+
+def consumir(orcamento: str, custo: float = 1.0) -> float:
+    """Consome do orcamento, aguardando apenas se ele estiver esgotado."""
+    with _lock:
+        balde = _baldes.get(orcamento)
+        if balde is None:
+            return 0.0
+        if not _ativo:
+            _ciclo["consumo"][orcamento] = _ciclo["consumo"].get(orcamento, 0.0) + float(custo)
+            return 0.0
+        espera = balde.reservar(float(custo))
+        _ciclo["consumo"][orcamento] = _ciclo["consumo"].get(orcamento, 0.0) + float(custo)
+        if espera > 0:
+            _ciclo["espera"][orcamento] = _ciclo["espera"].get(orcamento, 0.0) + espera
+    if espera > 0:
+        time.sleep(espera)
+    return espera
+
+
+def consumir_gmail(operacao: str) -> float:
+    return consumir("gmail", GMAIL_CUSTOS.get(operacao, 5))
+
+
+def esgotar(orcamento: str):
+    """Chamado apos um 429: o servidor diz que a cota acabou, entao o balde zera."""
+    with _lock:
+        balde = _baldes.get(orcamento)
+        if balde:
+            balde.esgotar()
+
+
+def iniciar_ciclo():
+    with _lock:
+        _ciclo["espera"] = {}
+        _ciclo["consumo"] = {}
+        _ciclo["inicio"] = time.monotonic()
+
+
+def espera_total() -> float:
+    with _lock:
+        return sum(_ciclo["espera"].values())
+
+
+def resumo_ciclo() -> dict:
+    with _lock:
+        espera = {k: round(v, 2) for k, v in _ciclo["espera"].items()}
+        consumo = {k: round(v, 2) for k, v in _ciclo["consumo"].items()}
+        duracao = time.monotonic() - _ciclo["inicio"]
+    return {
+        "wait_seconds": round(sum(espera.values()), 2),
+        "wait_by_budget": espera,
+        "usage_by_budget": consumo,
+        "cycle_seconds": round(duracao, 2),
+    }
@@ -1,4 +1,5 @@
 import os
+import threading
 from datetime import datetime
 from collections import Counter
 
@@ -15,6 +16,9 @@ diaOcorrencias = datetime.now().strftime("%Y-%m-%d")
 
 ultimoRelatorio = {"Conta Principal": None, "Conta NFe": None}
 
+# Eventos chegam tambem das faixas de escrita (sheets_writer)
+_lockEventos = threading.Lock()
+
 
 def resetarOcorrenciasSeNovoDia():
     global diaOcorrencias
@@ -64,18 +68,20 @@ def registrarEvento(tipo, fornecedor, conta):
     ]):
         return
 
-    if tipo == "processado":
-        eventosProcessados.append((fornecedor, conta))
-    elif tipo == "ignorado":
-        eventosIgnorados.append((fornecedor, conta))
+    with _lockEventos:
+        if tipo == "processado":
+            eventosProcessados.append((fornecedor, conta))
+        elif tipo == "ignorado":
+            eventosIgnorados.append((fornecedor, conta))
 
 
 def registrarAviso(mensagem, conta="Conta Principal"):
     if not mensagem:
         return
     chave = (mensagem.strip(), conta)
-    eventosAvisos.append(chave)
-    ocorrenciasAvisosDia[chave] += 1
+    with _lockEventos:
+        eventosAvisos.append(chave)
+        ocorrenciasAvisosDia[chave] += 1
 
 
 def consolidarRelatorioTMP():
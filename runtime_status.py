@@ -19,6 +19,16 @@ _state = {
         "until": None,
         "seconds": 0,
     },
+    "pacing": {
+        "wait_seconds": 0.0,
+        "wait_by_budget": {},
+        "usage_by_budget": {},
+        "cycle_seconds": 0.0,
+        "at": None,
+    },
+    "sheets_lanes": {},
+    "braspress": {"status": "pending", "detail": "Aguardando inicializacao.", "at": None},
+    "event_writers": {},
 }
 _cooldown_prev = {}
 
@@ -96,6 +106,40 @@ def end_api_cooldown():
         _cooldown_prev.clear()
 
 
+def set_pacing(summary: dict):
+    with _lock:
+        data = dict(summary or {})
+        data["at"] = datetime.now().isoformat()
+        _state["pacing"] = data
+
+
+def set_sheets_lane(name: str, pending: int = 0, cooldown_seconds: float | None = None, retries: int | None = None):
+    with _lock:
+        lane = _state["sheets_lanes"].setdefault(name, {"pending": 0, "cooldown_until": None, "retries": 0})
+        lane["pending"] = max(0, int(pending))
+        if cooldown_seconds is not None:
+            if cooldown_seconds > 0:
+                lane["cooldown_until"] = (datetime.now() + timedelta(seconds=float(cooldown_seconds))).isoformat()
+            else:
+                lane["cooldown_until"] = None
+        if retries is not None:
+            lane["retries"] = int(retries)
+
+
+def set_braspress_status(status: str, detail: str = ""):
+    """pending | starting | ready | disabled | error"""
+    with _lock:
+        _state["braspress"] = {"status": status, "detail": detail or "", "at": datetime.now().isoformat()}
+
+
+def set_event_writer(name: str, **metrics):
+    """pending, peak, batches, events, last_batch, last_write_ms, failures, dropped"""
+    with _lock:
+        data = dict(metrics)
+        data["at"] = datetime.now().isoformat()
+        _state["event_writers"][name] = data
+
+
 def get_state() -> dict:
     with _lock:
         snapshot = {
@@ -105,6 +149,10 @@ def get_state() -> dict:
             },
             "scheduler": dict(_state["scheduler"]),
             "cooldown": dict(_state["cooldown"]),
+            "pacing": dict(_state["pacing"]),
+            "sheets_lanes": {k: dict(v) for k, v in _state["sheets_lanes"].items()},
+            "braspress": dict(_state["braspress"]),
+            "event_writers": {k: dict(v) for k, v in _state["event_writers"].items()},
         }
 
     next_cycle_at = snapshot["scheduler"].get("next_cycle_at")
@@ -128,4 +176,15 @@ def get_state() -> dict:
     snapshot["cooldown"]["remaining_seconds"] = cd_remaining
     if cd_remaining <= 0 and snapshot["cooldown"].get("active"):
         snapshot["cooldown"]["active"] = False
+
+    for lane in snapshot["sheets_lanes"].values():
+        lane_remaining = 0
+        if lane.get("cooldown_until"):
+            try:
+                dt = datetime.fromisoformat(lane["cooldown_until"])
+                lane_remaining = max(0, int((dt - datetime.now()).total_seconds()))
+            except Exception:
+                lane_remaining = 0
+        lane["cooldown_remaining_seconds"] = lane_remaining
+        lane["cooldown_active"] = lane_remaining > 0
     return snapshot
@@ -17,6 +17,26 @@ DEFAULT_SETTINGS = {
     "auto_update_interval_minutes": 5,
     "auto_update_remote": "origin",
     "auto_update_branch": "main",
+    "ledger_reconcile_interval_minutes": 60,
+    "gmail_batch_messages": 25,
+    "xml_parse_workers": 0,  # 0 = parse no proprio processo
+    "xml_parse_min_batch": 16,
+    "sheets_read_per_minute": 60,
+    "sheets_write_per_minute": 60,
+    "gmail_units_per_second": 250,
+    "sheets_provision_months_ahead": 1,
+    "sheets_route_workers": 2,
+    "braspress_enabled": True,
+    "braspress_cache_ttl_seconds": 600,  # 0 = sem cache
+    "braspress_session_refresh_minutes": 20,
+    "braspress_prefetch_workers": 2,
+    "braspress_debug_capture": True,
+    "braspress_debug_max_mb": 20,
+    "braspress_debug_max_files": 200,
+    "history_backend": "jsonl",  # jsonl | sqlite (historico e auditoria; importa os arquivos uma vez)
+    "event_writer_batch": 256,
+    "event_writer_interval_ms": 200,
+    "event_writer_fsync": "off",  # off | batch (fsync a cada lote gravado)
 }
 
 ALLOWED_FILTER_MODES = {
@@ -29,6 +49,9 @@ ALLOWED_FILTER_MODES = {
     "current_and_previous_month",
 }
 
+ALLOWED_HISTORY_BACKENDS = {"jsonl", "sqlite"}
+ALLOWED_FSYNC_POLICIES = {"off", "batch"}
+
 
 def _sanitize(data: dict) -> dict:
     out = dict(DEFAULT_SETTINGS)
@@ -39,6 +62,14 @@ def _sanitize(data: dict) -> dict:
     if mode in ALLOWED_FILTER_MODES:
         out["gmail_filter_mode"] = mode
 
+    backend = data.get("history_backend")
+    if backend in ALLOWED_HISTORY_BACKENDS:
+        out["history_backend"] = backend
+
+    fsync = data.get("event_writer_fsync")
+    if fsync in ALLOWED_FSYNC_POLICIES:
+        out["event_writer_fsync"] = fsync
+
     try:
         out["gmail_max_pages"] = max(1, min(20, int(data.get("gmail_max_pages", out["gmail_max_pages"]))))
     except Exception:
@@ -64,6 +95,8 @@ def _sanitize(data: dict) -> dict:
         pass
 
     out["auto_update_enabled"] = bool(data.get("auto_update_enabled", out["auto_update_enabled"]))
+    out["braspress_enabled"] = bool(data.get("braspress_enabled", out["braspress_enabled"]))
+    out["braspress_debug_capture"] = bool(data.get("braspress_debug_capture", out["braspress_debug_capture"]))
 
     try:
         out["auto_update_interval_minutes"] = max(
@@ -81,6 +114,104 @@ def _sanitize(data: dict) -> dict:
     if branch:
         out["auto_update_branch"] = branch
 
+    try:
+        out["ledger_reconcile_interval_minutes"] = max(
+            5,
+            min(1440, int(data.get("ledger_reconcile_interval_minutes", out["ledger_reconcile_interval_minutes"]))),
+        )
+    except Exception:
+        pass
+
+    try:
+        out["gmail_batch_messages"] = max(1, min(500, int(data.get("gmail_batch_messages", out["gmail_batch_messages"]))))
+    except Exception:
+        pass
+
+    try:
+        out["xml_parse_workers"] = max(0, min(16, int(data.get("xml_parse_workers", out["xml_parse_workers"]))))
+    except Exception:
+        pass
+
+    try:
+        out["xml_parse_min_batch"] = max(1, min(1000, int(data.get("xml_parse_min_batch", out["xml_parse_min_batch"]))))
+    except Exception:
+        pass
+
+    try:
+        out["sheets_read_per_minute"] = max(1, min(600, int(data.get("sheets_read_per_minute", out["sheets_read_per_minute"]))))
+    except Exception:
+        pass
+
+    try:
+        out["sheets_write_per_minute"] = max(1, min(600, int(data.get("sheets_write_per_minute", out["sheets_write_per_minute"]))))
+    except Exception:
+        pass
+
+    try:
+        out["gmail_units_per_second"] = max(1, min(250, int(data.get("gmail_units_per_second", out["gmail_units_per_second"]))))
+    except Exception:
+        pass
+
+    try:
+        out["sheets_provision_months_ahead"] = max(0, min(12, int(data.get("sheets_provision_months_ahead", out["sheets_provision_months_ahead"]))))
+    except Exception:
+        pass
+
+    try:
+        out["sheets_route_workers"] = max(1, min(8, int(data.get("sheets_route_workers", out["sheets_route_workers"]))))
+    except Exception:
+        pass
+
+    try:
+        out["braspress_cache_ttl_seconds"] = max(
+            0,
+            min(3600, int(data.get("braspress_cache_ttl_seconds", out["braspress_cache_ttl_seconds"]))),
+        )
+    except Exception:
+        pass
+
+    try:
+        out["braspress_session_refresh_minutes"] = max(
+            5,
+            min(240, int(data.get("braspress_session_refresh_minutes", out["braspress_session_refresh_minutes"]))),
+        )
+    except Exception:
+        pass
+
+    try:
+        out["braspress_prefetch_workers"] = max(
+            1,
+            min(4, int(data.get("braspress_prefetch_workers", out["braspress_prefetch_workers"]))),
+        )
+    except Exception:
+        pass
+
+    try:
+        out["braspress_debug_max_mb"] = max(1, min(500, int(data.get("braspress_debug_max_mb", out["braspress_debug_max_mb"]))))
+    except Exception:
+        pass
+
+    try:
+        out["braspress_debug_max_files"] = max(
+            1,
+            min(5000, int(data.get("braspress_debug_max_files", out["braspress_debug_max_files"]))),
+        )
+    except Exception:
+        pass
+
+    try:
+        out["event_writer_batch"] = max(1, min(5000, int(data.get("event_writer_batch", out["event_writer_batch"]))))
+    except Exception:
+        pass
+
+    try:
+        out["event_writer_interval_ms"] = max(
+            0,
+            min(5000, int(data.get("event_writer_interval_ms", out["event_writer_interval_ms"]))),
+        )
+    except Exception:
+        pass
+
     return out
 
 
@@ -1,29 +1,147 @@
 # sheets_utils.py
+import json
+import re
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
 import gspread
-from config import (
-    SHEET_EH_2025, SHEET_EH_2026, SHEET_MVA_2025, SHEET_MVA_2026,
-)
-from auth import sheetsClient, apiCooldown
+from config import APPDATA_BASE, EMPRESAS_CNPJ, PLANILHAS, PLANILHAS_PADRAO_NOME
+from auth import apiCooldown, get_sheets_client
+import quota_pacer
 
 planilhasCache = {}
 
+MES_ABREV_PT = ["Jan", "Fev", "Mar", "Abr", "Mai", "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez"]
+CABECALHO_NF = ["Vencimento", "Descricao", "NF", "Valor Total", "Qtd Parcelas", "Parcela", "Valor Parcela", "Valor Pago", "Status"]
+CABECALHO_CTE = ["Vencimento", "Descricao", "CT-e", "Valor Total", "Qtd Parcelas", "Parcela", "Valor Parcela", "Valor Pago", "Status"]
+LINHAS_ABA_NOVA = 1000
+_RE_ABA_MES = re.compile(r"^(?:%s)/\d{4}$" % "|".join(MES_ABREV_PT))
+
+_LOCK = threading.Lock()
+_DESCOBERTAS_FILE = Path(APPDATA_BASE) / "planilhas_descobertas.json"
+_DESCOBERTA_INTERVALO = 30 * 60  # segundos entre buscas no Drive para o mesmo ano
+_empresaPorCnpj = {str(cnpj).strip(): empresa for empresa, cnpj in EMPRESAS_CNPJ.items()}
+_registro = {}  # (empresa, ano) -> spreadsheet id
+_descobertaTentada = {}  # (empresa, ano) -> timestamp da ultima busca sem sucesso
+_abasCache = {}  # spreadsheet id -> {titulo: Worksheet}
+
+
+def nome_aba_pt(dt):
+    return f"{MES_ABREV_PT[dt.month - 1]}/{dt.year}"
+
+
+def _parse_chave(chave):
+    empresa, _, ano = str(chave).rpartition("_")
+    if not empresa or not ano.isdigit():
+        return None
+    return empresa, int(ano)
+
+
+def _carregar_registro():
+    descobertas = {}
+    if _DESCOBERTAS_FILE.exists():
+        try:
+            descobertas = json.loads(_DESCOBERTAS_FILE.read_text(encoding="utf-8"))
+        except Exception:
+            descobertas = {}
+    # IDs configurados explicitamente prevalecem sobre os descobertos
+    for origem in (descobertas, PLANILHAS):
+        for chave, sheet_id in (origem or {}).items():
+            parsed = _parse_chave(chave)
+            if parsed and sheet_id:
+                _registro[parsed] = str(sheet_id)
+
+
+def _salvar_descoberta(empresa, ano, sheet_id):
+    try:
+        atual = json.loads(_DESCOBERTAS_FILE.read_text(encoding="utf-8")) if _DESCOBERTAS_FILE.exists() else {}
+    except Exception:
+        atual = {}
+    atual[f"{empresa}_{ano}"] = sheet_id
+    _DESCOBERTAS_FILE.write_text(json.dumps(atual, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+_carregar_registro()
+
+
+def empresaDoCnpj(cnpj):
+    """Sigla da empresa (ex: 'EH') para o CNPJ, ou None."""
+    return _empresaPorCnpj.get(str(cnpj or "").strip())
+
+
+def _descobrir_planilha(empresa, ano):
+    """Procura no Drive uma planilha com o titulo padrao para (empresa, ano)."""
+    chave = (empresa, ano)
+    agora = datetime.now().timestamp()
+    with _LOCK:
+        ultima = _descobertaTentada.get(chave)
+        if ultima and agora - ultima < _DESCOBERTA_INTERVALO:
+            return None
+        _descobertaTentada[chave] = agora
+
+    titulo = PLANILHAS_PADRAO_NOME.format(empresa=empresa, ano=ano)
+    try:
+        quota_pacer.consumir("sheets_read")
+        arquivos = get_sheets_client().list_spreadsheet_files(title=titulo)
+    except Exception as e:
+        print(f"[Planilhas] Falha ao buscar '{titulo}' no Drive: {e}")
+        return None
+
+    encontrados = [a for a in arquivos if str(a.get("name", "")).strip() == titulo]
+    if not encontrados:
+        print(f"[Planilhas] Nenhuma planilha '{titulo}' encontrada no Drive.")
+        return None
+    if len(encontrados) > 1:
+        print(f"[Planilhas] {len(encontrados)} planilhas com o titulo '{titulo}'; usando a primeira.")
+
+    sheet_id = encontrados[0]["id"]
+    with _LOCK:
+        _registro[chave] = sheet_id
+        _descobertaTentada.pop(chave, None)
+    try:
+        _salvar_descoberta(empresa, ano, sheet_id)
+    except Exception as e:
+        print(f"[Planilhas] Falha ao salvar planilha descoberta {empresa}_{ano}: {e}")
+    print(f"[Planilhas] Planilha {empresa}_{ano} descoberta no Drive: '{titulo}'.")
+    return sheet_id
+
+
+def idPlanilha(empresa, ano):
+    """ID da planilha de (empresa, ano): registro em memoria, depois busca no Drive."""
+    sheet_id = _registro.get((empresa, int(ano)))
+    if sheet_id:
+        return sheet_id
+    return _descobrir_planilha(empresa, int(ano))
+
+
+def planilhasRegistradas(ano_minimo=0):
+    """Pares (empresa, ano) com planilha configurada ou ja descoberta no Drive."""
+    with _LOCK:
+        return sorted(par for par in _registro if par[1] >= int(ano_minimo))
+
+
 def getPlanilha(chave):
-    """Retorna objeto da planilha (gspread) a partir da chave lógica."""
+    """Retorna objeto da planilha (gspread) a partir da chave lógica (ex: 'EH_2026')."""
     if chave in planilhasCache:
         return planilhasCache[chave]
-    planilhasID = {
-        "EH_2025": SHEET_EH_2025,
-        "EH_2026": SHEET_EH_2026,
-        "MVA_2025": SHEET_MVA_2025,
-        "MVA_2026": SHEET_MVA_2026
-    }
+    parsed = _parse_chave(chave)
+    if not parsed:
+        raise KeyError(chave)
+    sheet_id = idPlanilha(*parsed)
+    if not sheet_id:
+        raise KeyError(chave)
     for _ in range(3):
         try:
-            planilha = sheetsClient.open_by_key(planilhasID[chave])
+            quota_pacer.consumir("sheets_read")
+            planilha = get_sheets_client().open_by_key(sheet_id)
             planilhasCache[chave] = planilha
             return planilha
         except gspread.exceptions.APIError as e:
             if "429" in str(e):
+                quota_pacer.esgotar("sheets_read")
                 apiCooldown()
                 continue
             else:
@@ -33,12 +151,211 @@ def getPlanilha(chave):
 
 def escolherPlanilha(cnpjDest, ano):
     """Escolhe a planilha (gspread) e retorna também a sigla da empresa."""
-    from config import CNPJ_EH, CNPJ_MVA
-    if cnpjDest == CNPJ_EH:
-        empresa = "EH"
-    elif cnpjDest == CNPJ_MVA:
-        empresa = "MVA"
-    else:
+    empresa = empresaDoCnpj(cnpjDest)
+    if not empresa:
         return None, None
-    chave = f"{empresa}_{ano}"
-    return getPlanilha(chave), empresa
+    try:
+        return getPlanilha(f"{empresa}_{ano}"), empresa
+    except KeyError:
+        return None, empresa
+
+
+def aquecerPlanilhas(anos=None, max_workers=4):
+    """
+    Abre em paralelo as planilhas de todas as empresas para os anos informados
+    (padrao: ano atual e seguinte), descobrindo no Drive os anos que faltarem.
+    """
+    if anos is None:
+        ano_atual = datetime.now().year
+        anos = [ano_atual, ano_atual + 1]
+    chaves = [f"{empresa}_{ano}" for empresa in EMPRESAS_CNPJ for ano in anos]
+
+    def _abrir(chave):
+        try:
+            return chave, getPlanilha(chave) is not None
+        except KeyError:
+            return chave, False
+        except Exception as e:
+            print(f"[Planilhas] Falha ao abrir {chave}: {e}")
+            return chave, False
+
+    with ThreadPoolExecutor(max_workers=max(1, int(max_workers))) as pool:
+        resultado = dict(pool.map(_abrir, chaves))
+    abertas = [c for c, ok in resultado.items() if ok]
+    print(f"[Planilhas] {len(abertas)}/{len(chaves)} planilha(s) aquecida(s): {', '.join(abertas) or '-'}")
+    return resultado
+
+
+def _abas(planilha, recarregar=False):
+    """Mapa titulo -> aba da planilha, obtido com uma unica leitura de metadados."""
+    with _LOCK:
+        abas = _abasCache.get(planilha.id)
+    if abas is not None and not recarregar:
+        return abas
+    for _ in range(3):
+        try:
+            quota_pacer.consumir("sheets_read")
+            abas = {aba.title: aba for aba in planilha.worksheets()}
+            break
+        except gspread.exceptions.APIError as e:
+            if "429" in str(e):
+                quota_pacer.esgotar("sheets_read")
+                apiCooldown()
+                continue
+            raise
+    else:
+        raise RuntimeError(f"falha ao listar abas da planilha {planilha.title}")
+    with _LOCK:
+        _abasCache[planilha.id] = abas
+    return abas
+
+
+def _requisicoes_aba(sheet_id, nome, cabecalho):
+    """addSheet + cabecalho em negrito + linha congelada, para um unico batch_update."""
+    return [
+        {
+            "addSheet": {
+                "properties": {
+                    "sheetId": sheet_id,
+                    "title": nome,
+                    "gridProperties": {
+                        "rowCount": LINHAS_ABA_NOVA,
+                        "columnCount": len(cabecalho),
+                        "frozenRowCount": 1,
+                    },
+                }
+            }
+        },
+        {
+            "updateCells": {
+                "start": {"sheetId": sheet_id, "rowIndex": 0, "columnIndex": 0},
+                "rows": [
+                    {
+                        "values": [
+                            {
+                                "userEnteredValue": {"stringValue": titulo},
+                                "userEnteredFormat": {"textFormat": {"bold": True}},
+                            }
+                            for titulo in cabecalho
+                        ]
+                    }
+                ],
+                "fields": "userEnteredValue,userEnteredFormat.textFormat.bold",
+            }
+        },
+    ]
+
+
+def provisionarAbas(planilha, nomes, cabecalho=CABECALHO_NF):
+    """
+    Cria de uma vez as abas mensais que faltam na planilha (com cabecalho,
+    formatacao e linha congelada) usando um unico batch_update.
+    Retorna os nomes das abas criadas.
+    """
+    existentes = _abas(planilha)
+    for _ in range(3):
+        faltando = [n for n in dict.fromkeys(nomes) if n and n not in existentes]
+        if not faltando:
+            return []
+
+        ids_usados = {aba.id for aba in existentes.values()}
+        requisicoes = []
+        for nome in faltando:
+            sheet_id = zlib.crc32(nome.encode("utf-8")) & 0x7FFFFFFF
+            while sheet_id in ids_usados:
+                sheet_id = (sheet_id + 1) & 0x7FFFFFFF
+            ids_usados.add(sheet_id)
+            requisicoes.extend(_requisicoes_aba(sheet_id, nome, cabecalho))
+
+        try:
+            quota_pacer.consumir("sheets_write")
+            planilha.batch_update({"requests": requisicoes})
+            break
+        except gspread.exceptions.APIError as e:
+            texto = str(e)
+            if "429" in texto:
+                quota_pacer.esgotar("sheets_write")
+                apiCooldown()
+                continue
+            if "already exists" in texto.lower():
+                # Outra instancia criou parte das abas: o lote inteiro e rejeitado,
+                # entao recarrega e tenta de novo so com as que ainda faltam
+                # (dentro das mesmas tentativas, para nao repetir sem fim).
+                existentes = _abas(planilha, recarregar=True)
+                continue
+            raise
+    else:
+        raise RuntimeError(f"falha ao criar abas {', '.join(faltando)} em {planilha.title}")
+
+    _abas(planilha, recarregar=True)
+    print(f"[Planilhas] {planilha.title}: {len(faltando)} aba(s) criada(s): {', '.join(faltando)}")
+    return faltando
+
+
+def obterAba(planilha, nome, cabecalho=CABECALHO_NF):
+    """Aba mensal a partir do cache de metadados, criando-a (em lote de um) se faltar."""
+    aba = _abas(planilha).get(nome)
+    if aba is not None:
+        return aba
+    provisionarAbas(planilha, [nome], cabecalho)
+    aba = _abas(planilha).get(nome)
+    if aba is None:
+        raise gspread.exceptions.WorksheetNotFound(nome)
+    return aba
+
+
+def abasMensais(planilha):
+    """Abas mensais (titulo no formato de nome_aba_pt), lidas dos metadados atuais da planilha."""
+    return {titulo: aba for titulo, aba in _abas(planilha, recarregar=True).items() if _RE_ABA_MES.match(titulo)}
+
+
+def invalidarAbas(planilha):
+    """Descarta o mapa de abas em cache (ex: aba removida manualmente)."""
+    with _LOCK:
+        _abasCache.pop(planilha.id, None)
+
+
+def provisionarVencimentos(pares):
+    """
+    Provisiona antecipadamente as abas mensais para pares (cnpj_dest, data) ou
+    (cnpj_dest, data, cabecalho), agrupando por planilha: um batch_update por
+    planilha e cabecalho com abas faltando (sem cabecalho, CABECALHO_NF).
+    """
+    por_planilha = {}
+    for cnpj, data, *resto in pares:
+        empresa = empresaDoCnpj(cnpj)
+        if not empresa or data is None:
+            continue
+        cabecalho = tuple(resto[0]) if resto else tuple(CABECALHO_NF)
+        meses = por_planilha.setdefault(f"{empresa}_{data.year}", {}).setdefault(cabecalho, set())
+        meses.add((data.year, data.month))
+
+    criadas = 0
+    for chave, por_cabecalho in por_planilha.items():
+        try:
+            planilha = getPlanilha(chave)
+        except KeyError:
+            continue
+        if not planilha:
+            continue
+        try:
+            # Uma leitura de metadados por planilha a cada chamada (um lote de
+            # e-mails) mantem o cache em dia (abas renomeadas/removidas manualmente).
+            _abas(planilha, recarregar=True)
+            for cabecalho, meses in por_cabecalho.items():
+                nomes = [nome_aba_pt(datetime(ano, mes, 1)) for ano, mes in sorted(meses)]
+                criadas += len(provisionarAbas(planilha, nomes, list(cabecalho)))
+        except Exception as e:
+            print(f"[Planilhas] Falha ao provisionar abas em {chave}: {e}")
+    return criadas
+
+
+def provisionarProximosMeses(meses=1):
+    """Garante as abas do mes atual e dos proximos `meses` para todas as empresas."""
+    hoje = datetime.now()
+    datas = []
+    for i in range(max(0, int(meses)) + 1):
+        ano, mes = divmod(hoje.month - 1 + i, 12)
+        datas.append(datetime(hoje.year + ano, mes + 1, 1))
+    pares = [(cnpj, data) for cnpj in EMPRESAS_CNPJ.values() for data in datas]
+    return provisionarVencimentos(pares)
@@ -0,0 +1,125 @@
+"""
+Escritas nas planilhas em faixas paralelas, uma por planilha (spreadsheet id).
+
+Todas as operacoes de uma planilha passam pela mesma faixa, em ordem; planilhas
+diferentes (EH e MVA, por exemplo) sao escritas ao mesmo tempo. Um 429 pausa
+apenas a faixa da planilha afetada, com backoff proprio, e o estado de cada
+faixa aparece no runtime_status.
+"""
+
+import queue
+import random
+import threading
+from concurrent.futures import Future
+
+import quota_pacer
+import runtime_status
+from auth import apiCooldown
+
+
+_BACKOFF_BASE = 5.0
+_BACKOFF_MAX = 60.0
+
+_LOCK = threading.Lock()
+_faixas = {}  # spreadsheet id -> _Faixa
+_local = threading.local()
+
+
+class _Faixa:
+    def __init__(self, chave: str, nome: str):
+        self.chave = chave
+        self.nome = nome
+        self.falhas = 0
+        self._fila = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name=f"sheets-{nome}", daemon=True)
+        self._thread.start()
+
+    def _status(self, **campos):
+        try:
+            runtime_status.set_sheets_lane(self.nome, pending=self._fila.qsize(), **campos)
+        except Exception:
+            pass
+
+    def submeter(self, fn, args, kwargs) -> Future:
+        futuro = Future()
+        self._fila.put((futuro, fn, args, kwargs))
+        self._status()
+        return futuro
+
+    def backoff(self):
+        segundos = min(_BACKOFF_MAX, _BACKOFF_BASE * (2 ** self.falhas)) + random.uniform(0, 1)
+        self.falhas += 1
+        print(f"[Planilhas] {self.nome}: limite da API atingido, faixa pausada por {segundos:.0f}s")
+        self._status(cooldown_seconds=segundos, retries=self.falhas)
+        self._stop.wait(segundos)
+        self._status(cooldown_seconds=0, retries=self.falhas)
+
+    def _loop(self):
+        _local.faixa = self
+        while not self._stop.is_set():
+            try:
+                tarefa = self._fila.get(timeout=1)
+            except queue.Empty:
+                continue
+            if tarefa is None:
+                break
+            futuro, fn, args, kwargs = tarefa
+            if not futuro.set_running_or_notify_cancel():
+                continue
+            try:
+                futuro.set_result(fn(*args, **kwargs))
+                self.falhas = 0
+            except BaseException as e:
+                futuro.set_exception(e)
+            finally:
+                self._status(retries=self.falhas)
+
+    def parar(self):
+        self._stop.set()
+        self._fila.put(None)
+
+
+def _faixa(planilha) -> _Faixa:
+    with _LOCK:
+        faixa = _faixas.get(planilha.id)
+        if faixa is None:
+            faixa = _Faixa(planilha.id, planilha.title)
+            _faixas[planilha.id] = faixa
+        return faixa
+
+
+def executar(planilha, fn, *args, **kwargs) -> Future:
+    """Enfileira fn(*args, **kwargs) na faixa da planilha e retorna o Future."""
+    if getattr(_local, "faixa", None) is not None:
+        # Ja dentro de uma faixa: executa direto para nao bloquear a propria fila.
+        futuro = Future()
+        try:
+            futuro.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            futuro.set_exception(e)
+        return futuro
+    return _faixa(planilha).submeter(fn, args, kwargs)
+
+
+def backoff(orcamento: str | None = None):
+    """
+    Espera apos um 429. Dentro de uma faixa so ela pausa (backoff exponencial);
+    fora de faixa usa o cooldown global de auth. orcamento ("sheets_read" ou
+    "sheets_write") e zerado no quota_pacer, ja que o servidor disse que acabou.
+    """
+    if orcamento:
+        quota_pacer.esgotar(orcamento)
+    faixa = getattr(_local, "faixa", None)
+    if faixa is None:
+        apiCooldown()
+        return
+    faixa.backoff()
+
+
+def encerrar():
+    with _LOCK:
+        faixas = list(_faixas.values())
+        _faixas.clear()
+    for faixa in faixas:
+        faixa.parar()
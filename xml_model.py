@@ -0,0 +1,308 @@
+"""
+Modelo tipado e compacto dos XMLs de NF-e e CT-e.
+
+Cada documento e lido uma unica vez: os filhos diretos de infNFe/infCte sao
+percorridos uma vez e despachados por tag (nomes ja em notacao Clark), sem
+descer nos itens (det) nem repetir find() sobre os mesmos elementos.
+
+ler_documento usa a extracao em streaming (extrair_documento); documento_de_root
+continua disponivel para arvores ja carregadas.
+"""
+
+import io
+import re
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+
+
+NS_NFE = "{http://www.portalfiscal.inf.br/nfe}"
+NS_CTE = "{http://www.portalfiscal.inf.br/cte}"
+
+# Caminhos pre-compilados (notacao Clark, sem mapa de namespaces por chamada)
+_NFE_PROC = NS_NFE + "nfeProc"
+_NFE_INF = NS_NFE + "infNFe"
+_NFE_IDE = NS_NFE + "ide"
+_NFE_EMIT = NS_NFE + "emit"
+_NFE_DEST = NS_NFE + "dest"
+_NFE_TOTAL = NS_NFE + "total"
+_NFE_ICMSTOT = NS_NFE + "ICMSTot"
+_NFE_COBR = NS_NFE + "cobr"
+_NFE_DUP = NS_NFE + "dup"
+_NFE_NNF = NS_NFE + "nNF"
+_NFE_XNOME = NS_NFE + "xNome"
+_NFE_CNPJ = NS_NFE + "CNPJ"
+_NFE_VNF = NS_NFE + "vNF"
+_NFE_DVENC = NS_NFE + "dVenc"
+_NFE_VDUP = NS_NFE + "vDup"
+_NFE_PAG = NS_NFE + "pag"
+
+_CTE_PROC = NS_CTE + "cteProc"
+_CTE_INF = NS_CTE + "infCte"
+_CTE_IDE = NS_CTE + "ide"
+_CTE_COMPL = NS_CTE + "compl"
+_CTE_EMIT = NS_CTE + "emit"
+_CTE_DEST = NS_CTE + "dest"
+_CTE_VPREST = NS_CTE + "vPrest"
+_CTE_NCT = NS_CTE + "nCT"
+_CTE_XNOME = NS_CTE + "xNome"
+_CTE_CNPJ = NS_CTE + "CNPJ"
+_CTE_VTPREST = NS_CTE + "vTPrest"
+_CTE_DPROG = f"{NS_CTE}Entrega/{NS_CTE}comData/{NS_CTE}dProg"
+
+# Marcadores em bytes do bloco de itens: det+ vem sempre imediatamente antes de total
+_RE_INICIO_ITENS = re.compile(rb"<(?:[\w.-]+:)?det[\s>]")
+_RE_FIM_ITENS = re.compile(rb"<(?:[\w.-]+:)?total[\s>]")
+_BLOCO_LEITURA = 64 * 1024
+_MARGEM_TOKEN = 64
+
+
+@dataclass(slots=True)
+class Parcela:
+    vencimento: str = "-"
+    valor: float = 0.0
+
+
+@dataclass(slots=True)
+class DocumentoNFe:
+    numero: str = "-"
+    chave: str = ""
+    fornecedor: str = "-"
+    cnpj_emit: str = ""
+    cnpj_dest: str = ""
+    valor_total: float = 0.0
+    parcelas: list[Parcela] = field(default_factory=list)
+    com_protocolo: bool = True
+
+    @property
+    def fornecedor_upper(self) -> str:
+        nome = (self.fornecedor or "").strip()
+        return nome.upper() if nome and nome != "-" else "DESCONHECIDO"
+
+
+@dataclass(slots=True)
+class DocumentoCTe:
+    numero: str = "-"
+    chave: str = ""
+    fornecedor: str = "-"
+    cnpj_emit: str = ""
+    cnpj_dest: str = ""
+    valor_total: float = 0.0
+    vencimento_entrega: str | None = None
+    com_protocolo: bool = True
+
+    @property
+    def fornecedor_upper(self) -> str:
+        nome = (self.fornecedor or "").strip()
+        return nome.upper() if nome and nome != "-" else "DESCONHECIDO"
+
+
+def _texto(elem, tag: str, default: str = "") -> str:
+    if elem is None:
+        return default
+    filho = elem.find(tag)
+    if filho is None or filho.text is None:
+        return default
+    return filho.text
+
+
+def _float(text) -> float:
+    if text is None or not str(text).strip():
+        return 0.0
+    return float(text)
+
+
+def _chave(inf) -> str:
+    return "".join(ch for ch in str(inf.get("Id", "")) if ch.isdigit())
+
+
+def _nfe_aplicar(doc: DocumentoNFe, elem):
+    """Aplica um filho direto de infNFe ao modelo."""
+    tag = elem.tag
+    if tag == _NFE_IDE:
+        doc.numero = _texto(elem, _NFE_NNF, "-")
+    elif tag == _NFE_EMIT:
+        doc.fornecedor = _texto(elem, _NFE_XNOME, "-")
+        doc.cnpj_emit = _texto(elem, _NFE_CNPJ)
+    elif tag == _NFE_DEST:
+        doc.cnpj_dest = _texto(elem, _NFE_CNPJ)
+    elif tag == _NFE_TOTAL:
+        icms = elem.find(_NFE_ICMSTOT)
+        if icms is not None:
+            doc.valor_total = _float(_texto(icms, _NFE_VNF, None))
+    elif tag == _NFE_COBR:
+        for dup in elem.iter(_NFE_DUP):
+            doc.parcelas.append(
+                Parcela(
+                    vencimento=_texto(dup, _NFE_DVENC, "-"),
+                    valor=_float(_texto(dup, _NFE_VDUP, None)),
+                )
+            )
+
+
+def _cte_aplicar(doc: DocumentoCTe, elem):
+    """Aplica um filho direto de infCte ao modelo."""
+    tag = elem.tag
+    if tag == _CTE_IDE:
+        doc.numero = _texto(elem, _CTE_NCT, "-")
+    elif tag == _CTE_COMPL:
+        dprog = elem.find(_CTE_DPROG)
+        if dprog is not None:
+            doc.vencimento_entrega = dprog.text
+    elif tag == _CTE_EMIT:
+        doc.fornecedor = _texto(elem, _CTE_XNOME, "-")
+        doc.cnpj_emit = _texto(elem, _CTE_CNPJ)
+    elif tag == _CTE_DEST:
+        doc.cnpj_dest = _texto(elem, _CTE_CNPJ)
+    elif tag == _CTE_VPREST:
+        doc.valor_total = _float(_texto(elem, _CTE_VTPREST, None))
+
+
+def _nfe_de_inf(inf, com_protocolo: bool) -> DocumentoNFe:
+    doc = DocumentoNFe(chave=_chave(inf), com_protocolo=com_protocolo)
+    for elem in inf:
+        _nfe_aplicar(doc, elem)
+    return doc
+
+
+def _cte_de_inf(inf, com_protocolo: bool) -> DocumentoCTe:
+    doc = DocumentoCTe(chave=_chave(inf), com_protocolo=com_protocolo)
+    for elem in inf:
+        _cte_aplicar(doc, elem)
+    return doc
+
+
+def documento_de_root(root) -> DocumentoNFe | DocumentoCTe | None:
+    """Monta o modelo a partir de uma arvore ja carregada (None se nao for NF-e/CT-e)."""
+    tag = root.tag
+    if tag == _NFE_INF:
+        return _nfe_de_inf(root, False)
+    if tag == _CTE_INF:
+        return _cte_de_inf(root, False)
+
+    inf = next(root.iter(_NFE_INF), None)
+    if inf is not None:
+        return _nfe_de_inf(inf, tag == _NFE_PROC)
+    inf = next(root.iter(_CTE_INF), None)
+    if inf is not None:
+        return _cte_de_inf(inf, tag == _CTE_PROC)
+    return None
+
+
+class _LeitorSemItens:
+    """
+    Leitor (file-like) que descarta, ainda em bytes, o bloco de itens da NF-e
+    (do primeiro <det> ate <total>), para que o iterparse nem tokenize os itens.
+    """
+
+    def __init__(self, fonte):
+        self._fonte = fonte
+        self._pendente = b""
+        self._saida = bytearray()
+        self._estado = "antes"
+        self._fim = False
+
+    def _consumir(self, bloco: bytes):
+        dados = self._pendente + bloco
+        self._pendente = b""
+        if self._estado == "antes":
+            m = _RE_INICIO_ITENS.search(dados)
+            if m:
+                self._saida += dados[: m.start()]
+                dados = dados[m.start():]
+                self._estado = "pulando"
+            elif bloco:
+                corte = max(0, len(dados) - _MARGEM_TOKEN)
+                self._saida += dados[:corte]
+                self._pendente = dados[corte:]
+                return
+        if self._estado == "pulando":
+            m = _RE_FIM_ITENS.search(dados)
+            if not m:
+                self._pendente = dados[-_MARGEM_TOKEN:] if bloco else b""
+                return
+            dados = dados[m.start():]
+            self._estado = "depois"
+        self._saida += dados
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = _BLOCO_LEITURA
+        while len(self._saida) < size and not self._fim:
+            bloco = self._fonte.read(_BLOCO_LEITURA)
+            if not bloco:
+                self._fim = True
+            self._consumir(bloco)
+        out = bytes(self._saida[:size])
+        del self._saida[:size]
+        return out
+
+
+def extrair_documento(origem) -> DocumentoNFe | DocumentoCTe | None:
+    """
+    Extracao em streaming (iterparse): so os filhos de infNFe/infCte usados
+    pelo modelo sao mantidos e a leitura para assim que cobr (NF-e) ou vPrest
+    (CT-e) fecha. O bloco de itens (det) e descartado ainda em bytes; se o
+    recorte nao gerar um XML valido, o documento e relido sem recorte, e ai os
+    itens sao descartados elemento a elemento. A memoria por documento fica
+    limitada independentemente da quantidade de itens.
+    """
+    if isinstance(origem, (bytes, bytearray)):
+        try:
+            return _extrair(_LeitorSemItens(io.BytesIO(origem)))
+        except ET.ParseError:
+            return _extrair(io.BytesIO(origem))
+    try:
+        with open(origem, "rb") as fonte:
+            return _extrair(_LeitorSemItens(fonte))
+    except ET.ParseError:
+        with open(origem, "rb") as fonte:
+            return _extrair(fonte)
+
+
+def _extrair(fonte) -> DocumentoNFe | DocumentoCTe | None:
+    doc = None
+    aplicar = None
+    fim = None
+    inf = None
+    raiz_tag = None
+    profundidade = 0
+
+    for evento, elem in ET.iterparse(fonte, events=("start", "end")):
+        if evento == "start":
+            profundidade += 1
+            if raiz_tag is None:
+                raiz_tag = elem.tag
+            if inf is None:
+                if elem.tag == _NFE_INF:
+                    inf, aplicar, fim = elem, _nfe_aplicar, _NFE_COBR
+                    doc = DocumentoNFe(chave=_chave(elem), com_protocolo=raiz_tag == _NFE_PROC)
+                    nivel_inf = profundidade
+                elif elem.tag == _CTE_INF:
+                    inf, aplicar, fim = elem, _cte_aplicar, _CTE_VPREST
+                    doc = DocumentoCTe(chave=_chave(elem), com_protocolo=raiz_tag == _CTE_PROC)
+                    nivel_inf = profundidade
+            elif profundidade == nivel_inf + 1 and elem.tag == _NFE_PAG:
+                # pag vem depois de total/cobr: NF-e sem cobranca termina aqui
+                break
+            continue
+
+        profundidade -= 1
+        if inf is None:
+            continue
+        if elem is inf:
+            break
+        if profundidade == nivel_inf:
+            aplicar(doc, elem)
+            inf.remove(elem)
+            if elem.tag == fim:
+                break
+
+    return doc
+
+
+def ler_documento(origem) -> DocumentoNFe | DocumentoCTe | None:
+    """
+    Le um XML a partir de caminho (str/Path) ou conteudo (bytes).
+    Levanta ET.ParseError/ValueError para XML invalido.
+    """
+    return extrair_documento(origem)
@@ -0,0 +1,86 @@
+"""
+Etapa opcional de parse de XML em pool de processos.
+
+Recebe o conteudo bruto dos anexos e devolve (documento, erro) na mesma ordem.
+Os workers sao mantidos vivos entre ciclos; lotes pequenos sao processados
+no proprio processo, onde o custo de IPC seria maior que o ganho.
+
+No spawn (Windows) cada worker reimporta o script principal como __mp_main__,
+entao main.py e seus imports de topo (config, auth, panel_web) sao carregados
+de novo em cada worker; por isso o pool e mantido vivo entre ciclos.
+"""
+
+import pickle
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from xml_model import ler_documento
+
+
+_LOCK = threading.Lock()
+_executor = None
+_workers_atual = 0
+
+
+def _parse_seguro(conteudo: bytes):
+    try:
+        return ler_documento(conteudo), ""
+    except Exception as e:
+        return None, str(e) or e.__class__.__name__
+
+
+def _noop():
+    return True
+
+
+def _obter_executor(workers: int) -> ProcessPoolExecutor:
+    global _executor, _workers_atual
+    with _LOCK:
+        if _executor is not None and _workers_atual != workers:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=workers)
+            _workers_atual = workers
+        return _executor
+
+
+def aquecer(workers: int):
+    """Sobe os workers antecipadamente (spawn no Windows custa caro no primeiro lote)."""
+    workers = int(workers or 0)
+    if workers <= 0:
+        return
+    try:
+        executor = _obter_executor(workers)
+        for fut in [executor.submit(_noop) for _ in range(workers)]:
+            fut.result(timeout=60)
+        print(f"[XML] Pool de parse pronto com {workers} worker(s).")
+    except Exception as e:
+        print(f"[XML] Falha ao iniciar pool de parse, usando parse local: {e}")
+        encerrar()
+
+
+def parse_lote(conteudos: list[bytes], workers: int = 0, lote_minimo: int = 16) -> list[tuple]:
+    """Retorna [(documento | None, erro)] na mesma ordem dos conteudos."""
+    workers = int(workers or 0)
+    if workers <= 0 or len(conteudos) < max(1, int(lote_minimo)):
+        return [_parse_seguro(c) for c in conteudos]
+
+    try:
+        executor = _obter_executor(workers)
+        chunksize = max(1, len(conteudos) // (workers * 4))
+        return list(executor.map(_parse_seguro, conteudos, chunksize=chunksize))
+    except (BrokenProcessPool, OSError, RuntimeError, pickle.PicklingError) as e:
+        print(f"[XML] Pool de parse indisponivel ({e}); usando parse local.")
+        encerrar()
+        return [_parse_seguro(c) for c in conteudos]
+
+
+def encerrar():
+    global _executor, _workers_atual
+    with _LOCK:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+        _workers_atual = 0